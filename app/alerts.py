@@ -0,0 +1,201 @@
+"""
+Saved searches and the alert inbox.
+
+A saved search is a category, a campus, a price range and keywords (any of
+them may be left open). When a listing is posted it is matched against
+every saved search in memory instead of re-running the searches:
+
+  * searches are bucketed by (category_id, campus), with None for "any",
+    so a listing only probes the 4 buckets it can fall in;
+  * within a bucket, searches are sorted by min_price, so a bisect finds
+    those whose range starts at or below the price, and only those are
+    checked for max_price and keywords.
+
+Matches are written to saved_search_matches in the posting transaction and
+shown in the owner's Alerts inbox. The index is per process; it is rebuilt
+when saved_searches has changed (a COUNT/MAX check per post), so searches
+saved in another process are never missed.
+"""
+import os
+import threading
+import time
+from bisect import bisect_right
+from collections import defaultdict
+from typing import List, Optional, Tuple
+
+from sqlalchemy import text
+from app import live
+from app.search import normalize
+
+MAX_SEARCHES_PER_USER = 20
+UNREAD_TTL_SECONDS = float(os.getenv("ALERTS_UNREAD_TTL", "30"))  # badge recount interval without live updates
+
+_lock = threading.Lock()
+_index = None  # PredicateIndex
+
+class PredicateIndex:
+    """Saved searches bucketed by (category_id, campus), each bucket sorted by min_price."""
+
+    def __init__(self, rows, version):
+        self.version = version
+        buckets = defaultdict(list)
+        for r in rows:
+            lo = float(r["min_price"]) if r["min_price"] is not None else float("-inf")
+            hi = float(r["max_price"]) if r["max_price"] is not None else float("inf")
+            key = (str(r["category_id"]) if r["category_id"] else None, r["campus"])
+            buckets[key].append((lo, hi, str(r["id"]), str(r["user_id"]), tuple((r["keywords"] or "").split())))
+        self.buckets = {}
+        for key, entries in buckets.items():
+            entries.sort(key=lambda e: e[0])
+            self.buckets[key] = ([e[0] for e in entries], entries)
+
+    def __len__(self):
+        return sum(len(entries) for _, entries in self.buckets.values())
+
+    def match(self, category_id: Optional[str], campus: Optional[str], price: float, body: str) -> List[Tuple[str, str]]:
+        """(search_id, user_id) of every search the listing satisfies."""
+        haystack = normalize(body)
+        out = []
+        for key in {(category_id, campus), (category_id, None), (None, campus), (None, None)}:
+            bucket = self.buckets.get(key)
+            if not bucket:
+                continue
+            mins, entries = bucket
+            for lo, hi, search_id, user_id, words in entries[:bisect_right(mins, price)]:
+                if price <= hi and all(w in haystack for w in words):
+                    out.append((search_id, user_id))
+        return out
+
+def _version(s) -> tuple:
+    return tuple(s.execute(text("SELECT COUNT(*), MAX(created_at) FROM saved_searches")).one())
+
+def index(s) -> PredicateIndex:
+    """The process-wide index, rebuilt if saved_searches changed since it was built."""
+    global _index
+    version = _version(s)
+    with _lock:
+        current = _index
+    if current is not None and current.version == version:
+        return current
+    rows = s.execute(text("""
+        SELECT id, user_id, category_id, campus, min_price, max_price, keywords FROM saved_searches
+    """)).mappings().all()
+    built = PredicateIndex(rows, version)
+    with _lock:
+        _index = built
+    return built
+
+def match_listings(s, listings) -> int:
+    """
+    Record inbox entries for just-inserted listings, in the caller's
+    transaction. `listings` are (item_id, seller_id, category_id, campus,
+    price, title, description); a seller's own searches are skipped.
+    Returns the number of matches.
+    """
+    idx = index(s)
+    rows = []
+    for item_id, seller_id, category_id, campus, price, title, description in listings:
+        hits = idx.match(str(category_id) if category_id else None, campus, float(price), f"{title} {description}")
+        rows += [{"sid": sid, "iid": str(item_id)} for sid, uid in hits if uid != str(seller_id)]
+    if rows:
+        # via SELECT: a search deleted since the index was built is skipped, not an FK error
+        s.execute(text("""
+            INSERT INTO saved_search_matches (search_id, item_id, user_id)
+            SELECT ss.id, :iid, ss.user_id FROM saved_searches ss WHERE ss.id = :sid
+            ON CONFLICT DO NOTHING
+        """), rows)
+    return len(rows)
+
+def match_listing(s, item_id, seller_id, category_id, campus, price, title: str, description: str) -> int:
+    """match_listings() for one listing."""
+    return match_listings(s, [(item_id, seller_id, category_id, campus, price, title, description)])
+
+def save_search(s, user_id, category_id=None, campus=None, min_price=None, max_price=None,
+                keywords: str = "") -> Tuple[bool, str]:
+    """Store a saved search for `user_id` (None / "" = any). Returns (ok, message); commits."""
+    keywords = normalize(keywords) or None
+    if not any((category_id, campus, min_price is not None, max_price is not None, keywords)):
+        return False, "Pick at least one filter or keyword to save."
+    n = s.execute(text("SELECT COUNT(*) FROM saved_searches WHERE user_id = :u"), {"u": str(user_id)}).scalar_one()
+    if n >= MAX_SEARCHES_PER_USER:
+        return False, f"You can keep up to {MAX_SEARCHES_PER_USER} saved searches."
+    s.execute(text("""
+        INSERT INTO saved_searches (user_id, category_id, campus, min_price, max_price, keywords)
+        VALUES (:u, :c, :campus, :lo, :hi, :kw)
+    """), {"u": str(user_id), "c": category_id, "campus": campus, "lo": min_price, "hi": max_price, "kw": keywords})
+    s.commit()
+    return True, "Search saved. New listings that match will show up under Alerts."
+
+def delete_search(s, user_id, search_id) -> None:
+    s.execute(text("DELETE FROM saved_searches WHERE id = :id AND user_id = :u"),
+              {"id": str(search_id), "u": str(user_id)})
+    s.commit()
+
+SEARCHES_SQL = """
+    SELECT ss.id, c.name AS category, ss.campus, ss.min_price, ss.max_price, ss.keywords, ss.created_at,
+           (SELECT COUNT(*) FROM saved_search_matches m WHERE m.search_id = ss.id) AS matches
+    FROM saved_searches ss
+    LEFT JOIN categories c ON c.id = ss.category_id
+    WHERE ss.user_id = :uid
+    ORDER BY ss.created_at
+"""
+
+INBOX_SQL = """
+    SELECT i.id, i.title, i.price, i.status, i.pickup_campus, m.matched_at, m.seen_at, m.search_id
+    FROM (
+        -- one row per listing, however many of the user's searches it matched
+        SELECT DISTINCT ON (item_id) item_id, matched_at, seen_at, search_id
+        FROM saved_search_matches
+        WHERE user_id = :uid
+        ORDER BY item_id, matched_at DESC
+    ) m
+    JOIN items i ON i.id = m.item_id
+    ORDER BY m.matched_at DESC
+    LIMIT :limit
+"""
+
+def unread_count(s, user_id) -> int:
+    return s.execute(text("""
+        SELECT COUNT(DISTINCT item_id) FROM saved_search_matches WHERE user_id = :u AND seen_at IS NULL
+    """), {"u": str(user_id)}).scalar_one()
+
+def cached_unread_count(s, cache, user_id, live_on: bool, now: Optional[float] = None) -> int:
+    """
+    unread_count() kept in `cache` (the UI passes st.session_state). With live
+    updates on, it is recounted when app.live reports an alert event for the
+    user; with them off (live.start() returned False) nothing is ever
+    reported, so it is recounted once it is UNREAD_TTL_SECONDS old instead.
+    """
+    uid = str(user_id)
+    now = time.monotonic() if now is None else now
+    c = cache.get("alerts_unread")
+    if c is None or c["uid"] != uid:
+        stale = True
+    elif live_on:
+        stale = bool(live.changed_since([uid], c["mark"]))
+    else:
+        stale = now - c["at"] >= UNREAD_TTL_SECONDS
+    if stale:
+        mark = live.mark()
+        c = {"uid": uid, "mark": mark, "at": now, "n": unread_count(s, uid)}
+        cache["alerts_unread"] = c
+    return c["n"]
+
+def mark_seen(s, user_id, item_ids) -> None:
+    """Mark the matches for the listings the user was shown as seen; the rest stay new."""
+    s.execute(text("""
+        UPDATE saved_search_matches SET seen_at = NOW()
+        WHERE user_id = :u AND item_id = ANY(CAST(:ids AS uuid[])) AND seen_at IS NULL
+    """), {"u": str(user_id), "ids": [str(i) for i in item_ids]})
+    s.commit()
+
+def describe(r) -> str:
+    """One-line summary of a saved search row."""
+    parts = [f"“{r['keywords']}”" if r["keywords"] else None, r["category"], r["campus"]]
+    if r["min_price"] is not None and r["max_price"] is not None:
+        parts.append(f"${r['min_price']:.0f}–${r['max_price']:.0f}")
+    elif r["min_price"] is not None:
+        parts.append(f"from ${r['min_price']:.0f}")
+    elif r["max_price"] is not None:
+        parts.append(f"under ${r['max_price']:.0f}")
+    return " • ".join(p for p in parts if p) or "Anything"
@@ -0,0 +1,67 @@
+"""
+Move old sold and closed listings out of the hot tables.
+
+    python -m app.archive_worker [--older-than-days 180] [--batch 200] [--pause 0.2] [--interval 3600] [--once]
+
+Listings sold or closed (items.closed_at) more than --older-than-days ago move
+to items_archive, with their bids and image rows, through the
+archive_listings() routine in schema.sql. Each batch is one short
+transaction that claims its rows with FOR UPDATE SKIP LOCKED (served by
+idx_items_closed_at), so Browse, bidding and a second worker are never
+held up for long; --pause spaces batches out so autovacuum and replicas
+keep up. The archive keeps the image files referenced.
+
+My Purchases and My Bids read the all_items / all_bids views, so history
+stays visible; Browse and My Listings only see the hot tables.
+"""
+import argparse
+import os
+import time
+
+from sqlalchemy import text
+from app.db import Session
+
+ARCHIVE_AFTER_DAYS = float(os.getenv("ARCHIVE_AFTER_DAYS", "180"))
+
+ARCHIVE_SQL = text("SELECT archive_listings(make_interval(secs => :age), :n)")
+
+def archive_due(older_than_days: float = ARCHIVE_AFTER_DAYS, batch_size: int = 200, pause: float = 0.2) -> int:
+    """Archive every listing that is due, batch by batch; returns how many were moved."""
+    moved = 0
+    s = Session()
+    try:
+        while True:
+            n = s.execute(ARCHIVE_SQL, {"age": older_than_days * 86400, "n": batch_size}).scalar_one()
+            s.commit()
+            moved += n
+            if n < batch_size:
+                break
+            print(f"... {moved} archived")
+            time.sleep(pause)
+    except Exception:
+        s.rollback()
+        raise
+    finally:
+        Session.remove()
+    return moved
+
+def run(older_than_days: float = ARCHIVE_AFTER_DAYS, batch_size: int = 200, pause: float = 0.2,
+        interval: float = 3600.0, once: bool = False) -> None:
+    while True:
+        n = archive_due(older_than_days, batch_size, pause)
+        if n:
+            print(f"archived {n} listing(s).")
+        if once:
+            return
+        time.sleep(interval)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--older-than-days", type=float, default=ARCHIVE_AFTER_DAYS,
+                        help="archive listings sold/closed at least this long ago (ARCHIVE_AFTER_DAYS)")
+    parser.add_argument("--batch", type=int, default=200, help="listings per transaction")
+    parser.add_argument("--pause", type=float, default=0.2, help="seconds between batches")
+    parser.add_argument("--interval", type=float, default=3600.0, help="seconds between sweeps")
+    parser.add_argument("--once", action="store_true", help="sweep once and exit")
+    args = parser.parse_args()
+    run(args.older_than_days, args.batch, args.pause, args.interval, args.once)
@@ -0,0 +1,91 @@
+"""
+Close auctions whose auction_end_at has passed.
+
+    python -m app.auction_worker [--batch 100] [--interval 30] [--once]
+
+Each batch claims due auctions with FOR UPDATE SKIP LOCKED (served by
+idx_items_auction_due), so several workers can run side by side and a
+bidder holding the row in place_bid() is simply retried next round. In one
+statement per batch, the highest bid (earliest wins a tie) is accepted and
+recorded in chosen_bid_id, the item is marked sold, and the other bids are
+declined. Bids the seller already declined never win; auctions without any
+other bid are closed.
+
+Pages never check expiry themselves: place_bid() refuses late bids, and the
+Browse caches in the app pick up the status change when their TTL expires.
+"""
+import argparse
+import time
+
+from sqlalchemy import text
+from app.db import Session
+
+CLOSE_DUE_SQL = text("""
+    WITH due AS (
+        SELECT id
+        FROM items
+        WHERE status = 'active' AND listing_type = 'auction'
+          AND auction_end_at IS NOT NULL AND auction_end_at <= NOW()
+        ORDER BY auction_end_at
+        LIMIT :n
+        FOR UPDATE SKIP LOCKED
+    ),
+    winner AS (
+        SELECT DISTINCT ON (b.item_id) b.item_id, b.id AS bid_id
+        FROM bids b
+        JOIN due ON due.id = b.item_id
+        WHERE b.status <> 'declined'  -- the seller turned these down already
+        ORDER BY b.item_id, b.amount DESC, b.placed_at, b.id
+    ),
+    settled_bids AS (
+        UPDATE bids b
+        SET status = CASE WHEN b.id = w.bid_id THEN 'accepted' ELSE 'declined' END
+        FROM winner w
+        WHERE b.item_id = w.item_id
+        RETURNING b.id
+    )
+    UPDATE items i
+    SET status = CASE WHEN w.bid_id IS NULL THEN 'closed' ELSE 'sold' END,
+        chosen_bid_id = w.bid_id
+    FROM due
+    LEFT JOIN winner w ON w.item_id = due.id
+    WHERE i.id = due.id
+    RETURNING i.id, i.status
+""")
+
+def close_due(batch_size: int = 100) -> int:
+    """Close every auction that is due, batch by batch; returns how many were closed."""
+    closed = 0
+    s = Session()
+    try:
+        while True:
+            rows = s.execute(CLOSE_DUE_SQL, {"n": batch_size}).all()
+            s.commit()
+            closed += len(rows)
+            for item_id, status in rows:
+                print(f"{item_id}: {status}")
+            if len(rows) < batch_size:
+                break
+    except Exception:
+        s.rollback()
+        raise
+    finally:
+        Session.remove()
+    return closed
+
+def run(batch_size: int = 100, interval: float = 30.0, once: bool = False) -> None:
+    while True:
+        n = close_due(batch_size)
+        if n:
+            print(f"closed {n} auction(s).")
+        if once:
+            return
+        time.sleep(interval)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--batch", type=int, default=100, help="auctions per transaction")
+    parser.add_argument("--interval", type=float, default=30.0, help="seconds between sweeps")
+    parser.add_argument("--once", action="store_true", help="sweep once and exit")
+    args = parser.parse_args()
+    run(args.batch, args.interval, args.once)
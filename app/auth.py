@@ -3,7 +3,7 @@ from sqlalchemy import select
 from sqlalchemy.exc import IntegrityError
 from app.db import Session
 from app.models import User
-from app.security import hash_password, verify_password
+from app.security import hash_password, verify_and_upgrade
 
 RUTGERS_DOMAINS = ("@rutgers.edu", "@scarletmail.rutgers.edu")
 
@@ -42,24 +42,24 @@ def register_user(name: str, email: str, password: str) -> Tuple[bool, str]:
     except IntegrityError:
         s.rollback()
         return False, "That email is already registered."
-    finally:
-        s.close()
 
 def authenticate_user(email: str, password: str) -> Optional[User]:
     """
     Return the user if credentials are valid, else None.
+    Re-hashes the stored password if its PBKDF2 cost is out of date.
     """
     email = (email or "").strip().lower()
     if not email or not password:
         return None
 
     s = Session()
-    try:
-        u = s.execute(select(User).where(User.email == email)).scalar_one_or_none()
-        if not u:
-            return None
-        if not verify_password(password, u.password_hash):
-            return None
-        return u
-    finally:
-        s.close()
+    u = s.execute(select(User).where(User.email == email)).scalar_one_or_none()
+    if not u:
+        return None
+    ok, new_hash = verify_and_upgrade(password, u.password_hash)
+    if not ok:
+        return None
+    if new_hash:
+        u.password_hash = new_hash
+        s.commit()
+    return u
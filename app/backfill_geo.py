@@ -0,0 +1,58 @@
+"""
+Fill in pickup_lat / pickup_lng for listings posted before app.geo existed.
+
+    python -m app.backfill_geo [--batch 500] [--all]
+
+Walks items in id order and geocodes pickup_location / pickup_campus with
+the local gazetteer, like the post form does. Only rows without
+coordinates are touched unless --all is given (e.g. after adding places to
+the gazetteer). Rows nothing matches are left NULL. Safe to re-run.
+"""
+import argparse
+
+from sqlalchemy import text
+from app.db import Session
+from app.geo import geocode
+
+def run(batch_size: int = 500, redo_all: bool = False):
+    done, unmatched = 0, 0
+    last_id = None
+
+    s = Session()
+    try:
+        while True:
+            rows = s.execute(text("""
+                SELECT id, pickup_location, pickup_campus
+                FROM items
+                WHERE (CAST(:all AS boolean) OR pickup_lat IS NULL)
+                  AND (CAST(:after AS uuid) IS NULL OR id > CAST(:after AS uuid))
+                ORDER BY id
+                LIMIT :n
+            """), {"all": redo_all, "after": last_id, "n": batch_size}).mappings().all()
+            if not rows:
+                break
+
+            updates = []
+            for r in rows:
+                lat, lng = geocode(r["pickup_location"], r["pickup_campus"])
+                if lat is None:
+                    unmatched += 1
+                else:
+                    updates.append({"id": r["id"], "lat": lat, "lng": lng})
+            if updates:
+                s.execute(text("UPDATE items SET pickup_lat = :lat, pickup_lng = :lng WHERE id = :id"), updates)
+            s.commit()
+            done += len(updates)
+            last_id = str(rows[-1]["id"])
+            print(f"... {done} located, {unmatched} unmatched")
+    finally:
+        s.close()
+
+    print(f"Backfill finished: {done} listing(s) located, {unmatched} left without coordinates.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--batch", type=int, default=500, help="rows per transaction")
+    parser.add_argument("--all", action="store_true", help="recompute coordinates that are already set")
+    args = parser.parse_args()
+    run(args.batch, args.all)
@@ -0,0 +1,95 @@
+"""
+Generate thumbnail/detail variants for uploads that predate them.
+
+    python -m app.backfill_variants [--batch 100] [--migrate]
+
+Walks item_images rows with no recorded variants in id order, builds the
+WebP renditions next to each original and records them. Safe to re-run.
+
+--migrate first moves the legacy uploads/ tree (the old UPLOAD_DIR default)
+to app/static/media, or to UPLOAD_DIR if that is set, keeping relative
+paths, so image_path values stay valid. Files already at the target are
+content-addressed duplicates and are dropped from uploads/. Restart the app
+afterwards so it serves the new directory statically.
+"""
+import argparse
+import os
+import shutil
+
+from sqlalchemy import text
+from app.db import Session
+from app.utils import DEFAULT_UPLOAD_DIR, LEGACY_UPLOAD_DIR, generate_image_variants, get_upload_root
+
+def migrate_uploads(src: str = LEGACY_UPLOAD_DIR, dst: str = None):
+    """Move every file under `src` to the same relative path under `dst`; returns (moved, already there)."""
+    dst = dst or os.getenv("UPLOAD_DIR") or DEFAULT_UPLOAD_DIR
+    if not os.path.isdir(src) or os.path.realpath(src) == os.path.realpath(dst):
+        return 0, 0
+    moved, kept = 0, 0
+    for dirpath, _, files in os.walk(src, topdown=False):
+        for name in files:
+            old = os.path.join(dirpath, name)
+            new = os.path.join(dst, os.path.relpath(old, src))
+            if os.path.exists(new) and os.path.getsize(new) == os.path.getsize(old):
+                os.remove(old)
+                kept += 1
+                continue
+            os.makedirs(os.path.dirname(new), exist_ok=True)
+            shutil.move(old, new)
+            moved += 1
+        if not os.listdir(dirpath):
+            os.rmdir(dirpath)
+    leftover = os.path.isdir(src)
+    print(f"Migrated {src} -> {dst}: {moved} file(s) moved, {kept} already there"
+          + ("; some files were left behind (name clash with a different file)." if leftover else "."))
+    return moved, kept
+
+def run(batch_size: int = 100):
+    upload_root = get_upload_root()
+    done, failed = 0, 0
+    last_id = None
+
+    s = Session()
+    try:
+        while True:
+            rows = s.execute(text("""
+                SELECT id, image_path
+                FROM item_images
+                WHERE variants = '{}'
+                  AND (CAST(:after AS uuid) IS NULL OR id > CAST(:after AS uuid))
+                ORDER BY id
+                LIMIT :n
+            """), {"after": last_id, "n": batch_size}).mappings().all()
+            if not rows:
+                break
+
+            # the same file can back several rows; only render it once per batch
+            built = {}
+            for r in rows:
+                path = r["image_path"]
+                if path not in built:
+                    built[path] = generate_image_variants(upload_root, path)
+                ok, variants_or_err = built[path]
+                if ok:
+                    s.execute(text("UPDATE item_images SET variants = :v WHERE id = :id"),
+                              {"v": variants_or_err, "id": r["id"]})
+                    done += 1
+                else:
+                    print(f"! {r['id']}: {variants_or_err}")
+                    failed += 1
+            s.commit()
+            last_id = str(rows[-1]["id"])
+            print(f"... {done} updated, {failed} failed")
+    finally:
+        s.close()
+
+    print(f"Backfill finished: {done} image(s) updated, {failed} failed.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--batch", type=int, default=100, help="rows per transaction")
+    parser.add_argument("--migrate", action="store_true", help="move the legacy uploads/ directory first")
+    args = parser.parse_args()
+    if args.migrate:
+        migrate_uploads()
+    run(args.batch)
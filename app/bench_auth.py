@@ -0,0 +1,54 @@
+"""
+Measure password-verification throughput (the CPU cost of a login).
+
+    python -m app.bench_auth [--seconds 5] [--rounds N]
+
+Runs verify_password inline on one core, then through the worker pool with
+enough concurrent callers to keep every worker busy, and prints logins per
+second in total and per core. No database needed.
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+def _run_for(seconds: float, concurrency: int, verify, hash_) -> int:
+    done = 0
+    deadline = time.perf_counter() + seconds
+
+    def worker():
+        n = 0
+        while time.perf_counter() < deadline:
+            assert verify("correct horse", hash_)
+            n += 1
+        return n
+
+    with ThreadPoolExecutor(max_workers=concurrency) as ex:
+        for n in ex.map(lambda _: worker(), range(concurrency)):
+            done += n
+    return done
+
+def run(seconds: float = 5.0):
+    from app import security
+
+    hash_ = security.hash_password("correct horse")
+    print(f"PBKDF2 rounds: {security.PBKDF2_ROUNDS}, workers: {security.HASH_WORKERS}, cores: {os.cpu_count()}")
+
+    inline = _run_for(seconds, 1, lambda pw, h: security._verify_and_upgrade(pw, h)[0], hash_)
+    print(f"inline (1 core):   {inline / seconds:8.1f} logins/s")
+
+    if security.HASH_WORKERS > 0:
+        callers = security.HASH_WORKERS * 2
+        pooled = _run_for(seconds, callers, security.verify_password, hash_)
+        total = pooled / seconds
+        print(f"pool ({security.HASH_WORKERS} workers):  {total:8.1f} logins/s "
+              f"= {total / security.HASH_WORKERS:.1f} logins/s per core")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=5.0, help="duration of each phase")
+    parser.add_argument("--rounds", type=int, help="override PBKDF2_ROUNDS for this run")
+    args = parser.parse_args()
+    if args.rounds:
+        os.environ["PBKDF2_ROUNDS"] = str(args.rounds)  # read at import, also by the spawned workers
+    run(args.seconds)
@@ -0,0 +1,132 @@
+"""
+Load-test auction bidding: many bidders hammering one item at once.
+
+    python -m app.bench_bids [--bidders 16] [--seconds 5] [--naive]
+
+Creates a throwaway seller, bidders and auction item, lets every bidder
+thread bid "current highest + increment" as fast as it can, then checks
+the outcome and deletes everything again:
+
+  * every bid the clients were told succeeded is in the bids table;
+  * in placement order, each bid beats the previous one by the minimum
+    increment (no two bidders both won with the same "highest" bid);
+  * items.highest_bid / bid_count agree with the bids table.
+
+--naive uses the old read-then-INSERT path instead of place_bid() to show
+the races it allowed. Exits non-zero if any check fails.
+"""
+import argparse
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import text
+from app.db import Session
+from app import bids
+
+def _setup(n_bidders: int):
+    s = Session()
+    tag = uuid.uuid4().hex[:10]
+    ids = s.execute(text("""
+        INSERT INTO users (name, email, password_hash)
+        SELECT 'bench', 'bench-' || :tag || '-' || g || '@rutgers.edu', '!'
+        FROM generate_series(0, :n) g
+        RETURNING id
+    """), {"tag": tag, "n": n_bidders}).scalars().all()
+    seller, bidders = str(ids[0]), [str(i) for i in ids[1:]]
+    item = s.execute(text("""
+        INSERT INTO items (seller_id, title, description, price, listing_type)
+        VALUES (:seller, 'bench auction', 'bench_bids', 1, 'auction')
+        RETURNING id
+    """), {"seller": seller}).scalar_one()
+    s.commit()
+    return str(item), [seller, *bidders]
+
+def _teardown(user_ids):
+    s = Session()
+    s.execute(text("DELETE FROM users WHERE id = ANY(CAST(:ids AS uuid[]))"), {"ids": user_ids})
+    s.commit()
+
+def _bidder(item_id: str, bidder_id: str, deadline: float, naive: bool):
+    s = Session()
+    placed = rejected = errors = 0
+    highest = None
+    try:
+        while time.perf_counter() < deadline:
+            if naive:
+                # what the bid form used to do: read, then insert whatever looked high enough
+                highest = s.execute(text("SELECT highest_bid FROM items WHERE id = :iid"),
+                                    {"iid": item_id}).scalar()
+                try:
+                    s.execute(text("INSERT INTO bids (item_id, bidder_id, amount) VALUES (:iid, :b, :amt)"),
+                              {"iid": item_id, "b": bidder_id, "amt": bids.min_next_bid(highest)})
+                    s.commit()
+                    placed += 1
+                except Exception:
+                    s.rollback()
+                    errors += 1
+            else:
+                try:
+                    ok, _, highest = bids.place_bid(s, item_id, bidder_id, bids.min_next_bid(highest))
+                except Exception:
+                    errors += 1
+                    continue
+                if ok:
+                    placed += 1
+                else:
+                    rejected += 1  # someone got there first; highest is now up to date
+    finally:
+        Session.remove()
+    return placed, rejected, errors
+
+def _check(item_id: str, client_placed: int) -> list:
+    s = Session()
+    problems = []
+    amounts = s.execute(text("SELECT amount FROM bids WHERE item_id = :iid ORDER BY placed_at, id"),
+                        {"iid": item_id}).scalars().all()
+    if len(amounts) != client_placed:
+        problems.append(f"clients placed {client_placed} bids, table has {len(amounts)}")
+
+    overtaken = sum(1 for prev, cur in zip(amounts, amounts[1:]) if cur < prev + bids.BID_MIN_INCREMENT)
+    if overtaken:
+        problems.append(f"{overtaken} bid(s) accepted without beating the previous bid by {bids.BID_MIN_INCREMENT}")
+
+    hb, n = s.execute(text("SELECT highest_bid, bid_count FROM items WHERE id = :iid"), {"iid": item_id}).one()
+    if n != len(amounts) or hb != (max(amounts) if amounts else None):
+        problems.append(f"items row says highest={hb} count={n}, bids say highest={max(amounts, default=None)} count={len(amounts)}")
+    s.commit()
+    return problems
+
+def run(n_bidders: int = 16, seconds: float = 5.0, naive: bool = False) -> int:
+    item_id, users = _setup(n_bidders)
+    try:
+        deadline = time.perf_counter() + seconds
+        with ThreadPoolExecutor(max_workers=n_bidders) as ex:
+            results = list(ex.map(lambda b: _bidder(item_id, b, deadline, naive), users[1:]))
+        placed = sum(r[0] for r in results)
+        rejected = sum(r[1] for r in results)
+        errors = sum(r[2] for r in results)
+
+        print(f"{'naive INSERT' if naive else 'place_bid()'}: {n_bidders} bidders, {seconds:g}s")
+        print(f"  placed   {placed:7d}  ({placed / seconds:8.1f} bids/s)")
+        print(f"  rejected {rejected:7d}  (outbid before the lock was granted)")
+        print(f"  errors   {errors:7d}")
+        print(f"  attempts {(placed + rejected + errors) / seconds:8.1f} /s")
+
+        problems = _check(item_id, placed)
+        for p in problems:
+            print(f"! {p}")
+        print("no lost updates." if not problems else f"{len(problems)} check(s) failed.")
+        return len(problems)
+    finally:
+        _teardown(users)
+        Session.remove()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--bidders", type=int, default=16, help="concurrent bidder threads")
+    parser.add_argument("--seconds", type=float, default=5.0, help="duration of the run")
+    parser.add_argument("--naive", action="store_true", help="use the old read-then-insert path")
+    args = parser.parse_args()
+    sys.exit(1 if run(args.bidders, args.seconds, args.naive) else 0)
@@ -0,0 +1,199 @@
+"""
+Benchmark the queries behind each screen and record latency and plans.
+
+    python -m app.bench_queries [--runs 50] [--out bench_results.json]
+    python -m app.bench_queries --generate small,medium [--seed 42]
+    python -m app.bench_queries --compare old.json [--out new.json]
+
+Runs every canonical query (Browse page / filtered page / deep page /
+near-me page / count / facets, item detail + images, My Listings count /
+page / bids, My Bids, My Purchases) against the current database, cycling through sampled
+parameters. Users are sampled in proportion to their activity, like real
+traffic. p50/p95/mean/max latency and the EXPLAIN plan of each query go to
+the JSON file, keyed by scale.
+
+--generate loads each named scale with app.gen_data (--reset) and benchmarks
+it in turn. --compare prints the change against an earlier results file,
+per scale and query, and marks plans that changed shape.
+"""
+import argparse
+import json
+import statistics
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import text
+from app.db import Session
+from app import browse, facets, geo, queries
+
+PAGE_SIZE = 12
+SAMPLES = 20  # distinct parameter sets per query
+
+def samples(s) -> dict:
+    """SAMPLES ids of each kind (items, sellers, bidders, ...) to bind into the cases, reproducibly."""
+    def col(sql):
+        return [str(v) for v in s.execute(text(sql), {"n": SAMPLES}).scalars()]
+    s.execute(text("SELECT setseed(0.42)"))  # same data -> same samples, so runs compare like for like
+    return {
+        "items": col("SELECT id FROM items ORDER BY random() LIMIT :n"),
+        # a random row's owner: busy users come up as often as they would in traffic
+        "sellers": col("SELECT seller_id FROM items ORDER BY random() LIMIT :n"),
+        "bidders": col("SELECT bidder_id FROM bids ORDER BY random() LIMIT :n"),
+        "buyers": col("""
+            SELECT b.bidder_id FROM items i JOIN bids b ON b.id = i.chosen_bid_id
+            ORDER BY random() LIMIT :n
+        """),
+        "deep_cursors": s.execute(text("""
+            SELECT created_at, id FROM items WHERE status = 'active'
+            ORDER BY random() LIMIT :n
+        """), {"n": SAMPLES}).all(),
+        "categories": col("SELECT name FROM categories ORDER BY random() LIMIT :n"),
+    }
+
+def cases(s, smp: dict) -> list:
+    """(name, sql, [bind params]) for every query a screen runs."""
+    lo, hi = s.execute(text("SELECT COALESCE(MIN(price), 0), COALESCE(MAX(price), 0) FROM items")).one()
+    where_all, p_all = browse.build_filters("All categories", "All", float(lo), float(hi))
+    filtered = [browse.build_filters(c, "College Ave", float(lo), float(hi)) for c in smp["categories"]]
+    where_f = filtered[0][0]
+    where_n, p_near = browse.build_filters("All categories", "All", float(lo), float(hi),
+                                           near=(*geo.CAMPUS_CENTERS["College Ave"], 1.0))
+
+    listing_where = "i.seller_id = :sid"
+    out = [
+        ("browse_page", browse.page_sql(where_all), [{**p_all, "limit": PAGE_SIZE + 1}]),
+        ("browse_page_filtered", browse.page_sql(where_f), [{**p, "limit": PAGE_SIZE + 1} for _, p in filtered]),
+        ("browse_page_deep", browse.page_sql(where_all, seek=True),
+         [{**p_all, "limit": PAGE_SIZE + 1, "cur_ts": ts, "cur_id": str(i)} for ts, i in smp["deep_cursors"]]),
+        ("browse_page_near", browse.page_sql(where_n, near=True), [{**p_near, "limit": PAGE_SIZE + 1}]),
+        ("browse_count", browse.count_sql(where_all, p_all), [p_all]),
+        ("browse_count_filtered", browse.count_sql(where_f, filtered[0][1]), [p for _, p in filtered]),
+        ("browse_facets", facets.facet_sql(None),
+         [{"edges": list(facets.PRICE_EDGES), "cat_name": c, "location": "College Ave",
+           "min_price": float(lo), "max_price": float(hi)} for c in smp["categories"]]),
+        ("item_detail", queries.ITEM_DETAIL_SQL, [{"iid": i} for i in smp["items"]]),
+        ("item_images", queries.ITEM_IMAGES_SQL, [{"iid": i} for i in smp["items"]]),
+        ("my_listings_count", queries.my_listings_count_sql(listing_where), [{"sid": u} for u in smp["sellers"]]),
+        ("my_listings_page", queries.my_listings_page_sql(listing_where),
+         [{"sid": u, "limit": 10, "offset": 0} for u in smp["sellers"]]),
+        ("listing_bids", queries.LISTING_BIDS_SQL, [{"ids": smp["items"][k:k + 10]} for k in range(0, SAMPLES, 10)]),
+        ("my_bids", queries.MY_BIDS_SQL, [{"uid": u} for u in smp["bidders"]]),
+        ("my_purchases", queries.MY_PURCHASES_SQL, [{"uid": u} for u in smp["buyers"]]),
+    ]
+    return [(name, sql, binds) for name, sql, binds in out if binds]
+
+def _plan_shape(node: dict, depth: int = 0) -> list:
+    """Node types (plus relation/index) in tree order, for spotting plan changes."""
+    label = node["Node Type"]
+    if "Index Name" in node:
+        label += f" using {node['Index Name']}"
+    elif "Relation Name" in node:
+        label += f" on {node['Relation Name']}"
+    out = ["  " * depth + label]
+    for child in node.get("Plans", []):
+        out += _plan_shape(child, depth + 1)
+    return out
+
+def bench_current(runs: int = 50, warmup: int = 3) -> dict:
+    """Time every case against the current database; returns one scale's results."""
+    s = Session()
+    try:
+        scale = dict(s.execute(text("""
+            SELECT (SELECT COUNT(*) FROM users) AS users, (SELECT COUNT(*) FROM items) AS items,
+                   (SELECT COUNT(*) FROM bids) AS bids, (SELECT COUNT(*) FROM item_images) AS images
+        """)).mappings().one())
+        results = {"scale": scale, "queries": {}}
+        for name, sql, binds in cases(s, samples(s)):
+            stmt = text(sql)
+            for k in range(warmup):
+                s.execute(stmt, binds[k % len(binds)]).all()
+
+            times, rows = [], 0
+            for k in range(runs):
+                t0 = time.perf_counter()
+                rows = len(s.execute(stmt, binds[k % len(binds)]).all())
+                times.append((time.perf_counter() - t0) * 1000)
+            s.rollback()
+
+            plan = s.execute(text(f"EXPLAIN (FORMAT JSON) {sql}"), binds[0]).scalar_one()
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            q = statistics.quantiles(times, n=20) if len(times) > 1 else times * 19
+            results["queries"][name] = {
+                "p50_ms": round(statistics.median(times), 3),
+                "p95_ms": round(q[18], 3),
+                "mean_ms": round(statistics.fmean(times), 3),
+                "max_ms": round(max(times), 3),
+                "runs": runs,
+                "rows": rows,
+                "plan_shape": _plan_shape(plan[0]["Plan"]),
+                "plan": plan[0]["Plan"],
+            }
+            print(f"  {name:24s} p50 {results['queries'][name]['p50_ms']:9.2f} ms"
+                  f"   p95 {results['queries'][name]['p95_ms']:9.2f} ms")
+        s.rollback()
+        return results
+    finally:
+        Session.remove()
+
+def compare(old: dict, new: dict) -> None:
+    for label, cur in new["scales"].items():
+        prev = old.get("scales", {}).get(label)
+        if not prev:
+            print(f"[{label}] not in the old results")
+            continue
+        print(f"[{label}] {prev['scale']['items']} -> {cur['scale']['items']} items")
+        for name, q in cur["queries"].items():
+            p = prev["queries"].get(name)
+            if not p:
+                print(f"  {name:24s} (new)")
+                continue
+            ratio = q["p95_ms"] / p["p95_ms"] if p["p95_ms"] else float("inf")
+            moved = abs(q["p95_ms"] - p["p95_ms"]) > 0.5  # ignore sub-millisecond jitter
+            flag = ("  slower" if ratio > 1.25 else "  faster" if ratio < 0.8 else "") if moved else ""
+            plan = "  plan changed" if q["plan_shape"] != p["plan_shape"] else ""
+            print(f"  {name:24s} p50 {p['p50_ms']:8.2f} -> {q['p50_ms']:8.2f}   "
+                  f"p95 {p['p95_ms']:8.2f} -> {q['p95_ms']:8.2f} ({ratio:5.2f}x){flag}{plan}")
+
+def run(runs: int, out: str, generate=None, seed: int = 42, compare_to: str = None) -> dict:
+    results = {"created_at": datetime.now(timezone.utc).isoformat(), "runs": runs, "scales": {}}
+    s = Session()
+    results["postgres"] = s.execute(text("SHOW server_version")).scalar_one()
+    Session.remove()
+
+    if generate:
+        from app import gen_data
+        for label in generate:
+            print(f"[{label}] generating ...")
+            gen_data.run(*gen_data.SCALES[label], seed=seed, do_reset=True)
+            print(f"[{label}] benchmarking ...")
+            results["scales"][label] = bench_current(runs)
+    else:
+        print("[current] benchmarking ...")
+        results["scales"]["current"] = bench_current(runs)
+
+    with open(out, "w") as f:
+        json.dump(results, f, indent=1, default=str)
+    print(f"wrote {out}")
+
+    if compare_to:
+        with open(compare_to) as f:
+            compare(json.load(f), results)
+    return results
+
+if __name__ == "__main__":
+    from app.gen_data import SCALES
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=50, help="timed executions per query")
+    parser.add_argument("--out", default="bench_results.json", help="results file to write")
+    parser.add_argument("--generate", help=f"comma-separated scales to load and bench ({', '.join(SCALES)})")
+    parser.add_argument("--seed", type=int, default=42, help="generator seed for --generate")
+    parser.add_argument("--compare", dest="compare_to", help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    scales = args.generate.split(",") if args.generate else None
+    for label in scales or []:
+        if label not in SCALES:
+            parser.error(f"unknown scale {label!r}")
+    run(args.runs, args.out, scales, args.seed, args.compare_to)
@@ -0,0 +1,36 @@
+"""
+Auction bid placement through the place_bid() routine in schema.sql.
+
+The routine locks the item row, so the "current highest + increment" check
+and the insert happen atomically: two bidders racing for the same amount
+cannot both win. Everything is one round trip.
+"""
+import os
+from decimal import Decimal
+from typing import Optional, Tuple
+
+from sqlalchemy import text
+
+BID_MIN_INCREMENT = Decimal(os.getenv("BID_MIN_INCREMENT", "1.00"))
+
+def min_next_bid(highest_bid) -> Decimal:
+    """Smallest acceptable bid given the current highest (None = no bids yet)."""
+    return (Decimal(str(highest_bid)) if highest_bid is not None else Decimal("0")) + BID_MIN_INCREMENT
+
+def place_bid(s, item_id: str, bidder_id: str, amount) -> Tuple[bool, str, Optional[Decimal]]:
+    """
+    Place a bid and commit; returns (ok, message, highest_bid_after).
+    On rejection nothing is written and highest_bid is the value the bid
+    lost against, so the form can show an up-to-date minimum.
+    """
+    try:
+        r = s.execute(
+            text("SELECT * FROM place_bid(:iid, :bidder, :amt, :inc)"),
+            {"iid": str(item_id), "bidder": str(bidder_id),
+             "amt": Decimal(str(amount)), "inc": BID_MIN_INCREMENT},
+        ).mappings().one()
+        s.commit()
+    except Exception:
+        s.rollback()
+        raise
+    return r["ok"], r["message"], r["highest_bid"]
@@ -0,0 +1,157 @@
+"""
+Browse feed queries: keyset-paginated pages and cheap result counts.
+
+Browse reads the item_cards table (schema.sql), which carries the category
+name, seller, cover image and bid stats of every listing and is kept in
+step with the source tables by triggers: a page is an index range scan on
+one table, with no joins. Filters are written against item_cards i.
+
+Pages seek on (created_at, id) instead of OFFSET, so page N costs the same
+as page 1 and stays on the idx_item_cards_* index for the filters in use.
+Counts are served from a short-lived in-process cache (or a planner
+estimate) instead of running a full COUNT(*) on every rerun.
+
+"Near me" pages (build_filters(..., near=...)) are sorted by distance
+instead and seek on (distance, id); see app/geo.py.
+"""
+import json
+import os
+import threading
+from typing import Optional, Tuple
+
+from cachetools import TTLCache
+from sqlalchemy import text
+from app import geo
+
+COUNT_MODE = os.getenv("BROWSE_COUNT_MODE", "cached")  # cached | estimate | exact
+COUNT_TTL = float(os.getenv("BROWSE_COUNT_TTL", "60"))  # seconds
+
+_count_cache = TTLCache(maxsize=1024, ttl=COUNT_TTL)
+_count_lock = threading.Lock()
+
+# Cover image for one item, as a LATERAL join (top-1 probe on idx_item_images_cover);
+# for the per-user screens, Browse has it in item_cards.
+COVER_IMAGE_SQL = """
+    SELECT ii.image_path, ii.variants
+    FROM item_images ii
+    WHERE ii.item_id = {item}
+    -- prefer primary image; else first by sort_order
+    ORDER BY ii.is_primary DESC, ii.sort_order ASC, ii.created_at ASC
+    LIMIT 1
+"""
+
+def build_filters(cat_name: str, location: str, min_price: float, max_price: float,
+                  near: Optional[Tuple[float, float, float]] = None) -> Tuple[str, dict]:
+    """
+    WHERE clause (over item_cards i) + params for the Browse filter bar.
+    "All categories" / "All" mean no filter; `near` is (lat, lng, radius in miles).
+    """
+    where = ["i.status = 'active'"]
+    params = {}
+
+    if cat_name != "All categories":
+        where.append("i.category = :cat_name")
+        params["cat_name"] = cat_name
+
+    if location != "All":
+        where.append("i.pickup_campus = :location")
+        params["location"] = location
+
+    where.append("i.price BETWEEN :min_price AND :max_price")
+    params["min_price"] = min_price
+    params["max_price"] = max_price
+
+    if near is not None:
+        near_sql, near_params = geo.near_filter(*near)
+        where.append(near_sql)
+        params.update(near_params)
+
+    return " AND ".join(where), params
+
+def page_sql(where_sql: str, seek: bool = False, near: bool = False) -> str:
+    """
+    SQL for one Browse page (params: the filter params, :limit, plus :cur_ts /
+    :cur_id when `seek`). With `near` (filters built with near=...) rows come nearest first, carry
+    distance_mi, and seek on :cur_d / :cur_id.
+    """
+    if near:
+        distance = f"{geo.DISTANCE_SQL} AS distance_mi"
+        seek_sql = f"AND ({geo.DISTANCE_SQL}, i.id) > (:cur_d, CAST(:cur_id AS uuid))" if seek else ""
+        order = "distance_mi, i.id"
+    else:
+        distance = "NULL::float8 AS distance_mi"
+        # created_at <= :ts is the index range; the OR breaks ties on id
+        seek_sql = "AND i.created_at <= :cur_ts AND (i.created_at < :cur_ts OR i.id < :cur_id)" if seek else ""
+        order = "i.created_at DESC, i.id DESC"
+
+    return f"""
+        SELECT i.id, i.title, i.price, i.created_at,
+               COALESCE(i.category, 'Uncategorized') AS category,
+               i.seller_email, i.image_path, i.variants,
+               i.pickup_location,
+               {distance}
+        FROM item_cards i
+        WHERE {where_sql}
+        {seek_sql}
+        ORDER BY {order}
+        LIMIT :limit
+    """
+
+def fetch_page(s, where_sql: str, params: dict, cursor: Optional[tuple], limit: int, near: bool = False):
+    """
+    One page of active listings, newest first (nearest first with `near`).
+    `cursor` is the (created_at, id) - or (distance_mi, id) - of the last row
+    of the previous page, or None for the first page. Returns (rows,
+    next_cursor); next_cursor is None on the last page.
+    """
+    if cursor is not None:
+        key = "cur_d" if near else "cur_ts"
+        params = {**params, key: cursor[0], "cur_id": str(cursor[1])}
+    list_sql = text(page_sql(where_sql, seek=cursor is not None, near=near))
+
+    # fetch one extra row to learn whether a next page exists
+    rows = s.execute(list_sql, {**params, "limit": limit + 1}).mappings().all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, (rows[-1]["distance_mi" if near else "created_at"], rows[-1]["id"])
+
+def count_sql(where_sql: str, params: dict) -> str:
+    """COUNT(*) over the filtered Browse set (same WHERE as page_sql)."""
+    return f"SELECT COUNT(*) FROM item_cards i WHERE {where_sql}"
+
+def _estimate(s, where_sql: str, params: dict) -> int:
+    """Planner row estimate for the filtered set; no rows are read."""
+    plan = s.execute(text(f"EXPLAIN (FORMAT JSON) {count_sql(where_sql, params)}"), params).scalar_one()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    node = plan[0]["Plan"]
+    # skip the Aggregate node; its child carries the filtered estimate
+    return int(node["Plans"][0]["Plan Rows"]) if node.get("Plans") else int(node["Plan Rows"])
+
+def count_items(s, where_sql: str, params: dict, mode: Optional[str] = None) -> Tuple[int, bool]:
+    """
+    Number of listings matching the filters. Returns (count, is_estimate).
+    mode: 'exact' always counts, 'cached' counts at most once per COUNT_TTL
+    per filter combination, 'estimate' asks the planner.
+    """
+    mode = mode or COUNT_MODE
+    if mode == "estimate":
+        return _estimate(s, where_sql, params), True
+    if mode == "exact":
+        return s.execute(text(count_sql(where_sql, params)), params).scalar_one(), False
+
+    key = (where_sql, tuple(sorted(params.items())))
+    with _count_lock:
+        hit = _count_cache.get(key)
+    if hit is not None:
+        return hit, False
+    total = s.execute(text(count_sql(where_sql, params)), params).scalar_one()
+    with _count_lock:
+        _count_cache[key] = total
+    return total, False
+
+def invalidate_counts() -> None:
+    """Drop cached counts, e.g. after a listing is posted or closed."""
+    with _count_lock:
+        _count_cache.clear()
@@ -0,0 +1,274 @@
+"""
+Bulk-post listings from a spreadsheet export (move-out events).
+
+    python -m app.bulk_import listings.csv --images photos/ --seller staff@rutgers.edu
+        [--batch 1000] [--workers N] [--errors errors.csv] [--dry-run]
+
+Input is CSV (header row) or JSONL (one object per line, .jsonl/.ndjson),
+read as a stream. Fields:
+
+    title, description, price          required
+    category                           a category name, as in seed_categories.sql
+    image                              file name(s) under --images, ';'-separated, first is primary
+    listing_type                       auction | fixed (default fixed)
+    pickup_campus, pickup_location     optional; campus must be one of CAMPUSES, coordinates
+                                       come from app.geo like the post form
+    auction_days                       optional, auctions only: closes after N days
+    seller_email                       optional, overrides --seller
+
+Each batch is validated, its images are stored and resized in parallel
+worker processes (same content-addressed store and variants as the post
+form), then items and item_images are written with COPY, matched against
+saved searches (app.alerts) and committed.
+Bad rows are skipped and reported with their line number. If a batch
+trips a database constraint, it is retried row by row so only the
+offending rows are dropped.
+"""
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import sys
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from sqlalchemy import text
+from app import alerts, catalog, geo
+from app.db import Session, copy_rows
+from app.utils import get_upload_root, restore_saved_image
+
+CAMPUSES = ("Busch", "College Ave", "Livingston", "Cook Douglas")  # same choices as the post form
+ITEM_COLS = ("id", "seller_id", "title", "description", "price", "category_id", "status", "listing_type",
+             "buy_now_price", "pickup_location", "pickup_campus", "pickup_lat", "pickup_lng", "auction_end_at")
+MAX_PRICE = Decimal("100000000")  # NUMERIC(10,2)
+IMAGE_COLS = ("item_id", "image_path", "is_primary", "sort_order", "variants")
+
+def read_rows(path: str):
+    """Yield (line_number, dict) without loading the file."""
+    if path.endswith((".jsonl", ".ndjson")):
+        with open(path, encoding="utf-8") as f:
+            for n, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError as e:
+                    row = {"_error": f"invalid JSON: {e}"}
+                yield n, row if isinstance(row, dict) else {"_error": "expected a JSON object"}
+    else:
+        with open(path, encoding="utf-8-sig", newline="") as f:
+            reader = csv.DictReader(f)
+            for row in reader:
+                yield reader.line_num, row
+
+def _store_image(abs_path: str, upload_root: str):
+    """Worker: save one image like an upload; returns (ok, rel_or_err, variants)."""
+    from app.utils import save_uploaded_image
+    try:
+        with open(abs_path, "rb") as f:
+            return save_uploaded_image(f, upload_root)
+    except OSError as e:
+        return False, f"cannot read {os.path.basename(abs_path)}: {e.strerror}", []
+
+class Importer:
+    def __init__(self, images_dir: str, default_seller: str, workers: int, dry_run: bool = False):
+        self.images_dir = os.path.realpath(images_dir)
+        self.upload_root = get_upload_root()
+        self.default_seller = (default_seller or "").strip().lower()
+        self.dry_run = dry_run
+        self.workers = workers
+        self.pool = None
+        self.sellers = {}  # email -> user id (None if unknown)
+        self.categories = {}
+        self.imported = 0
+        self.errors = []   # (line, title, message)
+
+    def __enter__(self):
+        self.categories = {name.lower(): cid for name, cid in catalog.categories()}
+        if self.workers > 0 and not self.dry_run:
+            self.pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self
+
+    def __exit__(self, *exc):
+        if self.pool:
+            self.pool.shutdown()
+        Session.remove()
+
+    def _fail(self, line: int, row: dict, msg: str) -> None:
+        self.errors.append((line, (row.get("title") or "").strip(), msg))
+        print(f"line {line}: {msg}", file=sys.stderr)
+
+    def _resolve_sellers(self, s, emails) -> None:
+        missing = [e for e in emails if e not in self.sellers]
+        if missing:
+            found = dict(s.execute(text("SELECT email, id FROM users WHERE email = ANY(:emails)"),
+                                   {"emails": missing}).all())
+            for e in missing:
+                self.sellers[e] = str(found[e]) if e in found else None
+
+    def _validate(self, line: int, row: dict, now: datetime):
+        """Item tuple + image file list for a good row, or an error message."""
+        if "_error" in row:
+            return row["_error"]
+        get = lambda k: str(row.get(k) or "").strip()
+
+        title, description = get("title"), get("description")
+        if not title or not description:
+            return "title and description are required"
+        try:
+            price = Decimal(get("price"))
+        except InvalidOperation:
+            return f"bad price {get('price')!r}"
+        if not price.is_finite() or price < 0 or price >= MAX_PRICE:
+            return f"price must be between 0 and {MAX_PRICE}"
+        price = price.quantize(Decimal("0.01"))
+
+        cat_id = self.categories.get(get("category").lower())
+        if not cat_id:
+            return f"unknown category {get('category')!r}"
+        listing_type = get("listing_type").lower() or "fixed"
+        if listing_type not in ("auction", "fixed"):
+            return f"listing_type must be auction or fixed, not {listing_type!r}"
+        campus = get("pickup_campus") or None
+        if campus and campus not in CAMPUSES:
+            return f"unknown campus {campus!r} (one of {', '.join(CAMPUSES)})"
+
+        end_at = None
+        if get("auction_days"):
+            try:
+                days = float(get("auction_days"))
+            except ValueError:
+                return f"bad auction_days {get('auction_days')!r}"
+            if listing_type != "auction" or days <= 0:
+                return "auction_days needs a positive number on an auction"
+            end_at = now + timedelta(days=days)
+
+        seller_id = self.sellers.get(get("seller_email").lower() or self.default_seller)
+        if not seller_id:
+            return f"unknown seller {get('seller_email') or self.default_seller!r}"
+
+        images = []
+        for name in filter(None, (p.strip() for p in get("image").split(";"))):
+            abs_path = os.path.realpath(os.path.join(self.images_dir, name))
+            if not abs_path.startswith(self.images_dir + os.sep):
+                return f"image {name!r} is outside the images directory"
+            if not os.path.isfile(abs_path):
+                return f"image {name!r} not found"
+            images.append(abs_path)
+        if not images:
+            return "at least one image is required"
+
+        lat, lng = geo.geocode(get("pickup_location"), campus)
+        item = (str(uuid.uuid4()), seller_id, title, description, price, cat_id, "active", listing_type,
+                price if listing_type == "fixed" else None, get("pickup_location") or None, campus, lat, lng, end_at)
+        return item, images
+
+    def _store_images(self, paths):
+        unique = list(dict.fromkeys(paths))
+        if self.pool:
+            results = self.pool.map(_store_image, unique, [self.upload_root] * len(unique), chunksize=8)
+        else:
+            results = (_store_image(p, self.upload_root) for p in unique)
+        return dict(zip(unique, results))
+
+    def _restore_images(self, stored, paths) -> None:
+        """After commit: rewrite files an image_gc sweep removed between the dedupe hit and the insert."""
+        for p in dict.fromkeys(paths):
+            _, rel_path, variants = stored[p]
+            with open(p, "rb") as f:
+                restore_saved_image(f, self.upload_root, rel_path, variants)
+
+    def _write(self, s, items, images) -> None:
+        copy_rows(s, "items", ITEM_COLS, items)
+        copy_rows(s, "item_images", IMAGE_COLS, images)
+        # (id, seller, category, campus, price, title, description) for saved-search alerts
+        alerts.match_listings(s, [(it[0], it[1], it[5], it[10], it[4], it[2], it[3]) for it in items])
+
+    def batch(self, rows) -> None:
+        now = datetime.now(timezone.utc)
+        s = Session()
+        self._resolve_sellers(s, {str(r.get("seller_email") or "").strip().lower() or self.default_seller
+                                  for _, r in rows})
+
+        good = []
+        for line, row in rows:
+            res = self._validate(line, row, now)
+            if isinstance(res, str):
+                self._fail(line, row, res)
+            else:
+                good.append((line, row, *res))
+        if self.dry_run:
+            self.imported += len(good)
+            return
+
+        stored = self._store_images([p for *_, paths in good for p in paths])
+        ready = []  # (line, row, item, image rows)
+        for line, row, item, paths in good:
+            bad = next((stored[p][1] for p in paths if not stored[p][0]), None)
+            if bad:
+                self._fail(line, row, f"image: {bad}")
+                continue
+            ready.append((line, row, item, [
+                (item[0], stored[p][1], k == 0, k, stored[p][2]) for k, p in enumerate(paths)
+            ]))
+
+        try:
+            self._write(s, [r[2] for r in ready], [img for r in ready for img in r[3]])
+            s.commit()
+            self.imported += len(ready)
+            committed = {r[2][0] for r in ready}
+        except Exception:
+            s.rollback()
+            # find the offending rows; everything else still goes in
+            committed = set()
+            for line, row, item, imgs in ready:
+                try:
+                    with s.begin_nested():
+                        self._write(s, [item], imgs)
+                    self.imported += 1
+                    committed.add(item[0])
+                except Exception as e:
+                    self._fail(line, row, f"rejected by database: {str(getattr(e, 'orig', e)).strip().splitlines()[0]}")
+            s.commit()
+        self._restore_images(stored, [p for _, _, item, paths in good if item[0] in committed for p in paths])
+
+def run(path: str, images_dir: str, seller: str, batch_size: int = 1000, workers: int = None,
+        errors_out: str = None, dry_run: bool = False) -> int:
+    if workers is None:
+        workers = os.cpu_count() or 1
+    t0 = time.perf_counter()
+    with Importer(images_dir, seller, workers, dry_run) as imp:
+        rows = read_rows(path)
+        while True:
+            chunk = list(islice(rows, batch_size))
+            if not chunk:
+                break
+            imp.batch(chunk)
+            print(f"imported {imp.imported}, failed {len(imp.errors)}", end="\r", flush=True)
+    print()
+
+    if errors_out and imp.errors:
+        with open(errors_out, "w", newline="") as f:
+            w = csv.writer(f)
+            w.writerow(["line", "title", "error"])
+            w.writerows(imp.errors)
+    verb = "would import" if dry_run else "imported"
+    print(f"{verb} {imp.imported} listing(s), {len(imp.errors)} failed, in {time.perf_counter() - t0:.1f}s")
+    return len(imp.errors)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("file", help="CSV or JSONL file")
+    parser.add_argument("--images", required=True, help="directory the image column refers to")
+    parser.add_argument("--seller", default="", help="email of the posting account (per-row seller_email wins)")
+    parser.add_argument("--batch", type=int, default=1000, help="rows per COPY / transaction")
+    parser.add_argument("--workers", type=int, help="image processes (default: CPU count, 0 = inline)")
+    parser.add_argument("--errors", help="write failed rows to this CSV")
+    parser.add_argument("--dry-run", action="store_true", help="validate only; no images or rows written")
+    args = parser.parse_args()
+    sys.exit(1 if run(args.file, args.images, args.seller, args.batch, args.workers, args.errors, args.dry_run) else 0)
@@ -0,0 +1,83 @@
+"""
+In-process cache for reference data shown on every rerun: the category list
+and the price range of active listings.
+
+Both are kept for CATALOG_TTL seconds. Writes in this process adjust the
+bounds in place (note_item_posted / note_item_closed) so the slider stays
+right without going back to Postgres; other processes catch up on expiry.
+"""
+import os
+import threading
+import time
+from typing import List, Optional, Tuple
+
+from sqlalchemy import text
+from app.db import Session
+from app.models import Category
+
+CATALOG_TTL = float(os.getenv("CATALOG_TTL", "300"))  # seconds
+
+_lock = threading.Lock()
+_categories = None  # (expires_at, [(name, id), ...])
+_bounds = None      # (expires_at, (min_price, max_price))
+
+def categories() -> List[Tuple[str, str]]:
+    """All categories as (name, id) pairs, ordered by name."""
+    global _categories
+    with _lock:
+        cached = _categories
+    if cached and cached[0] > time.monotonic():
+        return cached[1]
+
+    s = Session()
+    cats = [(c.name, str(c.id)) for c in s.query(Category).order_by(Category.name).all()]
+
+    with _lock:
+        _categories = (time.monotonic() + CATALOG_TTL, cats)
+    return cats
+
+def price_bounds() -> Tuple[Optional[float], Optional[float]]:
+    """(min, max) price over active listings; (None, None) when there are none."""
+    global _bounds
+    with _lock:
+        cached = _bounds
+    if cached and cached[0] > time.monotonic():
+        return cached[1]
+
+    s = Session()
+    lo, hi = s.execute(text("SELECT MIN(price), MAX(price) FROM items WHERE status = 'active'")).one()
+
+    bounds = (float(lo) if lo is not None else None, float(hi) if hi is not None else None)
+    with _lock:
+        _bounds = (time.monotonic() + CATALOG_TTL, bounds)
+    return bounds
+
+def note_item_posted(price: float) -> None:
+    """A new active listing can only widen the range."""
+    global _bounds
+    price = float(price)
+    with _lock:
+        if not _bounds:
+            return
+        expires, (lo, hi) = _bounds
+        lo = price if lo is None else min(lo, price)
+        hi = price if hi is None else max(hi, price)
+        _bounds = (expires, (lo, hi))
+
+def note_item_closed(price: float) -> None:
+    """
+    A listing left the active set. Only when it sat on the edge of the range
+    do we need the database again, and then only on the next read.
+    """
+    global _bounds
+    price = float(price)
+    with _lock:
+        if _bounds and price in _bounds[1]:
+            _bounds = None
+
+def invalidate() -> None:
+    """Forget everything, e.g. after categories are edited."""
+    global _categories, _bounds
+    with _lock:
+        _categories = None
+        _bounds = None
@@ -0,0 +1,69 @@
+"""
+Check that the cached unread-alert badge picks up new matches.
+
+    python -m app.check_alert_badge
+
+Inside a transaction that is rolled back at the end, gives a scratch user a
+saved search and feeds alerts.cached_unread_count() new matches with live
+updates off (LIVE_UPDATES=0, the count must refresh once the cached value
+is UNREAD_TTL_SECONDS old) and on (it must refresh when app.live reports an
+alert event for the user). Exits non-zero if any step shows a stale count.
+"""
+import sys
+
+from sqlalchemy import text
+from app.db import Session
+from app import alerts, live
+
+def _add_match(s, search_id, user_id, seller_id, n: int) -> None:
+    item_id = s.execute(text("""
+        INSERT INTO items (seller_id, title, description, price)
+        VALUES (:sid, 'badge check ' || :n, 'x', 5)
+        RETURNING id
+    """), {"sid": seller_id, "n": n}).scalar_one()
+    s.execute(text("INSERT INTO saved_search_matches (search_id, item_id, user_id) VALUES (:ss, :i, :u)"),
+              {"ss": search_id, "i": item_id, "u": user_id})
+
+def run() -> bool:
+    ttl = alerts.UNREAD_TTL_SECONDS
+    checks = []
+    s = Session()
+    try:
+        buyer, seller = [str(u) for u in s.execute(text("""
+            INSERT INTO users (name, email, password_hash)
+            SELECT 'Badge Check ' || g, 'badge-check-' || g || '@rutgers.edu', 'x'
+            FROM generate_series(1, 2) g
+            ORDER BY g
+            RETURNING id
+        """)).scalars().all()]
+        search_id = s.execute(text("INSERT INTO saved_searches (user_id, keywords) VALUES (:u, 'badge') RETURNING id"),
+                              {"u": buyer}).scalar_one()
+
+        # live updates off: only the TTL refreshes the count
+        cache = {}
+        checks.append(("first render counts", alerts.cached_unread_count(s, cache, buyer, False, now=0.0) == 0))
+        _add_match(s, search_id, buyer, seller, 1)
+        checks.append(("live off: cached within the TTL",
+                       alerts.cached_unread_count(s, cache, buyer, False, now=ttl / 2) == 0))
+        checks.append(("live off: recounted after the TTL",
+                       alerts.cached_unread_count(s, cache, buyer, False, now=ttl) == 1))
+
+        # live updates on: an alert event for the user refreshes it, the clock doesn't matter
+        cache = {}
+        alerts.cached_unread_count(s, cache, buyer, True, now=0.0)
+        _add_match(s, search_id, buyer, seller, 2)
+        checks.append(("live on: cached without an event",
+                       alerts.cached_unread_count(s, cache, buyer, True, now=10 * ttl) == 1))
+        live._dispatch(f'{{"kind": "alert", "user_id": "{buyer}"}}')  # what the listener does on NOTIFY
+        checks.append(("live on: recounted after an alert event",
+                       alerts.cached_unread_count(s, cache, buyer, True, now=10 * ttl) == 2))
+    finally:
+        s.rollback()
+        Session.remove()
+
+    for name, ok in checks:
+        print(f"{'ok  ' if ok else 'FAIL'} {name}")
+    return all(ok for _, ok in checks)
+
+if __name__ == "__main__":
+    sys.exit(0 if run() else 1)
@@ -0,0 +1,72 @@
+"""
+Check that closing an auction never awards it to a declined bid.
+
+    python -m app.check_auction_close
+
+Inside a transaction that is rolled back at the end, sets up two expired
+auctions: one with a declined high bid and a lower pending bid, one whose
+only bid was declined. Runs the auction worker's close statement on them
+and exits non-zero unless the first is sold to the pending bid (the
+declined one staying declined) and the second is closed with no winner.
+"""
+import sys
+
+from sqlalchemy import text
+from app.db import get_engine
+from app.auction_worker import CLOSE_DUE_SQL
+
+def run() -> bool:
+    with get_engine().connect() as conn:
+        tx = conn.begin()
+        try:
+            seller, bidder_a, bidder_b = conn.execute(text("""
+                INSERT INTO users (name, email, password_hash)
+                SELECT 'Close Check ' || g, 'close-check-' || g || '@rutgers.edu', 'x'
+                FROM generate_series(1, 3) g
+                ORDER BY g
+                RETURNING id
+            """)).scalars().all()
+
+            # ended long before anything real, so the close statement takes these first
+            mixed, all_declined = conn.execute(text("""
+                INSERT INTO items (seller_id, title, description, price, listing_type, auction_end_at)
+                SELECT :sid, 'close check ' || g, 'x', 10, 'auction', TIMESTAMPTZ '2000-01-01' + g * INTERVAL '1 second'
+                FROM generate_series(1, 2) g
+                ORDER BY g
+                RETURNING id
+            """), {"sid": seller}).scalars().all()
+
+            bid = text("""
+                INSERT INTO bids (item_id, bidder_id, amount, status)
+                VALUES (:item, :bidder, :amount, :status)
+                RETURNING id
+            """)
+            declined_high = conn.execute(bid, {"item": mixed, "bidder": bidder_a, "amount": 50, "status": "declined"}).scalar_one()
+            pending_low = conn.execute(bid, {"item": mixed, "bidder": bidder_b, "amount": 20, "status": "pending"}).scalar_one()
+            conn.execute(bid, {"item": all_declined, "bidder": bidder_a, "amount": 30, "status": "declined"})
+
+            conn.execute(CLOSE_DUE_SQL, {"n": 2})
+
+            items = {r.id: r for r in conn.execute(text("""
+                SELECT id, status, chosen_bid_id FROM items WHERE id IN (:a, :b)
+            """), {"a": mixed, "b": all_declined})}
+            bids = dict(conn.execute(text("""
+                SELECT id, status FROM bids WHERE item_id IN (:a, :b)
+            """), {"a": mixed, "b": all_declined}).all())
+        finally:
+            tx.rollback()
+
+    checks = [
+        ("declined high bid loses to the pending one",
+         items[mixed].status == "sold" and items[mixed].chosen_bid_id == pending_low),
+        ("winning bid accepted, declined bid stays declined",
+         bids[pending_low] == "accepted" and bids[declined_high] == "declined"),
+        ("only declined bids: closed without a winner",
+         items[all_declined].status == "closed" and items[all_declined].chosen_bid_id is None),
+    ]
+    for name, ok in checks:
+        print(f"{'ok  ' if ok else 'FAIL'} {name}")
+    return all(ok for _, ok in checks)
+
+if __name__ == "__main__":
+    sys.exit(0 if run() else 1)
@@ -0,0 +1,72 @@
+"""
+Verify items.highest_bid / bid_count / last_bid_at against the bids table.
+
+    python -m app.check_bid_stats [--fix] [--batch 5000]
+
+Walks items in id order, recomputes the stats for each batch from bids and
+reports every mismatch. With --fix, mismatched rows are corrected in the
+same pass. Exits non-zero if anything was out of sync.
+"""
+import argparse
+import sys
+
+from sqlalchemy import text
+from app.db import Session
+
+def run(fix: bool = False, batch_size: int = 5000) -> int:
+    bad = 0
+    last_id = None
+
+    s = Session()
+    try:
+        while True:
+            rows = s.execute(text("""
+                WITH batch AS (
+                    SELECT id, highest_bid, bid_count, last_bid_at
+                    FROM items
+                    WHERE CAST(:after AS uuid) IS NULL OR id > CAST(:after AS uuid)
+                    ORDER BY id
+                    LIMIT :n
+                )
+                SELECT b.id, b.highest_bid, b.bid_count, b.last_bid_at,
+                       agg.highest_bid AS real_highest, COALESCE(agg.bid_count, 0) AS real_count,
+                       agg.last_bid_at AS real_last,
+                       (b.highest_bid IS DISTINCT FROM agg.highest_bid
+                        OR b.bid_count <> COALESCE(agg.bid_count, 0)
+                        OR b.last_bid_at IS DISTINCT FROM agg.last_bid_at) AS mismatch
+                FROM batch b
+                LEFT JOIN LATERAL (
+                    SELECT MAX(amount) AS highest_bid, COUNT(*) AS bid_count, MAX(placed_at) AS last_bid_at
+                    FROM bids WHERE item_id = b.id
+                ) agg ON TRUE
+                ORDER BY b.id
+            """), {"after": last_id, "n": batch_size}).mappings().all()
+            if not rows:
+                break
+
+            for r in rows:
+                if not r["mismatch"]:
+                    continue
+                bad += 1
+                print(f"! {r['id']}: highest {r['highest_bid']} vs {r['real_highest']}, "
+                      f"count {r['bid_count']} vs {r['real_count']}, last {r['last_bid_at']} vs {r['real_last']}")
+                if fix:
+                    s.execute(text("""
+                        UPDATE items
+                        SET highest_bid = :hb, bid_count = :n, last_bid_at = :last
+                        WHERE id = :id
+                    """), {"hb": r["real_highest"], "n": r["real_count"], "last": r["real_last"], "id": r["id"]})
+            s.commit()
+            last_id = str(rows[-1]["id"])
+    finally:
+        s.close()
+
+    print(f"{bad} item(s) out of sync" + (" (fixed)." if fix and bad else "."))
+    return bad
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--fix", action="store_true", help="correct mismatched rows")
+    parser.add_argument("--batch", type=int, default=5000, help="items per transaction")
+    args = parser.parse_args()
+    sys.exit(1 if run(args.fix, args.batch) else 0)
@@ -0,0 +1,126 @@
+"""
+Check that cover-image resolution stays flat as item_images grows.
+
+    python -m app.check_cover_plan
+
+Browse reads covers from item_cards; they are resolved from item_images in
+three places, each a top-1 probe per listing on idx_item_images_cover:
+
+  * card_refresh: item_card_source, which refresh_item_cards() reads when a
+    listing or its images are written;
+  * my_listings: the COVER_IMAGE_SQL lateral on a My Listings page;
+  * history: the HISTORY_COVER_IMAGE_SQL lateral of My Bids / My Purchases.
+
+Inside a transaction that is rolled back at the end, posts one page worth
+of fresh listings, then keeps adding older listings (same seller) with
+several images each. After every step it runs EXPLAIN (ANALYZE, BUFFERS)
+on each path for the fresh page and records how many image rows were
+touched. Exits non-zero if that number grows, an image table is ever
+sequentially scanned, or a path stops reading images at all.
+"""
+import sys
+
+from sqlalchemy import text
+from app.db import get_engine
+from app import queries
+
+PAGE_SIZE = 9
+IMAGES_PER_OLD_ITEM = 4
+SCALES = (1_000, 10_000, 50_000)  # older listings present at each measurement
+IMAGE_TABLES = ("item_images", "item_images_archive")
+
+PATHS = {
+    "card_refresh": "SELECT * FROM item_card_source WHERE id = ANY(CAST(:ids AS uuid[]))",
+    "my_listings": queries.my_listings_page_sql("i.seller_id = :sid"),
+    "history": f"""
+        SELECT p.id, img.image_path
+        FROM unnest(CAST(:ids AS uuid[])) AS p(id)
+        LEFT JOIN LATERAL ({queries.HISTORY_COVER_IMAGE_SQL.format(item="p.id")}) img ON TRUE
+    """,
+}
+
+def _walk(node):
+    yield node
+    for child in node.get("Plans", []):
+        yield from _walk(child)
+
+def _measure(conn, sql, params):
+    plan = conn.execute(text(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}"), params).scalar_one()
+    root = plan[0]["Plan"]
+    image_nodes = [n for n in _walk(root) if n.get("Relation Name") in IMAGE_TABLES]
+    return {
+        "image_rows": sum(n["Actual Rows"] * n["Actual Loops"] + n.get("Rows Removed by Filter", 0) for n in image_nodes),
+        "seq_scan": any(n["Node Type"] == "Seq Scan" for n in image_nodes),
+        "buffers": root.get("Shared Hit Blocks", 0) + root.get("Shared Read Blocks", 0),
+        "ms": plan[0]["Execution Time"],
+    }
+
+def run() -> bool:
+    results = {name: [] for name in PATHS}
+
+    with get_engine().connect() as conn:
+        tx = conn.begin()
+        try:
+            seller = conn.execute(text("""
+                INSERT INTO users (name, email, password_hash)
+                VALUES ('Plan Check', 'plan-check@rutgers.edu', 'x')
+                RETURNING id
+            """)).scalar_one()
+
+            # the page we will be looking at: newest listings, one image each
+            page_ids = [str(i) for i in conn.execute(text("""
+                WITH new_items AS (
+                    INSERT INTO items (seller_id, title, description, price, created_at)
+                    SELECT :sid, 'page item ' || g, 'fresh', 10, NOW() + g * INTERVAL '1 second'
+                    FROM generate_series(1, :n) g
+                    RETURNING id
+                ),
+                imgs AS (
+                    INSERT INTO item_images (item_id, image_path, is_primary)
+                    SELECT id, 'plan-check/' || id || '.jpg', TRUE FROM new_items
+                )
+                SELECT id FROM new_items
+            """), {"sid": seller, "n": PAGE_SIZE}).scalars()]
+            params = {"ids": page_ids, "sid": seller, "limit": PAGE_SIZE, "offset": 0}
+
+            added = 0
+            for target in SCALES:
+                if target > added:
+                    conn.execute(text("""
+                        WITH old_items AS (
+                            INSERT INTO items (seller_id, title, description, price, created_at)
+                            SELECT :sid, 'old item ' || g, 'stale', 10, NOW() - INTERVAL '1 year' - g * INTERVAL '1 second'
+                            FROM generate_series(1, :n) g
+                            RETURNING id
+                        )
+                        INSERT INTO item_images (item_id, image_path, is_primary, sort_order)
+                        SELECT id, 'plan-check/' || id || '-' || k || '.jpg', k = 0, k
+                        FROM old_items, generate_series(0, :k - 1) k
+                    """), {"sid": seller, "n": target - added, "k": IMAGES_PER_OLD_ITEM})
+                    added = target
+                conn.execute(text("ANALYZE items"))
+                conn.execute(text("ANALYZE item_images"))
+
+                total = conn.execute(text("SELECT COUNT(*) FROM item_images")).scalar_one()
+                for name, sql in PATHS.items():
+                    m = _measure(conn, sql, params)
+                    results[name].append(m)
+                    print(f"{name:13s} item_images={total:>8}  touched={m['image_rows']:>4}  "
+                          f"buffers={m['buffers']:>5}  seq_scan={m['seq_scan']}  {m['ms']:.2f} ms")
+        finally:
+            tx.rollback()
+
+    ok = True
+    for name, ms in results.items():
+        if ms[0]["image_rows"] == 0:
+            print(f"FAIL: {name} read no image rows; the check no longer measures its cover lookup.")
+            ok = False
+        elif not all(m["image_rows"] <= ms[0]["image_rows"] and not m["seq_scan"] for m in ms):
+            print(f"FAIL: {name} cover lookup grows with item_images.")
+            ok = False
+    if ok:
+        print("OK: cover lookups are flat.")
+    return ok
+
+if __name__ == "__main__":
+    sys.exit(0 if run() else 1)
@@ -0,0 +1,65 @@
+"""
+Check that the core modules import fast and without Streamlit.
+
+    python -m app.check_import_time [--budget 0.75] [--repeat 3]
+
+Imports each module in a fresh interpreter (best of --repeat) and fails if
+it takes longer than the budget, pulls in streamlit, or builds the database
+engine at import time. CLIs and workers import these, so this is their
+start-up cost. Run it after touching imports in any of them.
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+MODULES = (
+    "app.db", "app.models", "app.auth", "app.security", "app.utils", "app.alerts",
+    "app.bids", "app.browse", "app.catalog", "app.facets", "app.geo", "app.live", "app.search", "app.queries",
+    "app.auction_worker", "app.archive_worker", "app.image_gc", "app.bulk_import",
+)
+
+_PROBE = """
+import json, sys, time
+t0 = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - t0
+db = sys.modules.get("app.db")
+print(json.dumps({{
+    "seconds": elapsed,
+    "streamlit": "streamlit" in sys.modules,
+    "engine_built": bool(db and db._engine is not None),
+}}))
+"""
+
+def probe(module: str, repeat: int) -> dict:
+    best = None
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-c", _PROBE.format(module=module)],
+                             capture_output=True, text=True, check=True).stdout
+        r = json.loads(out.strip().splitlines()[-1])
+        if best is None or r["seconds"] < best["seconds"]:
+            best = r
+    return best
+
+def run(budget: float = 0.75, repeat: int = 3) -> int:
+    failures = 0
+    for module in MODULES:
+        r = probe(module, repeat)
+        problems = []
+        if r["seconds"] > budget:
+            problems.append(f"over budget ({budget:.2f}s)")
+        if r["streamlit"]:
+            problems.append("imports streamlit")
+        if r["engine_built"]:
+            problems.append("builds the engine at import")
+        failures += bool(problems)
+        print(f"{module:20s} {r['seconds']:6.3f}s  {'; '.join(problems) or 'ok'}")
+    return failures
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--budget", type=float, default=0.75, help="seconds allowed per module")
+    parser.add_argument("--repeat", type=int, default=3, help="fresh imports per module (best is kept)")
+    args = parser.parse_args()
+    sys.exit(1 if run(args.budget, args.repeat) else 0)
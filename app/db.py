@@ -17,40 +17,160 @@
 
 
 # app/db.py
+#
+# Imported by CLIs and workers as well as the Streamlit app, so keep it free of
+# Streamlit and of import-time side effects: the engine is built on first use
+# (get_engine(), or the module attribute `engine`).
 import os
-from urllib.parse import urlparse
+import threading
+import time
 
 from dotenv import load_dotenv
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+from sqlalchemy.orm import Session as _SASession, sessionmaker, scoped_session
+from sqlalchemy.pool import QueuePool
 
-import streamlit as st  # we are in a Streamlit app, this is fine
+from app import querystats, tracing
 
 # Load local .env for local dev (optional)
 load_dotenv()
 
-# 1. Prefer DATABASE_URL from env (local dev)
-DATABASE_URL = os.getenv("DATABASE_URL")
+# Streamlit Cloud keeps secrets here; read the file directly instead of importing streamlit
+SECRETS_FILES = (
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".streamlit", "secrets.toml"),
+    os.path.join(os.path.expanduser("~"), ".streamlit", "secrets.toml"),
+)
 
-# 2. If not set, fall back to Streamlit secrets (Cloud)
-if not DATABASE_URL:
-    DATABASE_URL = st.secrets.get("DATABASE_URL")
+def database_url() -> str:
+    """DATABASE_URL from the environment (or a local .env), else from Streamlit's secrets.toml."""
+    url = os.getenv("DATABASE_URL")
+    if url:
+        return url
 
-if not DATABASE_URL:
-    raise RuntimeError("DATABASE_URL not set in env or Streamlit secrets")
+    import tomllib
+    for path in SECRETS_FILES:
+        try:
+            with open(path, "rb") as f:
+                url = tomllib.load(f).get("DATABASE_URL")
+        except FileNotFoundError:
+            continue
+        if url:
+            return url
+    raise RuntimeError("DATABASE_URL not set in env, .env or .streamlit/secrets.toml")
 
-# Debug: show which host we’re actually hitting (no password)
-parsed = urlparse(DATABASE_URL)
-host = parsed.hostname
-st.write(f"DB host in use: {host}")
+# Pool sizing. Every Streamlit rerun holds at most one connection (see Session
+# below), so POOL_SIZE + MAX_OVERFLOW caps concurrent reruns touching the DB
+# per process; keep (size + overflow) * processes under the host's limit.
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))     # seconds to wait for a free connection
+POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))     # seconds; hosted Postgres drops idle conns
 
-# Create engine; Supabase requires SSL but SQLAlchemy + psycopg2
-# will negotiate this automatically with the URL.
-engine = create_engine(
-    DATABASE_URL,
-    future=True,
-    pool_pre_ping=True,
-    echo=False,
-)
+_metrics_lock = threading.Lock()
+_metrics = {"checkouts": 0, "timeouts": 0, "wait_total_ms": 0.0, "wait_max_ms": 0.0}
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long callers wait for a connection."""
+
+    def _do_get(self):
+        t0 = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeout:
+            with _metrics_lock:
+                _metrics["timeouts"] += 1
+            raise
+        finally:
+            waited = (time.perf_counter() - t0) * 1000
+            with _metrics_lock:
+                _metrics["checkouts"] += 1
+                _metrics["wait_total_ms"] += waited
+                _metrics["wait_max_ms"] = max(_metrics["wait_max_ms"], waited)
+
+_engine = None
+_engine_lock = threading.Lock()
+
+def get_engine():
+    """The process-wide engine, created on first call."""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                # Supabase requires SSL but SQLAlchemy + psycopg2
+                # will negotiate this automatically with the URL.
+                eng = create_engine(
+                    database_url(),
+                    future=True,
+                    pool_pre_ping=True,
+                    echo=False,
+                    poolclass=TimedQueuePool,
+                    pool_size=POOL_SIZE,
+                    max_overflow=MAX_OVERFLOW,
+                    pool_timeout=POOL_TIMEOUT,
+                    pool_recycle=POOL_RECYCLE,
+                )
+                querystats.install(eng)  # per-statement timing + slow-query log (SQL_STATS=0 to disable)
+                tracing.install(eng)     # SQL spans in sampled reruns (TRACE_SAMPLE_RATE)
+                _engine = eng
+    return _engine
+
+def __getattr__(name):
+    # `from app.db import engine` keeps working, but only builds the engine when asked for
+    if name == "engine":
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+class _LazySession(_SASession):
+    """Session bound to get_engine() at first use rather than at import."""
+
+    def get_bind(self, *args, **kwargs):
+        return get_engine()
+
+# Unit of work: Session() returns the same session for the calling thread, and
+# Streamlit runs each rerun on its script thread, so every render_* function in
+# a rerun shares one session and at most one pooled connection. Callers commit
+# or roll back but don't close it; app/ui.py calls Session.remove() when the
+# rerun ends. Scripts and workers call Session.remove() (or close()) themselves.
+Session = scoped_session(sessionmaker(class_=_LazySession, autoflush=False, autocommit=False))
+
+def pool_metrics() -> dict:
+    """Checkout/wait counters since start plus the pool's current occupancy."""
+    engine = get_engine()
+    pool = engine.pool
+    with _metrics_lock:
+        m = dict(_metrics)
+    m["wait_avg_ms"] = m["wait_total_ms"] / m["checkouts"] if m["checkouts"] else 0.0
+    m.update(
+        size=pool.size(),
+        checked_out=pool.checkedout(),
+        idle=pool.checkedin(),
+        overflow=max(0, pool.overflow()),
+        max_overflow=MAX_OVERFLOW,
+        host=engine.url.host,  # which database we're on (no password)
+    )
+    return m
+
+def copy_rows(s, table: str, columns, rows) -> int:
+    """
+    Bulk-load `rows` (tuples in `columns` order) with COPY ... FROM STDIN, in
+    the session's current transaction. None becomes NULL, lists become Postgres
+    array literals. Returns the number of rows sent.
+    """
+    import csv
+    import io
+
+    buf = io.StringIO()
+    w = csv.writer(buf, lineterminator="\n")
+    n = 0
+    for row in rows:
+        w.writerow(["{" + ",".join(v) + "}" if isinstance(v, list) else v for v in row])
+        n += 1
+    buf.seek(0)
 
-Session = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+    cur = s.connection().connection.driver_connection.cursor()
+    try:
+        cur.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buf)
+    finally:
+        cur.close()
+    return n
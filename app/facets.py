@@ -0,0 +1,113 @@
+"""
+Facet counts for the Browse filter bar: listings per category, per campus
+and per price bucket, for the current filter state, in one query.
+
+Each facet is counted with every *other* filter applied, so the number
+next to an option is what Browse would show after picking it. One scan of
+the active listings in item_cards (narrowed by near-me, which isn't a
+facet) is grouped
+with GROUPING SETS; FILTER aggregates drop the facet's own condition:
+
+    GROUP BY GROUPING SETS ((category), (campus), (bucket), ())
+
+Results are cached per filter signature for FACET_TTL seconds and dropped
+when this process posts or closes a listing (invalidate()); other processes
+catch up on expiry, as with the Browse counts.
+"""
+import os
+import threading
+from typing import Optional, Tuple
+
+from cachetools import TTLCache
+from sqlalchemy import text
+from app import geo
+
+FACET_TTL = float(os.getenv("FACET_TTL", "60"))  # seconds
+
+# price bucket k (width_bucket) covers [PRICE_EDGES[k-1], PRICE_EDGES[k])
+PRICE_EDGES = (10, 25, 50, 100, 250, 500, 1000)
+
+_cache = TTLCache(maxsize=1024, ttl=FACET_TTL)
+_lock = threading.Lock()
+
+def bucket_label(k: int) -> str:
+    if k == 0:
+        return f"Under ${PRICE_EDGES[0]}"
+    if k == len(PRICE_EDGES):
+        return f"${PRICE_EDGES[-1]}+"
+    return f"${PRICE_EDGES[k - 1]}-{PRICE_EDGES[k]}"
+
+def facet_sql(near_sql: Optional[str]) -> str:
+    """The one grouped query behind every facet count; near_sql is an extra filter over item_cards i."""
+    near = f"AND {near_sql}" if near_sql else ""
+    # GROUPING(category, campus, bucket) is a bitmask of the columns *not* grouped:
+    # 3 = by category, 5 = by campus, 6 = by price bucket, 7 = grand total
+    return f"""
+        WITH f AS (
+            SELECT i.category, i.pickup_campus AS campus,
+                   width_bucket(i.price, CAST(:edges AS numeric[])) AS bucket,
+                   (CAST(:cat_name AS text) IS NULL OR i.category = :cat_name) AS cat_ok,
+                   (CAST(:location AS text) IS NULL OR i.pickup_campus = :location) AS campus_ok,
+                   (i.price BETWEEN :min_price AND :max_price) AS price_ok
+            FROM item_cards i
+            WHERE i.status = 'active' {near}
+        )
+        SELECT GROUPING(category, campus, bucket) AS g, category, campus, bucket,
+               COUNT(*) FILTER (WHERE campus_ok AND price_ok) AS by_category,
+               COUNT(*) FILTER (WHERE cat_ok AND price_ok) AS by_campus,
+               COUNT(*) FILTER (WHERE cat_ok AND campus_ok) AS by_price,
+               COUNT(*) FILTER (WHERE cat_ok AND campus_ok AND price_ok) AS total
+        FROM f
+        GROUP BY GROUPING SETS ((category), (campus), (bucket), ())
+    """
+
+def counts(s, cat_name: str, location: str, min_price: float, max_price: float,
+           near: Optional[Tuple[float, float, float]] = None) -> dict:
+    """
+    Facet counts for the Browse filters (same arguments as browse.build_filters):
+
+        {"category": {name: n, None: n}, "campus": {name: n, None: n},
+         "price": {bucket: n}, "total": n}
+
+    The None entries count the facet's "All" option; "total" matches the
+    Browse result count for the full filter state.
+    """
+    key = (cat_name, location, float(min_price), float(max_price), near)
+    with _lock:
+        hit = _cache.get(key)
+    if hit is not None:
+        return hit
+
+    params = {
+        "edges": list(PRICE_EDGES),
+        "cat_name": None if cat_name == "All categories" else cat_name,
+        "location": None if location == "All" else location,
+        "min_price": min_price,
+        "max_price": max_price,
+    }
+    near_sql = None
+    if near is not None:
+        near_sql, near_params = geo.near_filter(*near)
+        params.update(near_params)
+
+    out = {"category": {}, "campus": {}, "price": {}, "total": 0}
+    for r in s.execute(text(facet_sql(near_sql)), params).mappings():
+        if r["g"] == 3 and r["category"] is not None:
+            out["category"][r["category"]] = r["by_category"]
+        elif r["g"] == 5 and r["campus"] is not None:
+            out["campus"][r["campus"]] = r["by_campus"]
+        elif r["g"] == 6:
+            out["price"][r["bucket"]] = r["by_price"]
+        elif r["g"] == 7:
+            out["category"][None] = r["by_category"]
+            out["campus"][None] = r["by_campus"]
+            out["total"] = r["total"]
+
+    with _lock:
+        _cache[key] = out
+    return out
+
+def invalidate() -> None:
+    """Drop cached counts, e.g. after a listing is posted or closed."""
+    with _lock:
+        _cache.clear()
@@ -0,0 +1,248 @@
+"""
+Generate a synthetic marketplace for benchmarking (reproducible per --seed).
+
+    python -m app.gen_data --scale small|medium|large [--seed 42] [--reset]
+    python -m app.gen_data --users N --items N --bids N
+
+Scales: small = 1k users / 10k items / 100k bids, medium = 10x that,
+large = 100k users / 1M items / 10M bids. The shape follows the real app:
+categories and campuses are skewed, a few sellers and bidders are very
+active, most auctions get a handful of bids while a few get hundreds,
+items carry 1-4 images, and older listings are more likely to be sold or
+closed. Bid stats, chosen_bid_id and image ref counts come out consistent.
+
+Rows are bulk-loaded with COPY in one transaction. The item, bid and image
+triggers are switched off during the load (the generator computes what they
+would, and item_cards is refreshed once per chunk), which takes an
+exclusive lock on those tables: dev/bench databases only. Generated users have emails gen-*@rutgers.edu and image paths start
+with gen/; --reset deletes a previous run first. Categories come from
+seed_categories.sql. Image files are not written.
+"""
+import argparse
+import hashlib
+import random
+import time
+import uuid
+from bisect import bisect
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from itertools import accumulate
+
+from sqlalchemy import text
+from app.db import Session, copy_rows
+from app.geo import CAMPUS_CENTERS
+
+SCALES = {
+    "small":  (1_000, 10_000, 100_000),
+    "medium": (10_000, 100_000, 1_000_000),
+    "large":  (100_000, 1_000_000, 10_000_000),
+}
+CHUNK = 20_000  # items generated and copied per round
+
+CAMPUSES = ["College Ave", "Busch", "Livingston", "Cook Douglas"]
+CAMPUS_WEIGHTS = [0.35, 0.30, 0.25, 0.10]
+WORDS = ["used", "new", "mini", "vintage", "dorm", "blue", "black", "lamp", "desk", "chair",
+         "calculus", "textbook", "bike", "monitor", "iphone", "guitar", "jacket", "fridge",
+         "microwave", "tickets", "ps5", "laptop", "shelf", "rug", "kettle", "scooter"]
+
+USER_COLS = ("id", "name", "email", "password_hash", "join_date")
+ITEM_COLS = ("id", "seller_id", "title", "description", "price", "category_id", "status", "listing_type",
+             "buy_now_price", "pickup_location", "pickup_campus", "pickup_lat", "pickup_lng", "auction_end_at",
+             "highest_bid", "bid_count", "last_bid_at", "created_at", "updated_at", "closed_at")
+IMAGE_COLS = ("id", "item_id", "image_path", "is_primary", "sort_order", "variants", "created_at")
+BID_COLS = ("id", "item_id", "bidder_id", "amount", "status", "placed_at")
+
+def _zipf_cum(n: int, s: float):
+    """Cumulative weights for picking rank k with probability ~ 1 / (k+1)^s."""
+    return list(accumulate(1.0 / (k + 1) ** s for k in range(n)))
+
+def _pick(rng, seq, cum):
+    return seq[bisect(cum, rng.random() * cum[-1])]
+
+class Generator:
+    def __init__(self, seed: int, n_users: int, n_items: int, n_bids: int, category_ids):
+        self.rng = random.Random(seed)
+        self.n_users, self.n_items, self.n_bids = n_users, n_items, n_bids
+        self.now = datetime.now(timezone.utc).replace(microsecond=0)
+
+        self.user_ids = [self._uuid() for _ in range(n_users)]
+        # different orderings, so the busiest sellers aren't also the busiest bidders
+        self.sellers = self.rng.sample(self.user_ids, n_users)
+        self.bidders = self.rng.sample(self.user_ids, n_users)
+        self.user_cum = _zipf_cum(n_users, 0.8)
+        self.categories = self.rng.sample(list(category_ids), len(category_ids))
+        self.category_cum = _zipf_cum(len(self.categories), 1.1)
+
+        # shared image pool: re-posted photos dedupe to the same blob
+        self.image_paths = [self._image_path() for _ in range(max(1, n_items // 2))]
+        self.auction_share = 0.65
+        self.mean_bids = n_bids / max(1, n_items * self.auction_share)
+
+    def _uuid(self) -> str:
+        return str(uuid.UUID(int=self.rng.getrandbits(128), version=4))
+
+    def _image_path(self) -> str:
+        h = hashlib.sha256(self.rng.getrandbits(64).to_bytes(8, "big")).hexdigest()
+        return f"gen/{h[:2]}/{h[2:4]}/{h}.jpg"
+
+    def users(self, password_hash: str):
+        for k, uid in enumerate(self.user_ids):
+            joined = self.now - timedelta(days=self.rng.uniform(0, 730))
+            yield uid, f"User {k}", f"gen-{k}@rutgers.edu", password_hash, joined
+
+    def _bid_count(self, listing_type: str) -> int:
+        if listing_type == "fixed":
+            return 1 if self.rng.random() < 0.3 else 0
+        # Pareto(1.5) - 1 has mean 2: mostly a few bids, occasionally hundreds
+        return min(500, int((self.rng.paretovariate(1.5) - 1) * self.mean_bids / 2))
+
+    def chunk(self, n: int):
+        """Rows for the next `n` items: (items, images, bids)."""
+        rng = self.rng
+        items, images, bids = [], [], []
+        for _ in range(n):
+            iid = self._uuid()
+            seller = _pick(rng, self.sellers, self.user_cum)
+            created = self.now - timedelta(days=min(365.0, rng.expovariate(1 / 45)))
+            age_days = (self.now - created).days
+            listing_type = "auction" if rng.random() < self.auction_share else "fixed"
+            price = Decimal(min(5000.0, round(rng.lognormvariate(3.4, 1.0), 2))).quantize(Decimal("0.01"))
+
+            # older listings are more likely to be finished
+            r = rng.random()
+            status = "active" if r < max(0.2, 0.9 - age_days / 120) else ("sold" if r < 0.9 else "closed")
+
+            end_at = None
+            if listing_type == "auction":
+                end_at = created + timedelta(days=7) if status != "active" \
+                    else self.now + timedelta(hours=rng.uniform(1, 168))
+
+            n_bids = self._bid_count(listing_type)
+            if status == "sold":
+                n_bids = max(1, n_bids)
+
+            # bids climb from ~60% of the asking price, spread over the listing's life
+            window_end = min(self.now, end_at) if end_at else self.now
+            span = max(1.0, (window_end - created).total_seconds())
+            times = sorted(rng.uniform(0, span) for _ in range(n_bids))
+            amount = max(Decimal("1.00"), (price * Decimal("0.6")).quantize(Decimal("0.01")))
+            item_bids = []
+            for k, t in enumerate(times):
+                if listing_type == "fixed":
+                    amount = price
+                elif k:
+                    amount += Decimal(str(round(1 + rng.expovariate(0.5), 2)))
+                bidder = _pick(rng, self.bidders, self.user_cum)
+                if bidder == seller:
+                    bidder = self.bidders[(self.bidders.index(bidder) + 1) % self.n_users]
+                item_bids.append([self._uuid(), iid, bidder, amount, "pending", created + timedelta(seconds=t)])
+
+            if listing_type == "fixed":
+                for b in item_bids:
+                    b[4] = "accepted" if status == "sold" else "not_accepted"
+            elif status == "sold":
+                for b in item_bids:
+                    b[4] = "declined"
+                item_bids[-1][4] = "accepted"  # highest and last
+            bids.extend(item_bids)
+
+            # what trg_items_set_closed_at would have stamped (COPY runs with triggers off)
+            closed_at = None
+            if status != "active":
+                closed_at = min(self.now, end_at or (item_bids[-1][5] if item_bids
+                                                     else created + timedelta(days=rng.uniform(1, 30))))
+
+            title = " ".join(rng.choices(WORDS, k=rng.randint(2, 5))).capitalize()
+            campus = rng.choices(CAMPUSES, CAMPUS_WEIGHTS)[0]
+            lat, lng = CAMPUS_CENTERS[campus]
+            items.append((
+                iid, seller, title, f"{title}. Pickup on {campus}.", price,
+                _pick(rng, self.categories, self.category_cum), status, listing_type,
+                price if listing_type == "fixed" else None, f"{campus} campus", campus,
+                lat + rng.gauss(0, 0.004), lng + rng.gauss(0, 0.005), end_at,
+                max((b[3] for b in item_bids), default=None), len(item_bids),
+                item_bids[-1][5] if item_bids else None, created, created, closed_at,
+            ))
+
+            n_images = rng.choices([1, 2, 3, 4], [0.5, 0.3, 0.15, 0.05])[0]
+            for k in range(n_images):
+                images.append((self._uuid(), iid, rng.choice(self.image_paths), k == 0, k,
+                               ["thumb", "detail"], created))
+        return items, images, [tuple(b) for b in bids]
+
+def reset(s) -> None:
+    """Delete the rows of a previous run (triggers off: the whole graph goes)."""
+    s.execute(text("ALTER TABLE bids DISABLE TRIGGER USER"))
+    s.execute(text("ALTER TABLE item_images DISABLE TRIGGER USER"))
+    s.execute(text("ALTER TABLE item_images_archive DISABLE TRIGGER USER"))
+    s.execute(text("DELETE FROM users WHERE email LIKE 'gen-%@rutgers.edu'"))
+    s.execute(text("DELETE FROM image_blobs WHERE image_path LIKE 'gen/%'"))
+    s.execute(text("ALTER TABLE bids ENABLE TRIGGER USER"))
+    s.execute(text("ALTER TABLE item_images ENABLE TRIGGER USER"))
+    s.execute(text("ALTER TABLE item_images_archive ENABLE TRIGGER USER"))
+
+def run(n_users: int, n_items: int, n_bids: int, seed: int = 42, do_reset: bool = False) -> None:
+    from app.security import _hash
+
+    s = Session()
+    t0 = time.perf_counter()
+    try:
+        if do_reset:
+            reset(s)
+        category_ids = [str(c) for c in s.execute(text("SELECT id FROM categories ORDER BY name")).scalars()]
+        if not category_ids:
+            raise SystemExit("No categories: load seed_categories.sql first.")
+
+        gen = Generator(seed, n_users, n_items, n_bids, category_ids)
+        copy_rows(s, "users", USER_COLS, gen.users(_hash("password")))
+        print(f"users: {n_users}")
+
+        for table in ("items", "bids", "item_images"):
+            s.execute(text(f"ALTER TABLE {table} DISABLE TRIGGER USER"))
+        totals = [0, 0, 0]
+        for start in range(0, n_items, CHUNK):
+            items, images, bids = gen.chunk(min(CHUNK, n_items - start))
+            totals[0] += copy_rows(s, "items", ITEM_COLS, items)
+            totals[1] += copy_rows(s, "item_images", IMAGE_COLS, images)
+            totals[2] += copy_rows(s, "bids", BID_COLS, bids)
+            # the cards, with covers and bid stats, in one pass per chunk
+            s.execute(text("SELECT refresh_item_cards(CAST(:ids AS uuid[]))"), {"ids": [it[0] for it in items]})
+            print(f"items: {totals[0]}  images: {totals[1]}  bids: {totals[2]}", end="\r", flush=True)
+        print()
+        for table in ("items", "bids", "item_images"):
+            s.execute(text(f"ALTER TABLE {table} ENABLE TRIGGER USER"))
+
+        # what the triggers and the accept flow would have written
+        s.execute(text("""
+            INSERT INTO image_blobs (image_path, ref_count)
+            SELECT image_path, COUNT(*) FROM item_images WHERE image_path LIKE 'gen/%' GROUP BY image_path
+            ON CONFLICT (image_path) DO UPDATE SET ref_count = EXCLUDED.ref_count, released_at = NULL
+        """))
+        s.execute(text("""
+            UPDATE items i SET chosen_bid_id = b.id
+            FROM bids b
+            WHERE b.item_id = i.id AND b.status = 'accepted'
+              AND i.status = 'sold' AND i.chosen_bid_id IS NULL
+        """))
+        # fresh statistics, or the first benchmark runs against an empty-table plan
+        s.execute(text("ANALYZE"))
+        s.commit()
+    except BaseException:
+        s.rollback()
+        raise
+    finally:
+        Session.remove()
+    print(f"done in {time.perf_counter() - t0:.1f}s (seed {seed})")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scale", choices=SCALES, help="preset sizes (overridden by --users/--items/--bids)")
+    parser.add_argument("--users", type=int)
+    parser.add_argument("--items", type=int)
+    parser.add_argument("--bids", type=int)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--reset", action="store_true", help="delete previously generated rows first")
+    args = parser.parse_args()
+
+    users, items, bids = SCALES[args.scale or "small"]
+    run(args.users or users, args.items or items, args.bids or bids, args.seed, args.reset)
@@ -0,0 +1,145 @@
+"""
+Pickup coordinates from a local gazetteer, and "near me" filtering.
+
+Listings get pickup_lat / pickup_lng when posted: the pickup location text
+is matched against the campus landmarks below (longest name or alias wins),
+falling back to the centre of the chosen campus. Nothing goes over the
+network. Coordinates are approximate, which is plenty for "within a mile".
+
+Near-me Browse keeps the filter index-friendly in two steps: a bounding box
+around the origin (point(pickup_lng, pickup_lat) <@ box, served by the GiST
+index idx_item_cards_geo) narrows the rows to a small candidate set, then
+the exact great-circle distance (haversine_mi() in schema.sql) is checked
+and sorted on for just those candidates.
+"""
+import math
+import re
+from typing import Optional, Tuple
+
+EARTH_RADIUS_MI = 3958.8
+MILES_PER_DEG_LAT = 69.05
+
+# campus -> (lat, lng) of its centre; same names as the post form / CAMPUSES
+CAMPUS_CENTERS = {
+    "College Ave": (40.5008, -74.4474),
+    "Busch": (40.5232, -74.4589),
+    "Livingston": (40.5238, -74.4367),
+    "Cook Douglas": (40.4830, -74.4367),
+}
+
+# landmark -> (lat, lng, campus)
+PLACES = {
+    "Rutgers Student Center": (40.5025, -74.4518, "College Ave"),
+    "Brower Commons": (40.5031, -74.4522, "College Ave"),
+    "Alexander Library": (40.5048, -74.4524, "College Ave"),
+    "Scott Hall": (40.5004, -74.4484, "College Ave"),
+    "Voorhees Mall": (40.4989, -74.4463, "College Ave"),
+    "College Avenue Gym": (40.5039, -74.4509, "College Ave"),
+    "New Brunswick Station": (40.4963, -74.4455, "College Ave"),
+    "Easton Avenue": (40.4994, -74.4506, "College Ave"),
+    "Busch Student Center": (40.5235, -74.4584, "Busch"),
+    "Hill Center": (40.5219, -74.4633, "Busch"),
+    "Werblin Recreation Center": (40.5195, -74.4582, "Busch"),
+    "SHI Stadium": (40.5137, -74.4650, "Busch"),
+    "Busch Engineering Science Building": (40.5220, -74.4603, "Busch"),
+    "Livingston Student Center": (40.5246, -74.4368, "Livingston"),
+    "Livingston Apartments": (40.5202, -74.4339, "Livingston"),
+    "Livingston Quads": (40.5262, -74.4382, "Livingston"),
+    "Rutgers Athletic Center": (40.5236, -74.4420, "Livingston"),
+    "Cook Campus Center": (40.4813, -74.4360, "Cook Douglas"),
+    "Douglass Student Center": (40.4856, -74.4374, "Cook Douglas"),
+    "Neilson Dining Hall": (40.4836, -74.4366, "Cook Douglas"),
+    "Rutgers Gardens": (40.4738, -74.4223, "Cook Douglas"),
+}
+
+# how people actually write them -> PLACES / CAMPUS_CENTERS key
+ALIASES = {
+    "rsc": "Rutgers Student Center",
+    "student center college ave": "Rutgers Student Center",
+    "brower": "Brower Commons",
+    "alexander": "Alexander Library",
+    "train station": "New Brunswick Station",
+    "easton ave": "Easton Avenue",
+    "bsc": "Busch Student Center",
+    "werblin": "Werblin Recreation Center",
+    "stadium": "SHI Stadium",
+    "besc": "Busch Engineering Science Building",
+    "lsc": "Livingston Student Center",
+    "livi apartments": "Livingston Apartments",
+    "quads": "Livingston Quads",
+    "rac": "Rutgers Athletic Center",
+    "jersey mike's arena": "Rutgers Athletic Center",
+    "neilson": "Neilson Dining Hall",
+    "college ave": "College Ave",
+    "college avenue": "College Ave",
+    "cac": "College Ave",
+    "busch": "Busch",
+    "livingston": "Livingston",
+    "livi": "Livingston",
+    "cook": "Cook Douglas",
+    "douglass": "Cook Douglas",
+    "douglas": "Cook Douglas",
+}
+
+def _norm(s: str) -> str:
+    return " ".join(re.sub(r"[^a-z0-9']+", " ", (s or "").lower()).split())
+
+def _point(name: str) -> Tuple[float, float]:
+    return PLACES[name][:2] if name in PLACES else CAMPUS_CENTERS[name]
+
+# normalized name/alias -> key, longest first so "livi apartments" beats "livi"
+_NAMES = sorted(
+    [(_norm(n), n) for n in list(PLACES) + list(CAMPUS_CENTERS)] + [(a, n) for a, n in ALIASES.items()],
+    key=lambda p: -len(p[0]),
+)
+
+def place_names() -> list:
+    """Every gazetteer entry a user can pick as "near", campuses first."""
+    return list(CAMPUS_CENTERS) + sorted(PLACES)
+
+def locate(name: str) -> Optional[Tuple[float, float]]:
+    """(lat, lng) of a place_names() entry."""
+    return _point(name) if name in PLACES or name in CAMPUS_CENTERS else None
+
+def geocode(location: str, campus: Optional[str] = None) -> Tuple[Optional[float], Optional[float]]:
+    """
+    (lat, lng) for a free-text pickup location: the longest gazetteer name or
+    alias found in it as whole words, else the centre of `campus`, else
+    (None, None).
+    """
+    text = f" {_norm(location)} "
+    for name, key in _NAMES:
+        if f" {name} " in text:
+            return _point(key)
+    if campus in CAMPUS_CENTERS:
+        return CAMPUS_CENTERS[campus]
+    return None, None
+
+def haversine_mi(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Great-circle distance in miles (same formula as haversine_mi() in schema.sql)."""
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    a = (math.sin((p2 - p1) / 2) ** 2
+         + math.cos(p1) * math.cos(p2) * math.sin(math.radians(lng2 - lng1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_MI * math.asin(min(1.0, math.sqrt(a)))
+
+def bounding_box(lat: float, lng: float, radius_mi: float) -> Tuple[float, float, float, float]:
+    """(min_lat, min_lng, max_lat, max_lng) enclosing the circle; fine away from the poles."""
+    dlat = radius_mi / MILES_PER_DEG_LAT
+    dlng = radius_mi / (MILES_PER_DEG_LAT * max(math.cos(math.radians(lat)), 0.01))
+    return lat - dlat, lng - dlng, lat + dlat, lng + dlng
+
+# distance of listing i from the :near_lat / :near_lng origin
+DISTANCE_SQL = "haversine_mi(i.pickup_lat, i.pickup_lng, :near_lat, :near_lng)"
+
+def near_filter(lat: float, lng: float, radius_mi: float) -> Tuple[str, dict]:
+    """
+    WHERE fragment (over item_cards i) + params for listings within `radius_mi`:
+    the box test is the indexed prefilter, the distance test is exact.
+    """
+    min_lat, min_lng, max_lat, max_lng = bounding_box(lat, lng, radius_mi)
+    sql = ("point(i.pickup_lng, i.pickup_lat) <@ box(point(:near_min_lng, :near_min_lat), point(:near_max_lng, :near_max_lat))"
+           f" AND {DISTANCE_SQL} <= :near_radius")
+    return sql, {
+        "near_lat": lat, "near_lng": lng, "near_radius": radius_mi,
+        "near_min_lat": min_lat, "near_min_lng": min_lng, "near_max_lat": max_lat, "near_max_lng": max_lng,
+    }
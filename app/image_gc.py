@@ -0,0 +1,149 @@
+"""
+Delete image files that no listing references any more.
+
+    python -m app.image_gc [--batch 200] [--grace-hours 24] [--scan-disk]
+
+image_blobs.ref_count is kept current by a trigger on item_images, so rows
+that have sat at 0 for longer than the grace period are garbage. Each batch
+is claimed with FOR UPDATE SKIP LOCKED, so several sweepers can run at once,
+and its rows are deleted (re-checking ref_count = 0) and files removed in
+that same transaction: an upload that lands on a claimed blob waits on the
+row lock, and utils.restore_saved_image() rewrites the file once the
+upload's item_images row has committed.
+--scan-disk also walks UPLOAD_DIR for files that never got a row (e.g. an
+upload whose listing insert failed, or pre-dedupe uploads).
+"""
+import argparse
+import os
+import time
+
+from sqlalchemy import text
+from app.db import Session
+from app.utils import ALLOWED_EXTS, IMAGE_VARIANTS, get_upload_root, variant_rel_path
+
+_VARIANT_SUFFIXES = tuple(f"_{name}.webp" for name in IMAGE_VARIANTS)
+
+def _remove(upload_root: str, rel_path: str) -> None:
+    """Remove an original plus its variants, then prune now-empty shard dirs."""
+    for name in ("original", *IMAGE_VARIANTS):
+        try:
+            os.remove(os.path.join(upload_root, variant_rel_path(rel_path, name)))
+        except FileNotFoundError:
+            pass
+
+    root = os.path.abspath(upload_root)
+    parent = os.path.dirname(os.path.abspath(os.path.join(upload_root, rel_path)))
+    while parent != root and parent.startswith(root):
+        try:
+            os.rmdir(parent)
+        except OSError:
+            break  # not empty
+        parent = os.path.dirname(parent)
+
+def _touched_since(upload_root: str, rel_path: str, cutoff: float) -> bool:
+    try:
+        return os.path.getmtime(os.path.join(upload_root, rel_path)) > cutoff
+    except FileNotFoundError:
+        return False
+
+def sweep(batch_size: int = 200, grace_hours: float = 24.0) -> int:
+    """Delete unreferenced blobs in batches; returns how many were removed."""
+    upload_root = get_upload_root()
+    cutoff = time.time() - grace_hours * 3600
+    removed = 0
+
+    s = Session()
+    try:
+        while True:
+            paths = s.execute(text("""
+                SELECT image_path
+                FROM image_blobs
+                WHERE ref_count = 0
+                  AND released_at < NOW() - make_interval(secs => :grace)
+                ORDER BY released_at
+                LIMIT :n
+                FOR UPDATE SKIP LOCKED
+            """), {"grace": grace_hours * 3600, "n": batch_size}).scalars().all()
+            if not paths:
+                break
+
+            # a dedupe hit re-touches the file before its item_images row lands; give it another grace period
+            revived = [p for p in paths if _touched_since(upload_root, p, cutoff)]
+            s.execute(text("UPDATE image_blobs SET released_at = NOW() WHERE image_path = ANY(:p)"), {"p": revived})
+
+            # still holding the row locks, so nothing can take a reference between the DELETE and the unlink
+            gone = s.execute(text("""
+                DELETE FROM image_blobs
+                WHERE image_path = ANY(:p) AND ref_count = 0
+                RETURNING image_path
+            """), {"p": [p for p in paths if p not in revived]}).scalars().all()
+            for path in gone:
+                _remove(upload_root, path)
+            s.commit()
+            removed += len(gone)
+            print(f"... {removed} file(s) removed")
+    except Exception:
+        s.rollback()
+        raise
+    finally:
+        s.close()
+
+    return removed
+
+def scan_disk(batch_size: int = 500, grace_hours: float = 24.0) -> int:
+    """Delete files under UPLOAD_DIR that image_blobs doesn't know about."""
+    upload_root = get_upload_root()
+    cutoff = time.time() - grace_hours * 3600
+    removed = 0
+
+    def flush(batch, s):
+        known = set(s.execute(text("SELECT image_path FROM image_blobs WHERE image_path = ANY(:p)"),
+                              {"p": batch}).scalars().all())
+        s.rollback()  # read-only; don't hold a snapshot while deleting files
+        n = 0
+        for path in batch:
+            if path not in known:
+                _remove(upload_root, path)
+                n += 1
+        return n
+
+    s = Session()
+    try:
+        batch = []
+        for dirpath, _, files in os.walk(upload_root):
+            for fn in files:
+                rel = os.path.relpath(os.path.join(dirpath, fn), upload_root).replace("\\", "/")
+                if os.path.getmtime(os.path.join(dirpath, fn)) > cutoff:
+                    continue  # may still be mid-upload
+                if fn.endswith(".tmp"):
+                    os.remove(os.path.join(dirpath, fn))  # abandoned atomic write
+                    continue
+                if fn.endswith(_VARIANT_SUFFIXES):
+                    stem = rel.rsplit("_", 1)[0]
+                    if not any(os.path.exists(os.path.join(upload_root, stem + ext)) for ext in ALLOWED_EXTS):
+                        os.remove(os.path.join(dirpath, fn))  # original already gone
+                        removed += 1
+                    continue
+                batch.append(rel)
+                if len(batch) >= batch_size:
+                    removed += flush(batch, s)
+                    batch = []
+        if batch:
+            removed += flush(batch, s)
+    finally:
+        s.close()
+
+    return removed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--batch", type=int, default=200, help="blobs per transaction")
+    parser.add_argument("--grace-hours", type=float, default=24.0, help="min age of an unreferenced file before deletion")
+    parser.add_argument("--scan-disk", action="store_true", help="also delete files with no image_blobs row")
+    args = parser.parse_args()
+
+    n = sweep(args.batch, args.grace_hours)
+    print(f"GC sweep finished: {n} unreferenced file(s) removed.")
+    if args.scan_disk:
+        n = scan_disk(args.batch, args.grace_hours)
+        print(f"Disk scan finished: {n} orphaned file(s) removed.")
@@ -0,0 +1,159 @@
+"""
+Flag sequential scans and missing indexes behind the app's queries.
+
+    python -m app.index_advisor [--generate small] [--min-rows 2000] [--unused]
+
+Runs EXPLAIN ANALYZE over the canonical queries of app.bench_queries (the
+ones the screens run, with sampled parameters) on the current database and
+reports, per query:
+
+  * sequential scans of tables with at least --min-rows rows, with the
+    filter they applied (the columns an index would need), unless the query
+    returns a tenth of the table or more anyway;
+  * index scans that throw away most of what they read (Rows Removed by
+    Filter): the index doesn't cover the filter;
+
+and, from the catalog, foreign keys whose columns don't lead any index
+(deletes on the referenced table scan the referencing one). --unused also
+lists indexes never scanned since the statistics were last reset.
+
+Scans listed in EXPECTED and foreign keys in UNINDEXED_FK_OK are reported
+but not counted. Exits non-zero if
+anything else was flagged. --generate loads a scale with app.gen_data
+(--reset) first; on an empty database every plan is a seq scan.
+"""
+import argparse
+import json
+import sys
+
+from sqlalchemy import text
+from app.db import Session
+from app.bench_queries import cases, samples
+
+# (query, table) -> why a full scan is the right plan
+EXPECTED = {
+    ("browse_count", "item_cards"): "counts every active listing",
+    ("browse_facets", "item_cards"): "groups every active listing",
+}
+
+# constraint -> why deletes on the referenced table may scan
+UNINDEXED_FK_OK = {
+    "items_category_id_fkey": "categories are edited by hand, not deleted by the app",
+    "saved_searches_category_id_fkey": "only a category delete cascades here",
+}
+
+REMOVED_RATIO = 10       # rows filtered out per row kept before an index scan is flagged
+WIDE_RESULT = 0.1        # a query returning this share of a table may as well scan it
+
+UNINDEXED_FK_SQL = """
+    SELECT c.conrelid::regclass::text AS tbl, c.conname,
+           array_agg(a.attname ORDER BY k.n) AS cols,
+           c.confrelid::regclass::text AS ref
+    FROM pg_constraint c
+    CROSS JOIN LATERAL unnest(c.conkey) WITH ORDINALITY AS k(attnum, n)
+    JOIN pg_attribute a ON a.attrelid = c.conrelid AND a.attnum = k.attnum
+    WHERE c.contype = 'f' AND c.connamespace = 'public'::regnamespace
+      AND NOT EXISTS (
+          SELECT 1 FROM pg_index i
+          WHERE i.indrelid = c.conrelid
+            AND (i.indkey::int2[])[0:cardinality(c.conkey) - 1] @> c.conkey
+      )
+    GROUP BY c.conrelid, c.conname, c.confrelid
+    ORDER BY 1, 2
+"""
+
+UNUSED_SQL = """
+    SELECT relname AS tbl, indexrelname AS idx, pg_size_pretty(pg_relation_size(s.indexrelid)) AS size
+    FROM pg_stat_user_indexes s
+    JOIN pg_index i ON i.indexrelid = s.indexrelid
+    WHERE s.idx_scan = 0 AND NOT i.indisprimary AND NOT i.indisunique
+    ORDER BY pg_relation_size(s.indexrelid) DESC
+"""
+
+def _walk(node):
+    yield node
+    for child in node.get("Plans", []):
+        yield from _walk(child)
+
+def _table_rows(s) -> dict:
+    return dict(s.execute(text("""
+        SELECT relname, reltuples::bigint FROM pg_class
+        WHERE relnamespace = 'public'::regnamespace AND relkind = 'r'
+    """)).all())
+
+def check_plan(name: str, plan: dict, table_rows: dict, min_rows: int) -> list:
+    """(expected, message) for every problem in one EXPLAIN ANALYZE plan."""
+    found = []
+    returned = plan.get("Actual Rows", 0)
+    for n in _walk(plan):
+        rel = n.get("Relation Name")
+        if rel is None:
+            continue
+        loops = n.get("Actual Loops", 1)
+        if n["Node Type"] == "Seq Scan" and table_rows.get(rel, 0) >= min_rows:
+            why = EXPECTED.get((name, rel))
+            if why is None and returned >= WIDE_RESULT * table_rows[rel]:
+                why = f"returns {returned} rows"
+            cond = n.get("Filter", "no filter")
+            found.append((why is not None,
+                          f"seq scan on {rel} (~{table_rows[rel]} rows) filter: {cond}"
+                          + (f"  [expected: {why}]" if why else "")))
+        elif n["Node Type"] in ("Index Scan", "Index Only Scan", "Bitmap Heap Scan"):
+            kept = n.get("Actual Rows", 0) * loops
+            removed = (n.get("Rows Removed by Filter", 0) + n.get("Rows Removed by Index Recheck", 0)) * loops
+            if removed >= min_rows and removed > REMOVED_RATIO * max(kept, 1):
+                via = n.get("Index Name", "bitmap")
+                found.append((False, f"{via} on {rel} kept {kept} rows, removed {removed}"
+                                     f" by filter: {n.get('Filter', n.get('Recheck Cond', '?'))}"))
+    return found
+
+def run(min_rows: int = 2000, unused: bool = False) -> int:
+    problems = 0
+    s = Session()
+    try:
+        s.execute(text("ANALYZE"))
+        table_rows = _table_rows(s)
+        for name, sql, binds in cases(s, samples(s)):
+            plan = s.execute(text(f"EXPLAIN (ANALYZE, FORMAT JSON) {sql}"), binds[0]).scalar_one()
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            s.rollback()
+            found = check_plan(name, plan[0]["Plan"], table_rows, min_rows)
+            problems += sum(not expected for expected, _ in found)
+            print(f"{name:24s} {plan[0]['Execution Time']:8.2f} ms  {'ok' if not found else ''}")
+            for expected, msg in found:
+                print(f"    {'-' if expected else '!'} {msg}")
+
+        fks = s.execute(text(UNINDEXED_FK_SQL)).mappings().all()
+        print(f"\nforeign keys without a leading index: {len(fks) or 'none'}")
+        for fk in fks:
+            why = UNINDEXED_FK_OK.get(fk["conname"])
+            print(f"    {'-' if why else '!'} {fk['tbl']}({', '.join(fk['cols'])}) -> {fk['ref']}  [{fk['conname']}]"
+                  + (f"  [expected: {why}]" if why else ""))
+            problems += why is None
+
+        if unused:
+            rows = s.execute(text(UNUSED_SQL)).mappings().all()
+            print(f"\nindexes never scanned since the last stats reset: {len(rows) or 'none'}")
+            for r in rows:
+                print(f"    - {r['idx']} on {r['tbl']} ({r['size']})")
+    finally:
+        Session.remove()
+
+    print(f"\n{problems} problem(s) flagged." if problems else "\nNo problems flagged.")
+    return problems
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--generate", help="scale to load with app.gen_data --reset first")
+    parser.add_argument("--min-rows", type=int, default=2000, help="ignore seq scans of tables smaller than this")
+    parser.add_argument("--unused", action="store_true", help="also list indexes that were never scanned")
+    parser.add_argument("--seed", type=int, default=42, help="generator seed for --generate")
+    args = parser.parse_args()
+
+    if args.generate:
+        from app import gen_data
+        if args.generate not in gen_data.SCALES:
+            parser.error(f"unknown scale {args.generate!r}")
+        gen_data.run(*gen_data.SCALES[args.generate], seed=args.seed, do_reset=True)
+    sys.exit(1 if run(args.min_rows, args.unused) else 0)
@@ -0,0 +1,123 @@
+"""
+Live bid/offer updates over Postgres LISTEN/NOTIFY.
+
+Triggers in schema.sql publish on the `market_events` channel when a bid is
+placed, accepted or declined, and when a listing is sold or closed. The
+payload is {"kind": ..., "item_id": ...}, or {"kind": "alert", "user_id": ...}
+when a new listing matched one of the user's saved searches, and Postgres
+delivers it only once the writing transaction commits, whichever process
+(app, auction worker, bulk import) made the change.
+
+Each app process runs one listener thread on its own connection (outside
+the pool) that records, per item (or user, for alerts), the sequence
+number of its last event.
+The My Listings / My Bids cards take a mark() before querying and later ask
+changed_since(): only the items that changed are re-queried. Streamlit
+can't start a rerun from another thread, so the card lists are still
+fragments that the browser reruns every LIVE_POLL_SECONDS (10 by default,
+0 turns the ticking off). A tick with no event for the page is only that
+in-memory check: the cards are redrawn from session state without opening
+a database session.
+
+When the listener (re)connects it bumps the epoch, which makes every card
+refresh once: events sent while nobody was listening are lost.
+
+LISTEN needs a session-level connection; behind a transaction-mode pooler
+set LIVE_UPDATES=0 (cards then refresh on ordinary reruns only).
+"""
+import json
+import os
+import select
+import threading
+import time
+from typing import Iterable, Set, Tuple
+
+CHANNEL = "market_events"
+ENABLED = os.getenv("LIVE_UPDATES", "1") != "0"
+POLL_SECONDS = float(os.getenv("LIVE_POLL_SECONDS", "10"))
+RUN_EVERY = POLL_SECONDS if ENABLED and POLL_SECONDS > 0 else None  # st.fragment(run_every=...)
+MAX_TRACKED = 50_000  # items remembered; beyond that the table is reset (one refresh for everyone)
+
+_lock = threading.Lock()
+_epoch = 0
+_seq = 0
+_last = {}  # item_id (or user_id) -> _seq of its latest event
+_thread = None
+
+def mark() -> Tuple[int, int]:
+    """Point in the event stream to compare against later; take it before querying."""
+    with _lock:
+        return _epoch, _seq
+
+def changed_since(item_ids: Iterable[str], since: Tuple[int, int]) -> Set[str]:
+    """The items (or users) among `item_ids` with an event after `since` (all of them after a reconnect)."""
+    with _lock:
+        if since[0] != _epoch:
+            return set(item_ids)
+        return {i for i in item_ids if _last.get(i, 0) > since[1]}
+
+def _dispatch(payload: str) -> None:
+    global _epoch, _seq
+    try:
+        event = json.loads(payload)
+        item_id = str(event.get("item_id") or event["user_id"])  # both UUIDs: one table for both
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return
+    with _lock:
+        if len(_last) >= MAX_TRACKED:
+            _last.clear()
+            _epoch += 1
+        _seq += 1
+        _last[item_id] = _seq
+
+def _connect():
+    from app.db import get_engine
+
+    # a dedicated DBAPI connection: a LISTEN would pin a pooled one forever
+    engine = get_engine()
+    cargs, cparams = engine.dialect.create_connect_args(engine.url)
+    conn = engine.dialect.connect(*cargs, **cparams)
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute(f"LISTEN {CHANNEL}")
+    return conn
+
+def _listen() -> None:
+    global _epoch
+    backoff = 1.0
+    while True:
+        conn = None
+        try:
+            conn = _connect()
+            backoff = 1.0
+            with _lock:
+                _epoch += 1
+            while True:
+                if select.select([conn], [], [], 60) == ([], [], []):
+                    with conn.cursor() as cur:  # quiet minute: make sure the connection is still there
+                        cur.execute("SELECT 1")
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    _dispatch(conn.notifies.pop(0).payload)
+        except Exception as e:
+            print(f"live: listener error ({e}); reconnecting in {backoff:.0f}s")
+            time.sleep(backoff)
+            backoff = min(backoff * 2, 60.0)
+        finally:
+            if conn is not None:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+
+def start() -> bool:
+    """Start this process's listener thread (once); returns whether live updates are on."""
+    global _thread
+    if not ENABLED:
+        return False
+    with _lock:
+        if _thread is None:
+            _thread = threading.Thread(target=_listen, name="live-listener", daemon=True)
+            _thread.start()
+    return True
@@ -1,7 +1,8 @@
 from sqlalchemy.orm import declarative_base, Mapped, mapped_column
-from sqlalchemy import Text, Boolean, Numeric, ForeignKey, Integer
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import Text, Boolean, Numeric, ForeignKey, Integer, DateTime
+from sqlalchemy.dialects.postgresql import UUID, ARRAY
 import uuid
+from datetime import datetime
 
 Base = declarative_base()
 
@@ -36,6 +37,11 @@ class Item(Base):
     pickup_campus: Mapped[str | None] = mapped_column(Text)
     pickup_lat: Mapped[float | None] = mapped_column()
     pickup_lng: Mapped[float | None] = mapped_column()
+    auction_end_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))  # closed by app.auction_worker
+    # bid stats, maintained by trigger on bids (read-only from the app)
+    highest_bid: Mapped[float | None] = mapped_column(Numeric(10,2))
+    bid_count: Mapped[int]       = mapped_column(Integer, default=0, nullable=False)
+    last_bid_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
 
 class ItemImage(Base):
     __tablename__ = "item_images"
@@ -44,6 +50,7 @@ class ItemImage(Base):
     image_path: Mapped[str]      = mapped_column(Text, nullable=False)
     is_primary: Mapped[bool]     = mapped_column(Boolean, default=False, nullable=False)
     sort_order: Mapped[int]      = mapped_column(Integer, default=0, nullable=False)
+    variants: Mapped[list[str]]  = mapped_column(ARRAY(Text), default=list, nullable=False)  # e.g. ["thumb", "detail"]
 
 
 class Bid(Base):
@@ -0,0 +1,126 @@
+"""
+SQL for the per-user screens and the item detail page.
+
+Kept out of ui.py so app.bench_queries runs exactly what the pages run.
+The Browse feed lives in app.browse (page_sql / count_items).
+"""
+from app.browse import COVER_IMAGE_SQL
+
+ITEM_DETAIL_SQL = """
+    SELECT i.id, i.title, i.description, i.price, i.status, i.listing_type,
+           COALESCE(c.name, 'Uncategorized') AS category,
+           u.email AS seller_email, u.id AS seller_id,
+           i.pickup_location, i.highest_bid, i.auction_end_at
+    FROM items i
+    LEFT JOIN categories c ON c.id = i.category_id
+    JOIN users u ON u.id = i.seller_id
+    WHERE i.id = :iid
+"""
+
+# primary image first, then the rest (future gallery)
+ITEM_IMAGES_SQL = """
+    SELECT image_path, variants, is_primary, sort_order
+    FROM item_images
+    WHERE item_id = :iid
+    ORDER BY is_primary DESC, sort_order ASC, created_at ASC
+"""
+
+def my_listings_count_sql(where_sql: str) -> str:
+    """Listing count for My Listings; where_sql is over items i (params: :sid, ...)."""
+    return f"""
+        SELECT COUNT(*)
+        FROM items i
+        WHERE {where_sql}
+    """
+
+def my_listings_page_sql(where_sql: str) -> str:
+    """One page of My Listings (params: filter params, :limit, :offset)."""
+    return f"""
+        WITH base AS (
+            SELECT i.id, i.title, i.price, i.status, i.listing_type, i.created_at,
+                   COALESCE(c.name, 'Uncategorized') AS category,
+                   COALESCE(i.highest_bid, 0) AS highest_bid
+            FROM items i
+            LEFT JOIN categories c ON c.id = i.category_id
+            WHERE {where_sql}
+            ORDER BY i.created_at DESC
+            LIMIT :limit OFFSET :offset
+        )
+        SELECT b.id, b.title, b.price, b.status, b.listing_type, b.category, b.created_at,
+               COALESCE(img.image_path, NULL) AS image_path, img.variants,
+               b.highest_bid
+        FROM base b
+        LEFT JOIN LATERAL ({COVER_IMAGE_SQL.format(item="b.id")}) img ON TRUE
+        ORDER BY b.created_at DESC
+    """
+
+# given listings of the seller, for refreshing their cards (params: :sid, :ids, :limit, :offset)
+MY_LISTINGS_BY_ID_SQL = my_listings_page_sql("i.seller_id = :sid AND i.id = ANY(CAST(:ids AS uuid[]))")
+
+# top 20 live bids for each listing in :ids (the open "View bids" panels)
+LISTING_BIDS_SQL = """
+    SELECT item_id, bid_id, amount, placed_at, bidder, status
+    FROM (
+        SELECT b.item_id, b.id AS bid_id, b.amount, b.placed_at, u.email AS bidder, b.status,
+               ROW_NUMBER() OVER (PARTITION BY b.item_id ORDER BY b.amount DESC, b.placed_at DESC) AS rn
+        FROM bids b
+        JOIN users u ON u.id = b.bidder_id
+        WHERE b.item_id = ANY(CAST(:ids AS uuid[])) AND b.status != 'declined'
+    ) ranked
+    WHERE rn <= 20
+    ORDER BY item_id, amount DESC, placed_at DESC
+"""
+
+# My Purchases and My Bids include archived listings (app.archive_worker): they
+# read the all_items / all_bids / all_item_images views over hot + archive tables
+HISTORY_COVER_IMAGE_SQL = """
+    SELECT ii.image_path, ii.variants
+    FROM all_item_images ii
+    WHERE ii.item_id = {item}
+    ORDER BY ii.is_primary DESC, ii.sort_order ASC, ii.created_at ASC
+    LIMIT 1
+"""
+
+MY_PURCHASES_SQL = f"""
+    SELECT i.id, i.title, i.price, i.status,
+           u.email AS seller_email,
+           COALESCE(c.name, 'Uncategorized') AS category,
+           img.image_path, img.variants
+    FROM all_items i
+    JOIN all_bids b ON b.id = i.chosen_bid_id
+    JOIN users u ON u.id = i.seller_id
+    LEFT JOIN categories c ON c.id = i.category_id
+    LEFT JOIN LATERAL ({HISTORY_COVER_IMAGE_SQL.format(item="i.id")}) img ON TRUE
+    WHERE b.bidder_id = :uid
+    ORDER BY i.created_at DESC
+"""
+
+def my_bids_sql(where_sql: str) -> str:
+    """The user's best bid per item; where_sql is over bids b (params: :uid, ...)."""
+    # best bid per item straight off idx_bids_bidder / idx_bids_archive_bidder
+    # (already in DISTINCT ON order), then the item and cover for just those
+    return f"""
+        WITH best AS (
+            SELECT DISTINCT ON (b.item_id)
+                b.item_id, b.amount, b.placed_at, b.status AS bid_status
+            FROM all_bids b
+            WHERE {where_sql}
+            ORDER BY b.item_id, b.amount DESC, b.placed_at DESC
+        )
+        SELECT m.*, i.status, i.chosen_bid_id, i.title, i.price AS base_price,
+               i.listing_type, i.highest_bid, img.image_path, img.variants
+        FROM best m
+        -- one primary-key probe per item: DISTINCT ON's row estimate is a guess,
+        -- and a plain join over the all_items union gets hashed against both tables
+        JOIN LATERAL (
+            SELECT status, chosen_bid_id, title, price, listing_type, highest_bid
+            FROM all_items WHERE id = m.item_id LIMIT 1
+        ) i ON TRUE
+        LEFT JOIN LATERAL ({HISTORY_COVER_IMAGE_SQL.format(item="m.item_id")}) img ON TRUE
+        ORDER BY m.placed_at DESC
+    """
+
+MY_BIDS_SQL = my_bids_sql("b.bidder_id = :uid")
+
+# the same, for given items only, for refreshing their cards (params: :uid, :ids)
+MY_BIDS_BY_ITEM_SQL = my_bids_sql("b.bidder_id = :uid AND b.item_id = ANY(CAST(:ids AS uuid[]))")
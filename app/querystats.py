@@ -0,0 +1,198 @@
+"""
+Per-statement timing for everything that goes through the engine.
+
+install(engine) hooks SQLAlchemy's cursor events. Each statement is timed
+and tagged with the render_* function that issued it (or the nearest app
+function when no render_* frame is on the stack). The result feeds:
+
+  * process-wide latency histograms per (tag, statement): snapshot()
+  * the current rerun's count / DB time: begin_rerun() + rerun_stats()
+  * a slow-query log: read-only statements slower than SLOW_QUERY_MS are
+    re-run under EXPLAIN (ANALYZE, BUFFERS) by flush_slow_log() once the
+    rerun has finished, and appended to SLOW_QUERY_LOG as JSON lines.
+    Bound values never reach the log (they include password hashes and
+    emails): only their names and types are written, and quoted literals
+    are masked in the plan text, where EXPLAIN inlines them.
+
+The EXPLAIN runs on a separate raw connection inside a READ ONLY
+transaction with a statement timeout, and is always rolled back, so a
+statement that turns out to write (e.g. SELECT place_bid(...)) just fails
+there. Set SQL_STATS=0 to leave the engine uninstrumented.
+"""
+import bisect
+import json
+import os
+import re
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import event
+
+ENABLED = os.getenv("SQL_STATS", "1") == "1"
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "250"))   # 0 disables the slow log
+SLOW_QUERY_LOG = os.getenv("SLOW_QUERY_LOG", "slow_queries.log")
+EXPLAIN_TIMEOUT_MS = int(os.getenv("SLOW_QUERY_EXPLAIN_TIMEOUT_MS", "10000"))
+
+# histogram bucket upper bounds in ms; the last bucket is open-ended
+BUCKETS_MS = (0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+_lock = threading.Lock()
+_stats = {}  # (tag, statement) -> {"count", "total_ms", "max_ms", "buckets"}
+_local = threading.local()
+_engine = None
+
+_WRITE_RE = re.compile(r"\b(insert|update|delete|merge|truncate|copy|call)\b|\bfor\s+(no\s+key\s+)?(update|share|key\s+share)\b", re.I)
+_LITERAL_RE = re.compile(r"'(?:[^']|'')*'")
+_OWN_FILES = ("sqlalchemy", os.path.join("app", "db.py"), os.path.join("app", "querystats.py"))
+
+def _normalize(statement: str) -> str:
+    return " ".join(statement.split())
+
+def _caller_tag() -> str:
+    """Nearest render_* frame, else the nearest frame outside SQLAlchemy and this module."""
+    f = sys._getframe(2)
+    fallback = None
+    while f is not None:
+        name, path = f.f_code.co_name, f.f_code.co_filename
+        if name.startswith("render_"):
+            return name
+        if fallback is None and not any(p in path for p in _OWN_FILES):
+            fallback = f"{os.path.splitext(os.path.basename(path))[0]}.{name}"
+        f = f.f_back
+    return fallback or "?"
+
+def _rerun() -> dict:
+    r = getattr(_local, "rerun", None)
+    if r is None:
+        r = _local.rerun = {"count": 0, "total_ms": 0.0, "statements": [], "slow": []}
+    return r
+
+def _before(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("_qs_start", []).append(time.perf_counter())
+
+def _after(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("_qs_start")
+    if not starts:
+        return
+    ms = (time.perf_counter() - starts.pop()) * 1000
+    tag = _caller_tag()
+    key = (tag, _normalize(statement))
+
+    with _lock:
+        st = _stats.get(key)
+        if st is None:
+            st = _stats[key] = {"count": 0, "total_ms": 0.0, "max_ms": 0.0, "buckets": [0] * (len(BUCKETS_MS) + 1)}
+        st["count"] += 1
+        st["total_ms"] += ms
+        st["max_ms"] = max(st["max_ms"], ms)
+        st["buckets"][bisect.bisect_left(BUCKETS_MS, ms)] += 1
+
+    r = _rerun()
+    r["count"] += 1
+    r["total_ms"] += ms
+    r["statements"].append((tag, round(ms, 2), key[1][:120]))
+    if SLOW_QUERY_MS > 0 and ms >= SLOW_QUERY_MS and not executemany:
+        r["slow"].append({"tag": tag, "ms": round(ms, 2), "statement": statement, "parameters": parameters})
+
+def install(engine) -> None:
+    """Attach the timing hooks to `engine` (once)."""
+    global _engine
+    if not ENABLED or _engine is not None:
+        return
+    _engine = engine
+    event.listen(engine, "before_cursor_execute", _before)
+    event.listen(engine, "after_cursor_execute", _after)
+
+def begin_rerun() -> None:
+    """Start counting for a new rerun on this thread."""
+    _local.rerun = None
+
+def rerun_stats() -> dict:
+    """Statements run on this thread since begin_rerun(): count, total_ms, [(tag, ms, sql)]."""
+    r = _rerun()
+    return {"count": r["count"], "total_ms": round(r["total_ms"], 2), "statements": list(r["statements"])}
+
+def _percentile(buckets, count: int, q: float) -> float:
+    """Upper bound of the bucket holding the q-th quantile (the open bucket reports the largest bound)."""
+    target, seen = q * count, 0
+    for k, n in enumerate(buckets):
+        seen += n
+        if seen >= target:
+            return BUCKETS_MS[min(k, len(BUCKETS_MS) - 1)]
+    return BUCKETS_MS[-1]
+
+def snapshot(limit: int = 20) -> list:
+    """Top statements by total time since start, with histogram-estimated p50/p95."""
+    with _lock:
+        items = [(k, dict(v, buckets=list(v["buckets"]))) for k, v in _stats.items()]
+    items.sort(key=lambda kv: kv[1]["total_ms"], reverse=True)
+    return [{
+        "tag": tag,
+        "statement": sql[:200],
+        "count": st["count"],
+        "total_ms": round(st["total_ms"], 2),
+        "avg_ms": round(st["total_ms"] / st["count"], 2),
+        "p50_le_ms": _percentile(st["buckets"], st["count"], 0.50),
+        "p95_le_ms": _percentile(st["buckets"], st["count"], 0.95),
+        "max_ms": round(st["max_ms"], 2),
+    } for (tag, sql), st in items[:limit]]
+
+def reset() -> None:
+    with _lock:
+        _stats.clear()
+
+def _explain(statement: str, parameters) -> str:
+    raw = _engine.raw_connection()  # DBAPI level: not seen by our own hooks
+    try:
+        cur = raw.cursor()
+        try:
+            cur.execute("SET TRANSACTION READ ONLY")  # first statement of psycopg2's implicit transaction
+            cur.execute(f"SET LOCAL statement_timeout = {EXPLAIN_TIMEOUT_MS}")
+            cur.execute("EXPLAIN (ANALYZE, BUFFERS) " + statement, parameters)
+            return _LITERAL_RE.sub("'?'", "\n".join(row[0] for row in cur.fetchall()))
+        finally:
+            cur.close()
+            raw.rollback()
+    finally:
+        raw.close()
+
+def _param_types(parameters):
+    """Names and types of the bound values, never the values themselves."""
+    if isinstance(parameters, dict):
+        return {k: type(v).__name__ for k, v in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        if parameters and isinstance(parameters[0], (dict, list, tuple)):  # executemany
+            return {"rows": len(parameters), "each": _param_types(parameters[0])}
+        return [type(v).__name__ for v in parameters]
+    return type(parameters).__name__
+
+def flush_slow_log() -> int:
+    """
+    EXPLAIN and log this rerun's slow statements; call after the page has
+    rendered so the user never waits on it. Returns how many were logged.
+    """
+    r = getattr(_local, "rerun", None)
+    if not r or not r["slow"] or _engine is None:
+        return 0
+    slow, r["slow"] = r["slow"], []
+
+    with open(SLOW_QUERY_LOG, "a", encoding="utf-8") as f:
+        for entry in slow:
+            if _WRITE_RE.search(entry["statement"]):
+                plan = None  # writes are logged but never replayed
+            else:
+                try:
+                    plan = _explain(entry["statement"], entry["parameters"])
+                except Exception as e:
+                    plan = f"EXPLAIN failed: {str(e).strip().splitlines()[0]}"
+            f.write(json.dumps({
+                "at": datetime.now(timezone.utc).isoformat(),
+                "tag": entry["tag"],
+                "ms": entry["ms"],
+                "statement": _normalize(entry["statement"]),
+                "parameters": _param_types(entry["parameters"]),
+                "plan": plan,
+            }) + "\n")
+    return len(slow)
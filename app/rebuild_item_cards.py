@@ -0,0 +1,71 @@
+"""
+Regenerate item_cards (the Browse read model) from the source tables.
+
+    python -m app.rebuild_item_cards [--batch 5000] [--check]
+
+Walks items in id order, compares each batch's cards with item_card_source
+and rewrites the ones that differ or are missing with refresh_item_cards(),
+one transaction per batch, so Browse keeps reading while it runs. With
+--check nothing is written: out-of-date cards are listed and the exit
+status is non-zero if there were any. Run it after loading rows with
+triggers off or after changing item_card_source. Safe to re-run.
+"""
+import argparse
+import sys
+
+from sqlalchemy import text
+from app.db import Session
+
+STALE_SQL = text("""
+    SELECT src.id
+    FROM item_card_source src
+    LEFT JOIN item_cards ic ON ic.id = src.id
+    WHERE src.id = ANY(CAST(:ids AS uuid[]))
+      AND ROW(ic.*) IS DISTINCT FROM ROW(src.*)
+""")
+
+def run(batch_size: int = 5000, check: bool = False) -> int:
+    """Returns the number of cards that were out of date."""
+    seen, stale_total = 0, 0
+    last_id = None
+
+    s = Session()
+    try:
+        while True:
+            ids = [str(i) for i in s.execute(text("""
+                SELECT id FROM items
+                WHERE CAST(:after AS uuid) IS NULL OR id > CAST(:after AS uuid)
+                ORDER BY id
+                LIMIT :n
+            """), {"after": last_id, "n": batch_size}).scalars()]
+            if not ids:
+                break
+
+            stale = [str(i) for i in s.execute(STALE_SQL, {"ids": ids}).scalars()]
+            if check:
+                for item_id in stale:
+                    print(f"{item_id}: card out of date")
+            elif stale:
+                s.execute(text("SELECT refresh_item_cards(CAST(:ids AS uuid[]))"), {"ids": stale})
+            s.commit()
+            seen += len(ids)
+            stale_total += len(stale)
+            last_id = ids[-1]
+            print(f"... {seen} listings, {stale_total} card(s) {'out of date' if check else 'rewritten'}")
+    except Exception:
+        s.rollback()
+        raise
+    finally:
+        Session.remove()
+
+    print(f"{'Check' if check else 'Rebuild'} finished: {seen} listing(s), "
+          f"{stale_total} card(s) {'out of date' if check else 'rewritten'}.")
+    return stale_total
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--batch", type=int, default=5000, help="listings per transaction")
+    parser.add_argument("--check", action="store_true", help="only report out-of-date cards")
+    args = parser.parse_args()
+    stale = run(args.batch, args.check)
+    sys.exit(1 if args.check and stale else 0)
@@ -0,0 +1,121 @@
+"""
+Keyword search for Browse, served by the trigram GIN indexes on items.title
+and items.description (idx_items_trgm_title / idx_items_trgm_desc).
+
+Every word of the query must appear in the title or description (ILIKE,
+which pg_trgm indexes). Only words of MIN_QUERY_LEN or more characters are
+index predicates; a shorter pattern has no trigram to look up and would
+read the whole index, so short words only filter the rows the long ones
+found, and a query without a long word does not run. Matches are ranked by
+how well the query fits the title plus a recency bonus, and combined with
+the regular Browse filters.
+
+Results are cached per (query, filters) for SEARCH_CACHE_TTL seconds. When
+a query extends one that is already cached (typing "bik" -> "bike") and the
+cached result was complete, the new query only re-checks those ids instead
+of scanning the indexes again: a longer query can only match fewer items.
+"""
+import os
+import threading
+from typing import List
+
+from cachetools import TTLCache
+from sqlalchemy import text
+
+MIN_QUERY_LEN = 3    # trigram indexes need at least one full trigram per word
+MAX_RESULTS = 200    # ranked results kept per query; pages are sliced from these
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", "30"))  # seconds
+
+_cache = TTLCache(maxsize=512, ttl=SEARCH_CACHE_TTL)
+_lock = threading.Lock()
+
+def normalize(q: str) -> str:
+    """Lower-case and collapse whitespace so equivalent queries share a cache entry."""
+    return " ".join((q or "").lower().split())
+
+def searchable(q: str) -> bool:
+    """Whether a normalized query has a word the trigram indexes can look up."""
+    return any(len(w) >= MIN_QUERY_LEN for w in q.split())
+
+def _like(word: str) -> str:
+    escaped = word.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+def _run(s, q: str, where_sql: str, params: dict, within_ids=None) -> List[dict]:
+    words = list(dict.fromkeys(q.split()))
+    long_words = [k for k, w in enumerate(words) if len(w) >= MIN_QUERY_LEN]
+    short_words = [k for k, w in enumerate(words) if len(w) < MIN_QUERY_LEN]
+    match = " AND ".join(
+        f"(t.title ILIKE :w{k} OR t.description ILIKE :w{k})" for k in long_words
+    )
+    post_filter = "".join(
+        f" AND (m.title ILIKE :w{k} OR m.description ILIKE :w{k})" for k in short_words
+    )
+    restrict = "AND i.id = ANY(CAST(:ids AS uuid[]))" if within_ids is not None else ""
+
+    # MATERIALIZED keeps the short words out of the index scan
+    sql = text(f"""
+        WITH m AS MATERIALIZED (
+            SELECT i.id, i.title, i.price, i.created_at,
+                   COALESCE(i.category, 'Uncategorized') AS category,
+                   i.seller_email, i.image_path, i.variants,
+                   i.pickup_location, t.description,
+                   -- title fit dominates; newer listings win ties (decays over ~a week)
+                   0.7 * word_similarity(:q, i.title)
+                     + 0.3 / (1 + EXTRACT(EPOCH FROM NOW() - i.created_at) / 604800.0) AS score
+            FROM item_cards i
+            JOIN items t ON t.id = i.id  -- the text (and its trigram indexes) stays on items
+            WHERE {where_sql}
+              AND {match}
+              {restrict}
+        )
+        SELECT m.id, m.title, m.price, m.created_at, m.category,
+               m.seller_email, m.image_path, m.variants, m.pickup_location, m.score
+        FROM m
+        WHERE TRUE{post_filter}
+        ORDER BY m.score DESC, m.created_at DESC, m.id DESC
+        LIMIT :max_results
+    """)
+    bind = {**params, "q": q, "max_results": MAX_RESULTS}
+    bind.update({f"w{k}": _like(w) for k, w in enumerate(words)})
+    if within_ids is not None:
+        bind["ids"] = [str(i) for i in within_ids]
+    return [dict(r) for r in s.execute(sql, bind).mappings().all()]
+
+def search(s, q: str, where_sql: str, params: dict) -> List[dict]:
+    """
+    Up to MAX_RESULTS ranked matches for `q` within the Browse filters
+    (where_sql/params from browse.build_filters). Rows carry the same
+    columns as a Browse page.
+    """
+    q = normalize(q)
+    if not searchable(q):
+        return []
+
+    filters = (where_sql, tuple(sorted(params.items())))
+    with _lock:
+        hit = _cache.get((q, filters))
+        narrower = None
+        if hit is None:
+            # longest cached prefix whose result set was complete
+            for n in range(len(q) - 1, MIN_QUERY_LEN - 1, -1):
+                prev = _cache.get((q[:n], filters))
+                if prev is not None:
+                    narrower = prev if len(prev) < MAX_RESULTS else None
+                    break
+    if hit is not None:
+        return hit
+
+    if narrower is not None:
+        rows = _run(s, q, where_sql, params, within_ids=[r["id"] for r in narrower]) if narrower else []
+    else:
+        rows = _run(s, q, where_sql, params)
+
+    with _lock:
+        _cache[(q, filters)] = rows
+    return rows
+
+def invalidate() -> None:
+    """Drop cached results, e.g. after a listing is posted or closed."""
+    with _lock:
+        _cache.clear()
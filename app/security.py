@@ -1,9 +1,64 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Tuple
+
 from passlib.hash import pbkdf2_sha256
 
+# Target PBKDF2 cost for new hashes. Stored hashes with a different cost are
+# re-hashed on the user's next successful login (see verify_and_upgrade).
+PBKDF2_ROUNDS = int(os.getenv("PBKDF2_ROUNDS", str(pbkdf2_sha256.default_rounds)))
+
+# Hashing runs in worker processes so a burst of logins can't hold the GIL the
+# Streamlit script threads need. 0 = hash inline (CLIs, tests).
+HASH_WORKERS = int(os.getenv("AUTH_HASH_WORKERS", str(os.cpu_count() or 1)))
+MAX_PENDING = HASH_WORKERS * 4  # callers beyond this wait for a slot instead of queueing unboundedly
+
+_hasher = pbkdf2_sha256.using(rounds=PBKDF2_ROUNDS)
+_pool = None
+_pool_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(max(1, MAX_PENDING))
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: never fork a process that is running Streamlit's threads
+            _pool = ProcessPoolExecutor(max_workers=HASH_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+def _offload(fn, *args):
+    if HASH_WORKERS <= 0:
+        return fn(*args)
+    with _slots:
+        return _get_pool().submit(fn, *args).result()
+
+def _hash(pw: str) -> str:
+    return _hasher.hash(pw)
+
+def _verify_and_upgrade(pw: str, hash_: str) -> Tuple[bool, Optional[str]]:
+    if not pbkdf2_sha256.verify(pw, hash_):
+        return False, None
+    if needs_rehash(hash_):
+        return True, _hasher.hash(pw)
+    return True, None
+
+def needs_rehash(hash_: str) -> bool:
+    """True if a stored hash was made with a cost other than PBKDF2_ROUNDS."""
+    return pbkdf2_sha256.from_string(hash_).rounds != PBKDF2_ROUNDS
+
 def hash_password(pw: str) -> str:
     """Return a salted PBKDF2-SHA256 hash for storage."""
-    return pbkdf2_sha256.hash(pw)
+    return _offload(_hash, pw)
 
 def verify_password(pw: str, hash_: str) -> bool:
     """Check a plain password against a stored PBKDF2-SHA256 hash."""
-    return pbkdf2_sha256.verify(pw, hash_)
+    return _offload(_verify_and_upgrade, pw, hash_)[0]
+
+def verify_and_upgrade(pw: str, hash_: str) -> Tuple[bool, Optional[str]]:
+    """
+    Check a password; if it matches and the stored cost is out of date,
+    also return a fresh hash to store. Returns (ok, new_hash_or_None).
+    """
+    return _offload(_verify_and_upgrade, pw, hash_)
@@ -1,11 +1,11 @@
 from sqlalchemy import text
-from app.db import engine, Session
+from app.db import get_engine, Session
 from app.models import User, Category, Item
 from app.security import hash_password
 
 def run():
     # 1) Connectivity check
-    with engine.begin() as conn:
+    with get_engine().begin() as conn:
         now = conn.execute(text("SELECT now()")).scalar_one()
         print("DB time:", now)
 
@@ -46,7 +46,7 @@ def run():
         s.commit()
 
         # 5) Read it back with a join (raw SQL for clarity)
-        with engine.begin() as conn:
+        with get_engine().begin() as conn:
             rows = conn.execute(text("""
                 SELECT i.title, i.price, c.name AS category, u.email AS seller
                 FROM items i
@@ -0,0 +1,155 @@
+"""
+Sampled per-rerun tracing: nested spans written as Chrome trace events.
+
+A sampled rerun (TRACE_SAMPLE_RATE, 0..1; 0 = off) records a span for
+every @traced render_* function, every SQL statement (via install(engine))
+and every `with span(...)` block such as the CSS injections. When the rerun
+ends, its events are appended to TRACE_FILE as one JSON line:
+
+    {"traceEvents": [{"name", "cat", "ph": "X", "ts", "dur", "pid", "tid", "args"}, ...]}
+
+Each line is a complete trace document that chrome://tracing, Perfetto and
+speedscope open as-is. To combine lines, or to get folded stacks for
+flamegraph.pl / speedscope:
+
+    python -m app.tracing traces.jsonl --merge merged.json
+    python -m app.tracing traces.jsonl --folded > stacks.txt
+
+Unsampled reruns pay one thread-local lookup per span.
+"""
+import argparse
+import functools
+import json
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0"))
+TRACE_FILE = os.getenv("TRACE_FILE", "traces.jsonl")
+
+_local = threading.local()
+_write_lock = threading.Lock()
+_engine = None
+
+def _now_us() -> float:
+    return time.perf_counter_ns() / 1000
+
+def start_rerun(name: str = "rerun", **args) -> bool:
+    """Begin a trace for this thread's rerun if it is sampled; returns whether it is."""
+    if SAMPLE_RATE <= 0 or random.random() >= SAMPLE_RATE:
+        _local.trace = None
+        return False
+    _local.trace = {"events": [], "root": (name, "rerun", _now_us(), args)}
+    return True
+
+def end_rerun() -> None:
+    """Close the root span and append the rerun's events to TRACE_FILE."""
+    trace = getattr(_local, "trace", None)
+    _local.trace = None
+    if trace is None:
+        return
+    name, cat, start, args = trace["root"]
+    events = [_event(name, cat, start, _now_us(), args)] + trace["events"]
+    line = json.dumps({"traceEvents": events, "displayTimeUnit": "ms"}, default=str)
+    with _write_lock, open(TRACE_FILE, "a", encoding="utf-8") as f:
+        f.write(line + "\n")
+
+def _event(name, cat, start, end, args) -> dict:
+    return {"name": name, "cat": cat, "ph": "X", "ts": round(start, 1), "dur": round(end - start, 1),
+            "pid": os.getpid(), "tid": threading.get_ident(), "args": args}
+
+@contextmanager
+def span(name: str, cat: str = "app", **args):
+    """Time the enclosed block as a child of whatever span is open."""
+    trace = getattr(_local, "trace", None)
+    if trace is None:
+        yield
+        return
+    start = _now_us()
+    try:
+        yield
+    finally:
+        trace["events"].append(_event(name, cat, start, _now_us(), args))
+
+def traced(fn=None, *, cat: str = "render"):
+    """Decorator: run the function inside a span named after it."""
+    def wrap(f):
+        @functools.wraps(f)
+        def inner(*a, **kw):
+            if getattr(_local, "trace", None) is None:
+                return f(*a, **kw)
+            with span(f.__name__, cat):
+                return f(*a, **kw)
+        return inner
+    return wrap(fn) if fn is not None else wrap
+
+def _before(conn, cursor, statement, parameters, context, executemany):
+    if getattr(_local, "trace", None) is not None:
+        conn.info.setdefault("_trace_start", []).append(_now_us())
+
+def _after(conn, cursor, statement, parameters, context, executemany):
+    trace = getattr(_local, "trace", None)
+    starts = conn.info.get("_trace_start")
+    if trace is None or not starts:
+        return
+    sql = " ".join(statement.split())
+    trace["events"].append(_event(sql[:60], "sql", starts.pop(), _now_us(),
+                                  {"sql": sql[:500], "rows": cursor.rowcount}))
+
+def install(engine) -> None:
+    """Record a span for each statement run on `engine` during a sampled rerun."""
+    from sqlalchemy import event
+
+    global _engine
+    if _engine is not None:
+        return
+    _engine = engine
+    event.listen(engine, "before_cursor_execute", _before)
+    event.listen(engine, "after_cursor_execute", _after)
+
+def _read(path: str):
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)["traceEvents"]
+
+def folded(path: str):
+    """Yield 'root;child;leaf self_us' lines (self time per stack), as flamegraph.pl expects."""
+    totals = {}
+    for events in _read(path):
+        # parents start no later and end no earlier than their children
+        events = sorted(events, key=lambda e: (e["tid"], e["ts"], -e["dur"]))
+        stack = []  # (event, child time)
+        def close(entry):
+            ev, child = entry
+            key = ";".join(e["name"].replace(";", ",") for e, _ in stack + [entry])
+            totals[key] = totals.get(key, 0) + max(0.0, ev["dur"] - child)
+            if stack:
+                stack[-1][1] += ev["dur"]
+        for ev in events:
+            while stack and ev["ts"] >= stack[-1][0]["ts"] + stack[-1][0]["dur"]:
+                close(stack.pop())
+            stack.append([ev, 0.0])
+        while stack:
+            close(stack.pop())
+    for key, us in sorted(totals.items()):
+        yield f"{key} {int(us)}"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("file", nargs="?", default=TRACE_FILE, help="trace JSONL file")
+    out = parser.add_mutually_exclusive_group(required=True)
+    out.add_argument("--merge", metavar="OUT", help="write all reruns into one chrome://tracing JSON file")
+    out.add_argument("--folded", action="store_true", help="print folded stacks (flamegraph.pl, speedscope)")
+    args = parser.parse_args()
+
+    if args.folded:
+        for line in folded(args.file):
+            print(line)
+    else:
+        events = [e for evs in _read(args.file) for e in evs]
+        with open(args.merge, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        print(f"wrote {len(events)} events to {args.merge}")
@@ -1,6 +1,7 @@
 import os
 from dotenv import load_dotenv
 import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 
 
 # --- ensure project root is on sys.path ---
@@ -10,13 +11,18 @@ if PROJECT_ROOT not in sys.path:
     sys.path.insert(0, PROJECT_ROOT)
 # ------------------------------------------
 
-from app.db import Session
-from app.models import Item, ItemImage, Category
-from app.utils import save_uploaded_image
+from app.db import Session, pool_metrics
+from app.models import Item, ItemImage
+from app.utils import save_uploaded_image, restore_saved_image, pick_image_variant, get_upload_root, static_media_url, static_image_url
+from app import alerts, bids, browse, catalog, facets, geo, live, queries, querystats, search, tracing
     
 
 import base64
+import html
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
 
+@tracing.traced
 def add_fullscreen_bg(image_file):
     with open(image_file, "rb") as f:
         encoded = base64.b64encode(f.read()).decode()
@@ -90,9 +96,11 @@ except Exception as e:
 
 
 #BOXED LAYOUT
+@tracing.traced
 def render_logged_out():
     # Hide sidebar when logged out for a cleaner look
-    st.markdown("""
+    with tracing.span("css", "render"):
+        st.markdown("""
         <style>
             section[data-testid="stSidebar"] { display: none !important; }
 
@@ -188,6 +196,7 @@ def render_logged_out():
             st.markdown('</div>', unsafe_allow_html=True)  # close .boxed-inner
 
 
+@tracing.traced
 def render_logged_in():
     
 
@@ -201,17 +210,24 @@ def render_logged_in():
             '''
             <div style="text-align: right;">
                 <h3 style="margin-bottom: 5px;">Welcome to your marketplace</h3>
-                <input type="text" placeholder="Search..." 
-                    style="width: 60%; padding: 8px; border-radius: 6px; border: 1px solid #ccc;">
             </div>
             ''',
             unsafe_allow_html=True
         )
+        unread = _unread_alerts(st.session_state.user["id"])
+        if unread:
+            st.markdown(f'<div style="text-align: right;">🔔 {unread} new listing(s) match your saved searches — see Alerts</div>',
+                        unsafe_allow_html=True)
+        _, search_col = st.columns([2, 3])
+        with search_col:
+            # read by render_browse_items; searching jumps back to the result list
+            st.text_input("Search", key="search_q", placeholder="Search...", label_visibility="collapsed",
+                          on_change=lambda: st.session_state.pop("viewing_item_id", None))
 
     st.markdown("---")
 
     # --- NAV TABS ---
-    tabs = ["Home", "Post Item", "My Listings", "My Purchases", "My Bids"]
+    tabs = ["Home", "Post Item", "My Listings", "My Purchases", "My Bids", "Alerts"]
     selected_tab = st.radio(
         label="Navigation",
         options=tabs,
@@ -220,7 +236,8 @@ def render_logged_in():
     )
 
     # --- Custom CSS for Tabs ---
-    st.markdown("""
+    with tracing.span("css", "render"):
+        st.markdown("""
         <style>
         div[data-baseweb="radio"] > div {
             justify-content: center;
@@ -252,8 +269,20 @@ def render_logged_in():
         render_my_purchases()
     elif selected_tab == "My Bids":
         render_my_bids()
+    elif selected_tab == "Alerts":
+        render_alerts()
 
     st.markdown("---")
+    if os.getenv("DEV_PANEL") == "1":
+        with st.expander("🛠 Developer: DB"):
+            rerun = querystats.rerun_stats()
+            st.markdown(f"**This rerun:** {rerun['count']} queries, {rerun['total_ms']:.1f} ms in the database")
+            st.dataframe([{"caller": t, "ms": ms, "sql": sql} for t, ms, sql in rerun["statements"]],
+                         use_container_width=True)
+            st.markdown("**Since start** (top statements by total time)")
+            st.dataframe(querystats.snapshot(), use_container_width=True)
+            st.markdown("**Connection pool**")
+            st.json(pool_metrics())
     st.markdown(f"Logged in as **{st.session_state.user['name']}**")
     if st.button("Log out"):
         st.session_state.user = None
@@ -262,6 +291,83 @@ def render_logged_in():
 
 
 
+def _after_listing_posted(price):
+    """Keep this process's Browse caches in step with a new active listing."""
+    browse.invalidate_counts()
+    facets.invalidate()
+    search.invalidate()
+    catalog.note_item_posted(price)
+
+
+def _after_listing_closed(price):
+    """Same, for a listing that was sold or closed."""
+    browse.invalidate_counts()
+    facets.invalidate()
+    search.invalidate()
+    catalog.note_item_closed(price)
+
+
+def _unread_alerts(user_id):
+    """The header's unread-alert count, kept in the session (the Alerts page drops it)."""
+    return alerts.cached_unread_count(Session(), st.session_state, user_id, live.start())
+
+
+@contextmanager
+def _fragment_rerun():
+    """
+    Wrap a fragment's body. A fragment-only rerun doesn't pass through the
+    gate at the bottom of this file, so its unit of work is closed here;
+    inside a full rerun this does nothing. A run that never opened a session
+    (an idle live tick) has nothing to close.
+    """
+    ctx = get_script_run_ctx()
+    if ctx is None or not ctx.fragment_ids_this_run:
+        yield
+        return
+    querystats.begin_rerun()
+    try:
+        yield
+    finally:
+        if Session.registry.has():
+            Session.remove()
+            querystats.flush_slow_log()
+
+
+@st.cache_resource
+def _static_media_url():
+    """URL prefix for uploads, or None when static serving is off or UPLOAD_DIR is outside app/static."""
+    if not st.get_option("server.enableStaticServing"):
+        return None
+    return static_media_url(get_upload_root())
+
+
+def show_image(rel_path, variants, want="thumb", css_class="", caption=None):
+    """
+    Show an upload as <img src="app/static/media/...">: the page carries only
+    the URL and the browser caches the file. Falls back to st.image from disk
+    when the uploads aren't statically served.
+    """
+    prefix = _static_media_url()
+    if prefix is None:
+        abs_path = os.path.join(get_upload_root(), pick_image_variant(rel_path, variants, want))
+        st.image(abs_path.replace("\\", "/"), caption=caption, use_container_width=True)
+        return
+    url = html.escape(static_image_url(prefix, rel_path, variants, want))
+    st.markdown(f'<div class="{css_class}"><img src="{url}" style="width:100%" /></div>', unsafe_allow_html=True)
+    if caption:
+        st.caption(caption)
+
+
+# "Auction ends" choices on the post form; app.auction_worker closes them when due
+AUCTION_DURATIONS = {
+    "1 day": timedelta(days=1),
+    "3 days": timedelta(days=3),
+    "7 days": timedelta(days=7),
+    "No end date (close manually)": None,
+}
+
+
+@tracing.traced
 def render_post_item():
     import uuid
     from uuid import UUID
@@ -275,12 +381,7 @@ def render_post_item():
         return
 
     # load categories for the dropdown
-    s = Session()
-    try:
-        cats = s.query(Category).order_by(Category.name).all()
-        cat_options = {c.name: str(c.id) for c in cats}
-    finally:
-        s.close()
+    cat_options = dict(catalog.categories())
 
     if not cat_options:
         st.info("No categories found. Add some categories in the DB first (e.g., Books, Electronics, Furniture).")
@@ -302,6 +403,8 @@ def render_post_item():
         else:
             price = st.number_input("Starting Price (USD)", min_value=0.0, value=10.0, step=1.0)
             buy_now_price = None
+        ends_in = st.selectbox("Auction ends", list(AUCTION_DURATIONS.keys()), index=2,
+                               help="Closed automatically; the highest bid wins.") if listing_type == "auction" else None
 
         category_name = st.selectbox("Category", list(cat_options.keys()))
         image = st.file_uploader("Main image", type=["jpg", "jpeg", "png", "webp"])
@@ -318,8 +421,8 @@ def render_post_item():
             return
 
         # save image
-        upload_root = os.getenv("UPLOAD_DIR", "uploads")
-        ok, rel_or_err = save_uploaded_image(image, upload_root, user["id"])
+        upload_root = get_upload_root()
+        ok, rel_or_err, variants = save_uploaded_image(image, upload_root)
         if not ok:
             st.error(rel_or_err)
             return
@@ -328,6 +431,7 @@ def render_post_item():
         s = Session()
         try:
             cat_id = UUID(cat_options[category_name])
+            lat, lng = geo.geocode(pickup_location, nearest_campus)  # local gazetteer, no network
 
             item = Item(
                 seller_id=UUID(user["id"]),
@@ -340,8 +444,9 @@ def render_post_item():
                 buy_now_price=buy_now_price,
                 pickup_location=pickup_location.strip() or None,
                 pickup_campus=nearest_campus,
-                pickup_lat=None,  # for future
-                pickup_lng=None   # for future
+                pickup_lat=lat,
+                pickup_lng=lng,
+                auction_end_at=(datetime.now(timezone.utc) + AUCTION_DURATIONS[ends_in]) if ends_in and AUCTION_DURATIONS[ends_in] else None,
             )
             s.add(item)
             s.flush()  # get item.id
@@ -351,29 +456,31 @@ def render_post_item():
                 image_path=rel_or_err,  # relative to UPLOAD_DIR
                 is_primary=True,
                 sort_order=0,
+                variants=variants,
             )
             s.add(img)
+            # saved searches that want this listing get an inbox entry in the same transaction
+            alerts.match_listing(s, item.id, item.seller_id, cat_id, nearest_campus, price, item.title, item.description)
             s.commit()
+            restore_saved_image(image, upload_root, rel_or_err, variants)  # in case a GC sweep raced the dedupe
+            _after_listing_posted(price)
 
             st.success("Listing created!")
-            abs_path = os.path.join(upload_root, rel_or_err).replace("\\", "/")
-            st.image(abs_path, caption=title, use_container_width=True)
+            show_image(rel_or_err, variants, "detail", caption=title)
         except Exception as e:
             s.rollback()
             st.error(f"Failed to create listing: {e}")
-        finally:
-            s.close()
 
 
+@tracing.traced
 def render_browse_items():
     import math
-    from sqlalchemy import text
 
     st.subheader("Browse Items")
 
-    # Initialize pagination state
-    if "browse_page" not in st.session_state:
-        st.session_state.browse_page = 1
+    # Initialize pagination state: one (created_at, id) cursor per page visited, None = first page
+    if "browse_cursors" not in st.session_state:
+        st.session_state.browse_cursors = [None]
 
 
     # If we're viewing a specific item, render detail with a Back button
@@ -391,132 +498,125 @@ def render_browse_items():
     # Filters row
     col1, col2, col3, col4 = st.columns([4, 3, 4, 2])
 
-    # Load categories for dropdown
-    s = Session()
-    try:
-        cats = s.query(Category).order_by(Category.name).all()
-        cat_names = ["All categories"] + [c.name for c in cats]
-        price_bounds = s.execute(text("SELECT MIN(price), MAX(price) FROM items WHERE status = 'active'")).first()
-        price_min, price_max = price_bounds if price_bounds else (0, 100)
-        # --- FIX: Ensure slider never breaks when min == max or DB is empty ---
-        # Handle None values (empty table)
-        if price_min is None:
-            price_min = 0
-        if price_max is None:
-            price_max = 100
-        # Avoid min == max which breaks Streamlit slider
-        if price_min == price_max:
-            price_min = 0
-            price_max = float(price_max) + 50
-    finally:
-        s.close()
-
+    # Load categories for dropdown (cached in-process, see app/catalog.py)
+    cat_names = ["All categories"] + [name for name, _ in catalog.categories()]
+    price_min, price_max = catalog.price_bounds()
+    # --- FIX: Ensure slider never breaks when min == max or DB is empty ---
+    # Handle None values (empty table)
+    if price_min is None:
+        price_min = 0
+    if price_max is None:
+        price_max = 100
+    # Avoid min == max which breaks Streamlit slider
+    if price_min == price_max:
+        price_min = 0
+        price_max = float(price_max) + 50
+
+
+    price_lo, price_hi = float(price_min or 0), float(price_max or 100)
+    kept = st.session_state.get("browse_price")
+    if kept and not (price_lo <= kept[0] <= kept[1] <= price_hi):
+        del st.session_state["browse_price"]  # the bounds moved under it
+
+    # The filters keep their values in session state, so the facet counts for
+    # this run's filter state are known before the widgets are drawn
+    def near_of(place, radius):
+        return None if place == "Anywhere" else (*geo.locate(place), radius)
+
+    ss = st.session_state
+    fc = facets.counts(Session(), ss.get("browse_cat", "All categories"), ss.get("browse_loc", "All"),
+                       *ss.get("browse_price", (price_lo, price_hi)),
+                       near=near_of(ss.get("browse_near", "Anywhere"), ss.get("browse_radius", 1.0)))
 
     with col1:
-        selected_cat = st.selectbox("Category", cat_names)
+        selected_cat = st.selectbox("Category", cat_names, key="browse_cat",
+                                    format_func=lambda n: f"{n} ({fc['category'].get(None if n == 'All categories' else n, 0)})")
 
     with col2:
-        location = st.selectbox("Location", ["All", "Busch", "College Ave", "Livingston", "Cook Douglas"])
+        location = st.selectbox("Location", ["All", "Busch", "College Ave", "Livingston", "Cook Douglas"], key="browse_loc",
+                                format_func=lambda n: f"{n} ({fc['campus'].get(None if n == 'All' else n, 0)})")
 
     with col3:
-        price_range = st.slider("Price Range (USD)", min_value=float(price_min or 0), max_value=float(price_max or 100), value=(float(price_min or 0), float(price_max or 100)), step = 50.0)
+        price_range = st.slider("Price Range (USD)", min_value=price_lo, max_value=price_hi, value=(price_lo, price_hi), step = 50.0, key="browse_price")
+        st.caption(" • ".join(f"{facets.bucket_label(k)}: {n}" for k, n in sorted(fc["price"].items()) if n))
 
     with col4:
         page_size = st.selectbox("Page size", [6, 9, 12, 15, 20], index=1)
 
+    # "Near me": nearest first within a radius of a campus landmark
+    col_near, col_radius, _, col_save = st.columns([4, 3, 3, 3])
+    with col_near:
+        near_place = st.selectbox("Near", ["Anywhere"] + geo.place_names(), key="browse_near")
+    radius = st.session_state.get("browse_radius", 1.0)
+    if near_place != "Anywhere":
+        with col_radius:
+            radius = st.selectbox("Within", [0.25, 0.5, 1.0, 2.0, 5.0], index=2, format_func=lambda r: f"{r:g} mi", key="browse_radius")
+    near = near_of(near_place, radius)
+
 
     # Build WHERE clause
-    where = ["i.status = 'active'"]
-    params = {}
-
-    if selected_cat != "All categories":
-        where.append("c.name = :cat_name")
-        params["cat_name"] = selected_cat
-
-    if location != "All":
-        where.append("i.pickup_campus = :location")
-        params["location"] = location
-
-    where.append("i.price BETWEEN :min_price AND :max_price")
-    params["min_price"] = price_range[0]
-    params["max_price"] = price_range[1]
-
-    where_sql = " AND ".join(where) if where else "TRUE"
-
-    # Count total for pagination
-    count_sql = text(f"""
-        SELECT COUNT(*)
-        FROM items i
-        LEFT JOIN categories c ON c.id = i.category_id
-        JOIN users u ON u.id = i.seller_id
-        WHERE {where_sql}
-    """)
-
-    # Fetch page of items (with one primary image if present)
-    # Note: using COALESCE to pick any image_path if no primary is set
-    list_sql = text(f"""
-        WITH base AS (
-            SELECT i.id, i.title, i.price, i.created_at,
-                   COALESCE(ci.name, 'Uncategorized') AS category,
-                   u.email AS seller_email,
-                   i.pickup_location
-            FROM items i
-            LEFT JOIN categories ci ON ci.id = i.category_id
-            JOIN users u ON u.id = i.seller_id
-            WHERE i.status = 'active'
-            {"AND ci.name = :cat_name" if selected_cat != "All categories" else ""}
-            {"AND i.pickup_campus = :location" if location != "All" else ""}
-            AND i.price BETWEEN :min_price AND :max_price
-            ORDER BY i.created_at DESC
-        ),
-        img AS (
-            SELECT ii.item_id,
-                   -- prefer primary image; else first by sort_order
-                   (SELECT image_path
-                    FROM item_images iix
-                    WHERE iix.item_id = ii.item_id
-                    ORDER BY iix.is_primary DESC, iix.sort_order ASC, iix.created_at ASC
-                    LIMIT 1) AS image_path
-            FROM item_images ii
-            GROUP BY ii.item_id
-        )
-        SELECT b.id, b.title, b.price, b.category, b.seller_email, b.created_at,
-               COALESCE(img.image_path, NULL) AS image_path,
-               b.pickup_location
-        FROM base b
-        LEFT JOIN img ON img.item_id = b.id
-        LIMIT :limit OFFSET :offset
-    """)
+    where_sql, params = browse.build_filters(selected_cat, location, price_range[0], price_range[1], near)
+
+    # Search box in the header switches Browse to ranked search results
+    query = search.normalize(st.session_state.get("search_q", ""))
+    searching = search.searchable(query)
+    if query and not searching:
+        st.caption(f"Type a word of at least {search.MIN_QUERY_LEN} characters to search.")
+
+    # Save the filters + keywords; new listings are matched against them when posted (app/alerts.py)
+    with col_save:
+        st.write("")
+        if st.button("🔔 Save this search", use_container_width=True):
+            ok, msg = alerts.save_search(
+                Session(), st.session_state.user["id"],
+                category_id=dict(catalog.categories()).get(selected_cat),
+                campus=None if location == "All" else location,
+                min_price=price_range[0] if price_range[0] > price_lo else None,  # slider ends = open range
+                max_price=price_range[1] if price_range[1] < price_hi else None,
+                keywords=query if searching else "",
+            )
+            (st.success if ok else st.warning)(msg)
 
-    # Handle pagination controls
-    col_prev, col_stat, col_next = st.columns([0.3, 3, 0.3])
-    with col_prev:
-        if st.button("⬅️ Prev", use_container_width=True, disabled=st.session_state.browse_page <= 1):
-            st.session_state.browse_page = max(1, st.session_state.browse_page - 1)
-            st.rerun()
-    with col_next:
-        # next button set after we know total
-        pass
+    # New filters start again from the first page
+    filter_sig = (where_sql, tuple(sorted(params.items())), page_size, query if searching else "")
+    if st.session_state.get("browse_filter_sig") != filter_sig:
+        st.session_state.browse_filter_sig = filter_sig
+        st.session_state.browse_cursors = [None]
+    cursors = st.session_state.browse_cursors
+    page = len(cursors)
 
     # Run queries
     s = Session()
-    try:
-        total = s.execute(count_sql, params).scalar_one()
-        total_pages = max(1, math.ceil(total / page_size))
-        page = min(st.session_state.browse_page, total_pages)
-        offset = (page - 1) * page_size
+    if searching:
+        # ranked matches are cached per query; cursors are offsets into them
+        matches = search.search(s, query, where_sql, params)
+        offset = cursors[-1] or 0
+        rows = matches[offset:offset + page_size]
+        next_cursor = offset + page_size if offset + page_size < len(matches) else None
+        total, approx = len(matches), False
+    else:
+        rows, next_cursor = browse.fetch_page(s, where_sql, params, cursors[-1], page_size, near=near is not None)
+        total, approx = browse.count_items(s, where_sql, params)
+    total_pages = max(page, math.ceil(total / page_size))
+    about = "~" if approx else ""
 
-        rows = s.execute(list_sql, {**params, "limit": page_size, "offset": offset}).mappings().all()
-    finally:
-        s.close()
+    # Handle pagination controls
+    col_prev, col_stat, col_next = st.columns([0.3, 3, 0.3])
+    with col_prev:
+        if st.button("⬅️ Prev", use_container_width=True, disabled=page <= 1):
+            cursors.pop()
+            st.rerun()
 
-    # Update Next button now that we know total/pages
     with col_stat:
-        st.write(f"Page {page} of {total_pages} • {total} result(s)")
+        if searching:
+            top = "top " if total >= search.MAX_RESULTS else ""
+            st.write(f"Page {page} of {total_pages} • {top}{total} match(es) for “{query}”")
+        else:
+            st.write(f"Page {page} of {about}{total_pages} • {about}{total} result(s)")
 
     with col_next:
-        if st.button("Next ➡️", use_container_width=True, disabled=page >= total_pages):
-            st.session_state.browse_page = min(total_pages, page + 1)
+        if st.button("Next ➡️", use_container_width=True, disabled=next_cursor is None):
+            cursors.append(next_cursor)
             st.rerun()
 
     st.divider()
@@ -527,7 +627,8 @@ def render_browse_items():
 
 
     # Add uniform image sizing via CSS
-    st.markdown("""
+    with tracing.span("css", "render"):
+        st.markdown("""
         <style>
             .uniform-img img {
                 object-fit: cover;      /* Crop rather than stretch */
@@ -552,14 +653,8 @@ def render_browse_items():
 
             with col:
                 # Thumbnail logic
-                img_md = ""
                 if r["image_path"]:
-                    abs_path = os.path.join(os.getenv("UPLOAD_DIR", "uploads"), r["image_path"]).replace("\\", "/")
-                    st.markdown(f"""
-                        <div class="uniform-img">
-                            <img src="data:image/jpeg;base64,{base64.b64encode(open(abs_path, "rb").read()).decode()}" />
-                        </div>
-                    """, unsafe_allow_html=True)
+                    show_image(r["image_path"], r["variants"], "thumb", css_class="uniform-img")
                 else:
                     st.caption("No image")
 
@@ -567,6 +662,8 @@ def render_browse_items():
                 st.caption(f"{r['category']} • {r['seller_email']}")
                 if r["pickup_location"]:
                     st.caption(f"📍 Pickup from: {r['pickup_location']}")
+                if r.get("distance_mi") is not None:
+                    st.caption(f"{r['distance_mi']:.1f} mi away")
                 st.write(f"${r['price']:.2f}")
                 if st.button("View", key=f"view_{r['id']}"):
                     st.session_state.viewing_item_id = str(r["id"])  # stay on Browse, show detail inline
@@ -574,6 +671,7 @@ def render_browse_items():
 
 
 
+@tracing.traced
 def render_item_detail(item_id_str: str):
     from uuid import UUID
     from sqlalchemy import text
@@ -589,47 +687,24 @@ def render_item_detail(item_id_str: str):
 
     # fetch item, seller, category, images, highest bid
     s = Session()
-    try:
-        item_row = s.execute(text("""
-            SELECT i.id, i.title, i.description, i.price, i.status, i.listing_type,
-                   COALESCE(c.name, 'Uncategorized') AS category,
-                   u.email AS seller_email, u.id AS seller_id,
-                   i.pickup_location
-            FROM items i
-            LEFT JOIN categories c ON c.id = i.category_id
-            JOIN users u ON u.id = i.seller_id
-            WHERE i.id = :iid
-        """), {"iid": str(item_id)}).mappings().first()
-
-        if not item_row:
-            st.error("Item not found.")
-            return
+    item_row = s.execute(text(queries.ITEM_DETAIL_SQL), {"iid": str(item_id)}).mappings().first()
 
-        # primary image (if any) + all images (future gallery)
-        imgs = s.execute(text("""
-            SELECT image_path, is_primary, sort_order
-            FROM item_images
-            WHERE item_id = :iid
-            ORDER BY is_primary DESC, sort_order ASC, created_at ASC
-        """), {"iid": str(item_id)}).mappings().all()
+    if not item_row:
+        st.error("Item not found.")
+        return
 
-        # highest bid
-        hb = s.execute(text("""
-            SELECT MAX(amount) AS highest FROM bids WHERE item_id = :iid
-        """), {"iid": str(item_id)}).scalar()
+    # primary image (if any) + all images (future gallery)
+    imgs = s.execute(text(queries.ITEM_IMAGES_SQL), {"iid": str(item_id)}).mappings().all()
 
-    finally:
-        s.close()
+    # highest bid (maintained on items by trigger)
+    hb = item_row["highest_bid"]
 
     # layout
     col_img, col_info = st.columns([3, 4], vertical_alignment="top")
 
     with col_img:
         if imgs:
-            upload_root = os.getenv("UPLOAD_DIR", "uploads")
-            main = imgs[0]["image_path"]
-            abs_path = os.path.join(upload_root, main).replace("\\", "/")
-            st.image(abs_path, use_container_width=True)
+            show_image(imgs[0]["image_path"], imgs[0]["variants"], "detail")
         else:
             st.caption("No image")
 
@@ -648,6 +723,8 @@ def render_item_detail(item_id_str: str):
         if item_row["listing_type"] == "auction":
             current_highest = float(hb) if hb is not None else 0.0
             st.markdown(f"**Current highest bid:** ${current_highest:.2f}")
+            if item_row["auction_end_at"] and item_row["status"] == "active":
+                st.caption(f"⏱ Ends {item_row['auction_end_at'].astimezone():%b %d, %H:%M}")
 
             if item_row["status"] == "active":
                 if not user:
@@ -659,29 +736,23 @@ def render_item_detail(item_id_str: str):
                         st.session_state.pop("just_bid")
                         
                     with st.form("place_bid_form", clear_on_submit=False):
-                        min_bid = max(current_highest + 1.00, 1.00)
+                        min_bid = float(bids.min_next_bid(hb))
                         default_bid = 0.0 if st.session_state.get("just_bid") else min_bid
-                        bid_amount = st.number_input("Your bid (USD)", min_value=min_bid, value=default_bid, step=1.00)
+                        bid_amount = st.number_input("Your bid (USD)", min_value=min_bid, value=default_bid, step=float(bids.BID_MIN_INCREMENT))
                         placed = st.form_submit_button("Place Bid", use_container_width=True)
 
                     if placed:
-                        sb = Session()
+                        # locks the item and re-checks the minimum server-side; the form value may be stale
                         try:
-                            res = sb.execute(text("""
-                                INSERT INTO bids (item_id, bidder_id, amount)
-                                VALUES (:iid, :bidder, :amt)
-                                RETURNING id
-                            """), {"iid": str(item_row["id"]), "bidder": user["id"], "amt": bid_amount})
-                            bid_id = res.scalar_one()
-                            sb.commit()
+                            ok, msg, _ = bids.place_bid(Session(), item_row["id"], user["id"], bid_amount)
+                        except Exception as e:
+                            ok, msg = False, f"Failed to place bid: {e}"
+                        if ok:
                             st.success("Bid placed successfully.")
                             st.session_state["just_bid"] = True
                             st.rerun()
-                        except Exception as e:
-                            sb.rollback()
-                            st.error(f"Failed to place bid: {e}")
-                        finally:
-                            sb.close()
+                        else:
+                            st.error(msg)
             else:
                 st.info("Bidding is unavailable for this item.")
 
@@ -725,10 +796,9 @@ def render_item_detail(item_id_str: str):
                     except Exception as e:
                         sb.rollback()
                         st.error(f"Error placing offer: {e}")
-                    finally:
-                        sb.close()
 
 
+@tracing.traced
 def render_my_listings():
     from uuid import UUID
     from sqlalchemy import text
@@ -768,57 +838,20 @@ def render_my_listings():
 
     where_sql = " AND ".join(where)
 
-    count_sql = text(f"""
-        SELECT COUNT(*)
-        FROM items i
-        WHERE {where_sql}
-    """)
-
-    list_sql = text(f"""
-        WITH base AS (
-            SELECT i.id, i.title, i.price, i.status, i.listing_type, i.created_at,
-                   COALESCE(c.name, 'Uncategorized') AS category
-            FROM items i
-            LEFT JOIN categories c ON c.id = i.category_id
-            WHERE {where_sql}
-            ORDER BY i.created_at DESC
-        ),
-        img AS (
-            SELECT ii.item_id,
-                   (SELECT image_path
-                    FROM item_images iix
-                    WHERE iix.item_id = ii.item_id
-                    ORDER BY iix.is_primary DESC, iix.sort_order ASC, iix.created_at ASC
-                    LIMIT 1) AS image_path
-            FROM item_images ii
-            GROUP BY ii.item_id
-        ),
-        hb AS (
-            SELECT item_id, MAX(amount) AS highest_bid
-            FROM bids
-            GROUP BY item_id
-        )
-        SELECT b.id, b.title, b.price, b.status, b.listing_type, b.category, b.created_at,
-               COALESCE(img.image_path, NULL) AS image_path,
-               COALESCE(hb.highest_bid, 0) AS highest_bid
-        FROM base b
-        LEFT JOIN img ON img.item_id = b.id
-        LEFT JOIN hb  ON hb.item_id  = b.id
-        LIMIT :limit OFFSET :offset
-    """)
+    count_sql = text(queries.my_listings_count_sql(where_sql))
+    list_sql = text(queries.my_listings_page_sql(where_sql))
 
     # run queries
+    live.start()
+    mark = live.mark()  # before the queries, so the cards catch anything that lands meanwhile
     s = Session()
-    try:
-        total = s.execute(count_sql, params).scalar_one()
-        import math
-        total_pages = max(1, math.ceil(total / page_size))
-        page = min(st.session_state[key_page], total_pages)
-        offset = (page - 1) * page_size
+    total = s.execute(count_sql, params).scalar_one()
+    import math
+    total_pages = max(1, math.ceil(total / page_size))
+    page = min(st.session_state[key_page], total_pages)
+    offset = (page - 1) * page_size
 
-        rows = s.execute(list_sql, {**params, "limit": page_size, "offset": offset}).mappings().all()
-    finally:
-        s.close()
+    rows = s.execute(list_sql, {**params, "limit": page_size, "offset": offset}).mappings().all()
 
     # pagination controls
     col_prev, col_stat, col_next = st.columns([0.3, 3, 0.3])
@@ -839,162 +872,198 @@ def render_my_listings():
         st.info("You have no listings yet.")
         return
 
-    # render cards
-    upload_root = os.getenv("UPLOAD_DIR", "uploads")
-    for r in rows:
-        with st.container(border=True):
-            c1, c2 = st.columns([1, 3])
-            with c1:
-                if r["image_path"]:
-                    abs_path = os.path.join(upload_root, r["image_path"]).replace("\\", "/")
-                    st.image(abs_path, use_container_width=True)
-                else:
-                    st.caption("No image")
+    # bids for every open "View bids" panel on this page, top 20 per listing, in one round trip;
+    # collapsed panels cost nothing
+    open_ids = [str(r["id"]) for r in rows if st.session_state.get(f"bids_open_{r['id']}")]
+    bids_by_item = {}
+    if open_ids:
+        bid_rows = s.execute(text(queries.LISTING_BIDS_SQL), {"ids": open_ids}).mappings().all()
+        for br in bid_rows:
+            bids_by_item.setdefault(str(br["item_id"]), []).append(br)
+
+    st.session_state.my_listings_live = {
+        "mark": mark,
+        "rows": {str(r["id"]): r for r in rows},
+        "bids": {i: bids_by_item.get(i, []) for i in open_ids},
+    }
+    _my_listing_cards([str(r["id"]) for r in rows])
+
+
+@st.fragment(run_every=live.RUN_EVERY)
+def _my_listing_cards(item_ids):
+    """
+    The My Listings cards. Between full reruns this ticks against app.live
+    and re-queries only the listings that got a bid or changed status (and
+    bid panels opened since); otherwise it redraws from session state.
+    """
+    from sqlalchemy import text
 
-            with c2:
-                st.markdown(f"**{r['title']}**  —  ${float(r['price']):.2f}")
-                st.caption(f"{r['category']} • {r['listing_type']} • status: {r['status']}")
+    with _fragment_rerun():
+        state = st.session_state.my_listings_live
+        now = live.mark()
+        stale = live.changed_since(item_ids, state["mark"])
+        want_bids = [i for i in item_ids
+                     if st.session_state.get(f"bids_open_{i}") and (i in stale or i not in state["bids"])]
+        if stale or want_bids:
+            s = Session()
+            if stale:
+                refreshed = s.execute(text(queries.MY_LISTINGS_BY_ID_SQL), {
+                    "sid": st.session_state.user["id"], "ids": list(stale), "limit": len(stale), "offset": 0,
+                }).mappings().all()
+                state["rows"].update({str(r["id"]): r for r in refreshed})
+                for i in stale:
+                    state["bids"].pop(i, None)
+            if want_bids:
+                state["bids"].update({i: [] for i in want_bids})
+                for br in s.execute(text(queries.LISTING_BIDS_SQL), {"ids": want_bids}).mappings():
+                    state["bids"][str(br["item_id"])].append(br)
+        state["mark"] = now
+
+        for i in item_ids:
+            _my_listing_card(state["rows"][i], state["bids"].get(i))
+
+
+def _my_listing_card(r, bid_rows):
+    from sqlalchemy import text
+
+    with st.container(border=True):
+        c1, c2 = st.columns([1, 3])
+        with c1:
+            if r["image_path"]:
+                show_image(r["image_path"], r["variants"], "thumb")
+            else:
+                st.caption("No image")
+
+        with c2:
+            st.markdown(f"**{r['title']}**  —  ${float(r['price']):.2f}")
+            st.caption(f"{r['category']} • {r['listing_type']} • status: {r['status']}")
 
-                # bids preview
-                with st.expander("View bids", expanded=False):
+            # bids preview (fetched by _my_listing_cards only while the toggle is on)
+            if st.toggle("View bids", key=f"bids_open_{r['id']}"):
+                if not bid_rows:
+                    st.write("No bids yet.")
+                else:
+                    for br in bid_rows:
+                        st.write(f"- ${float(br['amount']):.2f} by {br['bidder']} at {br['placed_at']}")
+
+                        if r["listing_type"] == "fixed" and r["status"] == "active":
+                            if st.button("Accept this offer", key=f"accept_{br['bid_id']}"):
+                                sb2 = Session()
+                                try:
+                                    # Mark this bid as accepted, others as not accepted
+                                    sb2.execute(text("""
+                                        UPDATE bids
+                                        SET status = CASE
+                                            WHEN bidder_id = (SELECT id FROM users WHERE email = :email) THEN 'accepted'
+                                            ELSE 'not_accepted'
+                                        END
+                                        WHERE item_id = :iid
+                                    """), {"iid": str(r["id"]), "email": br["bidder"]})
+
+                                    # Update item status
+                                    sb2.execute(text("""
+                                        UPDATE items
+                                        SET status = 'sold',
+                                            chosen_bid_id = (
+                                                SELECT id FROM bids
+                                                WHERE item_id = :iid
+                                                AND bidder_id = (SELECT id FROM users WHERE email = :email)
+                                                LIMIT 1
+                                            )
+                                        WHERE id = :iid
+                                    """), {"iid": str(r["id"]), "email": br["bidder"]})
+
+                                    sb2.commit()
+                                    _after_listing_closed(r["price"])
+                                    st.success("Offer accepted. Item marked as sold.")
+                                    st.rerun()
+                                except Exception as e:
+                                    sb2.rollback()
+                                    st.error(f"Failed to accept offer: {e}")
+
+                        elif r["listing_type"] == "auction":
+
+                            bidding_open = (r["status"] == "active")
+
+                            if bidding_open:
+                                col1, col2 = st.columns(2)
+
+                                # ACCEPT BID
+                                with col1:
+                                    if st.button("Accept", key=f"accept_auction_{br['bid_id']}"):
+                                        sb2 = Session()
+                                        try:
+                                            # 1. Accept this bid
+                                            sb2.execute(text("""
+                                                UPDATE bids
+                                                SET status = 'accepted'
+                                                WHERE id = :bid_id
+                                            """), {"bid_id": str(br["bid_id"])})
+
+                                            # 2. Decline all others
+                                            sb2.execute(text("""
+                                                UPDATE bids
+                                                SET status = 'declined'
+                                                WHERE item_id = :iid AND id != :bid_id
+                                            """), {"iid": str(r["id"]), "bid_id": str(br["bid_id"])})
+
+                                            # 3. Update item
+                                            sb2.execute(text("""
+                                                UPDATE items
+                                                SET status = 'sold',
+                                                    chosen_bid_id = :bid_id
+                                                WHERE id = :iid
+                                            """), {"iid": str(r["id"]), "bid_id": str(br["bid_id"])})
+
+                                            sb2.commit()
+                                            _after_listing_closed(r["price"])
+                                            st.success("Bid accepted. Item marked as sold.")
+                                            st.rerun()
+                                        except Exception as e:
+                                            sb2.rollback()
+                                            st.error(f"Failed to accept bid: {e}")
+
+                                # DECLINE BID
+                                with col2:
+                                    if st.button("Decline", key=f"decline_auction_{br['bid_id']}"):
+                                        sb2 = Session()
+                                        try:
+                                            sb2.execute(text("""
+                                                UPDATE bids
+                                                SET status = 'declined'
+                                                WHERE id = :bid_id
+                                            """), {"bid_id": str(br["bid_id"])})
+
+                                            sb2.commit()
+                                            st.info("Bid declined.")
+                                            st.rerun()
+                                        except Exception as e:
+                                            sb2.rollback()
+                                            st.error(f"Failed to decline bid: {e}")
+
+                            else:
+                                st.caption("Bidding is closed for this item.")
+            # actions
+            colA, colB, colC = st.columns([1,1,3])
+            with colA:
+                disable_close = (r["status"] != "active")
+                if st.button("Close listing", key=f"close_{r['id']}", disabled=disable_close, use_container_width=True):
                     sb = Session()
                     try:
-                        bid_rows = sb.execute(text("""
-                            SELECT  b.id AS bid_id, b.amount, b.placed_at, u.email AS bidder, b.status
-                            FROM bids b
-                            JOIN users u ON u.id = b.bidder_id
-                            WHERE b.item_id = :iid AND b.status != 'declined'
-                            ORDER BY b.amount DESC, b.placed_at DESC
-                        """), {"iid": str(r["id"])}).mappings().all()
-                    finally:
-                        sb.close()
-
-                    if not bid_rows:
-                        st.write("No bids yet.")
-                    else:
-                        for br in bid_rows[:20]:
-                            st.write(f"- ${float(br['amount']):.2f} by {br['bidder']} at {br['placed_at']}")
-
-                            if r["listing_type"] == "fixed" and r["status"] == "active":
-                                if st.button("Accept this offer", key=f"accept_{br['bid_id']}"):
-                                    sb2 = Session()
-                                    try:
-                                        # Mark this bid as accepted, others as not accepted
-                                        sb2.execute(text("""
-                                            UPDATE bids
-                                            SET status = CASE
-                                                WHEN bidder_id = (SELECT id FROM users WHERE email = :email) THEN 'accepted'
-                                                ELSE 'not_accepted'
-                                            END
-                                            WHERE item_id = :iid
-                                        """), {"iid": str(r["id"]), "email": br["bidder"]})
-
-                                        # Update item status
-                                        sb2.execute(text("""
-                                            UPDATE items
-                                            SET status = 'sold',
-                                                chosen_bid_id = (
-                                                    SELECT id FROM bids
-                                                    WHERE item_id = :iid
-                                                    AND bidder_id = (SELECT id FROM users WHERE email = :email)
-                                                    LIMIT 1
-                                                )
-                                            WHERE id = :iid
-                                        """), {"iid": str(r["id"]), "email": br["bidder"]})
-
-                                        sb2.commit()
-                                        st.success("Offer accepted. Item marked as sold.")
-                                        st.rerun()
-                                    except Exception as e:
-                                        sb2.rollback()
-                                        st.error(f"Failed to accept offer: {e}")
-
-                            elif r["listing_type"] == "auction":
-
-                                bidding_open = (r["status"] == "active")
-
-                                if bidding_open:
-                                    col1, col2 = st.columns(2)
-
-                                    # ACCEPT BID
-                                    with col1:
-                                        if st.button("Accept", key=f"accept_auction_{br['bid_id']}"):
-                                            sb2 = Session()
-                                            try:
-                                                # 1. Accept this bid
-                                                sb2.execute(text("""
-                                                    UPDATE bids
-                                                    SET status = 'accepted'
-                                                    WHERE id = :bid_id
-                                                """), {"bid_id": str(br["bid_id"])})
-
-                                                # 2. Decline all others
-                                                sb2.execute(text("""
-                                                    UPDATE bids
-                                                    SET status = 'declined'
-                                                    WHERE item_id = :iid AND id != :bid_id
-                                                """), {"iid": str(r["id"]), "bid_id": str(br["bid_id"])})
-
-                                                # 3. Update item
-                                                sb2.execute(text("""
-                                                    UPDATE items
-                                                    SET status = 'sold',
-                                                        chosen_bid_id = :bid_id
-                                                    WHERE id = :iid
-                                                """), {"iid": str(r["id"]), "bid_id": str(br["bid_id"])})
-
-                                                sb2.commit()
-                                                st.success("Bid accepted. Item marked as sold.")
-                                                st.rerun()
-                                            except Exception as e:
-                                                sb2.rollback()
-                                                st.error(f"Failed to accept bid: {e}")
-                                            finally:
-                                                sb2.close()
-
-                                    # DECLINE BID
-                                    with col2:
-                                        if st.button("Decline", key=f"decline_auction_{br['bid_id']}"):
-                                            sb2 = Session()
-                                            try:
-                                                sb2.execute(text("""
-                                                    UPDATE bids
-                                                    SET status = 'declined'
-                                                    WHERE id = :bid_id
-                                                """), {"bid_id": str(br["bid_id"])})
-
-                                                sb2.commit()
-                                                st.info("Bid declined.")
-                                                st.rerun()
-                                            except Exception as e:
-                                                sb2.rollback()
-                                                st.error(f"Failed to decline bid: {e}")
-                                            finally:
-                                                sb2.close()
-
-                                else:
-                                    st.caption("Bidding is closed for this item.")
-                # actions
-                colA, colB, colC = st.columns([1,1,3])
-                with colA:
-                    disable_close = (r["status"] != "active")
-                    if st.button("Close listing", key=f"close_{r['id']}", disabled=disable_close, use_container_width=True):
-                        sb = Session()
-                        try:
-                            sb.execute(text("UPDATE items SET status = 'closed' WHERE id = :iid"), {"iid": str(r["id"])})
-                            sb.commit()
-                            st.success("Listing closed.")
-                            st.rerun()
-                        except Exception as e:
-                            sb.rollback()
-                            st.error(f"Failed to close: {e}")
-                        finally:
-                            sb.close()
+                        sb.execute(text("UPDATE items SET status = 'closed' WHERE id = :iid"), {"iid": str(r["id"])})
+                        sb.commit()
+                        _after_listing_closed(r["price"])
+                        st.success("Listing closed.")
+                        st.rerun()
+                    except Exception as e:
+                        sb.rollback()
+                        st.error(f"Failed to close: {e}")
 
 
 # ============================================================
 # 🆕 FEATURE: View items the user has purchased
 # ============================================================
+@tracing.traced
 def render_my_purchases():
     from sqlalchemy import text
     st.subheader("🛍️ My Purchases")
@@ -1005,37 +1074,18 @@ def render_my_purchases():
         return
 
     s = Session()
-    try:
-        purchases = s.execute(text("""
-            SELECT i.id, i.title, i.price, i.status,
-                   u.email AS seller_email,
-                   COALESCE(c.name, 'Uncategorized') AS category,
-                   (SELECT image_path FROM item_images ii
-                    WHERE ii.item_id = i.id
-                    ORDER BY is_primary DESC, sort_order ASC
-                    LIMIT 1) AS image_path
-            FROM items i
-            JOIN bids b ON b.id = i.chosen_bid_id
-            JOIN users u ON u.id = i.seller_id
-            LEFT JOIN categories c ON c.id = i.category_id
-            WHERE b.bidder_id = :uid
-            ORDER BY i.created_at DESC
-        """), {"uid": user["id"]}).mappings().all()
-    finally:
-        s.close()
+    purchases = s.execute(text(queries.MY_PURCHASES_SQL), {"uid": user["id"]}).mappings().all()
 
     if not purchases:
         st.info("You haven’t purchased any items yet.")
         return
 
-    upload_root = os.getenv("UPLOAD_DIR", "uploads")
     for p in purchases:
         with st.container(border=True):
             c1, c2 = st.columns([1, 3])
             with c1:
                 if p["image_path"]:
-                    abs_path = os.path.join(upload_root, p["image_path"]).replace("\\", "/")
-                    st.image(abs_path, use_container_width=True)
+                    show_image(p["image_path"], p["variants"], "thumb")
                 else:
                     st.caption("No image")
             with c2:
@@ -1047,6 +1097,7 @@ def render_my_purchases():
 # ============================================================
 # 🆕 FEATURE: View items the user has bid on
 # ============================================================
+@tracing.traced
 def render_my_bids():
     from sqlalchemy import text
     st.subheader("💸 My Bids")
@@ -1056,76 +1107,142 @@ def render_my_bids():
         st.warning("Log in to view your bids.")
         return
 
+    live.start()
+    mark = live.mark()
     s = Session()
-    try:
-        bid_rows = s.execute(text("""
-            WITH my_bids AS (
-                SELECT DISTINCT ON (b.item_id)
-                    b.item_id, b.amount, b.placed_at,
-                    b.status AS bid_status,
-                    i.status, i.chosen_bid_id, i.title, i.price AS base_price,
-                    (SELECT image_path FROM item_images ii
-                     WHERE ii.item_id = i.id
-                     ORDER BY is_primary DESC, sort_order ASC
-                     LIMIT 1) AS image_path
-                FROM bids b
-                JOIN items i ON i.id = b.item_id
-                WHERE b.bidder_id = :uid
-                ORDER BY b.item_id, b.amount DESC, b.placed_at DESC
-            )
-            SELECT * FROM my_bids
-            ORDER BY placed_at DESC
-        """), {"uid": user["id"]}).mappings().all()
-    finally:
-        s.close()
+    bid_rows = s.execute(text(queries.MY_BIDS_SQL), {"uid": user["id"]}).mappings().all()
 
     if not bid_rows:
         st.info("You haven’t placed any bids yet.")
         return
 
-    upload_root = os.getenv("UPLOAD_DIR", "uploads")
-    for b in bid_rows:
-        # compute bid status dynamically (correct logic)
-        item_status = b["status"]       # item-level status
-        my_bid_status = b["bid_status"] # this specific user's bid status
+    st.session_state.my_bids_live = {"mark": mark, "rows": {str(b["item_id"]): b for b in bid_rows}}
+    _my_bid_cards([str(b["item_id"]) for b in bid_rows])
 
-        if item_status == "sold":
-            if my_bid_status == "accepted":
-                status_text = "✅ Seller accepted your offer"
-            else:
-                status_text = "❌ Seller accepted another buyer"
 
-        elif item_status == "closed":
-            status_text = "⚠️ Auction closed — no winning bid"
+@st.fragment(run_every=live.RUN_EVERY)
+def _my_bid_cards(item_ids):
+    """The My Bids cards; re-queries only items that were outbid, accepted, declined or closed (app.live), otherwise redraws from session state."""
+    from sqlalchemy import text
+
+    with _fragment_rerun():
+        state = st.session_state.my_bids_live
+        now = live.mark()
+        stale = live.changed_since(item_ids, state["mark"])
+        if stale:
+            refreshed = Session().execute(text(queries.MY_BIDS_BY_ITEM_SQL), {
+                "uid": st.session_state.user["id"], "ids": list(stale),
+            }).mappings().all()
+            state["rows"].update({str(b["item_id"]): b for b in refreshed})
+        state["mark"] = now
+
+        for i in item_ids:
+            _my_bid_card(state["rows"][i])
+
+
+def _my_bid_card(b):
+    # compute bid status dynamically (correct logic)
+    item_status = b["status"]       # item-level status
+    my_bid_status = b["bid_status"] # this specific user's bid status
+
+    if item_status == "sold":
+        if my_bid_status == "accepted":
+            status_text = "✅ Seller accepted your offer"
+        else:
+            status_text = "❌ Seller accepted another buyer"
+
+    elif item_status == "closed":
+        status_text = "⚠️ Auction closed — no winning bid"
+
+    elif item_status == "active":
+        if my_bid_status == "accepted":
+            status_text = "✅ Seller accepted your offer"
+        elif my_bid_status == "declined":
+            status_text = "❌ Seller did not accept your offer"
+        elif b["listing_type"] == "auction" and b["highest_bid"] is not None and b["highest_bid"] > b["amount"]:
+            status_text = f"⬆️ Outbid — highest bid is now ${float(b['highest_bid']):.2f}"
+        else:
+            status_text = "⏳ Awaiting seller response"
+
+    else:
+        status_text = "⏳ Waiting for seller"
 
-        elif item_status == "active":
-            if my_bid_status == "accepted":
-                status_text = "✅ Seller accepted your offer"
-            elif my_bid_status == "declined":
-                status_text = "❌ Seller did not accept your offer"
+    with st.container(border=True):
+        c1, c2 = st.columns([1, 3])
+        with c1:
+            if b["image_path"]:
+                show_image(b["image_path"], b["variants"], "thumb")
             else:
-                status_text = "⏳ Awaiting seller response"
+                st.caption("No image")
+        with c2:
+            st.markdown(f"**{b['title']}** — Your bid: ${float(b['amount']):.2f}")
+            st.caption(status_text)
 
-        else:
-            status_text = "⏳ Waiting for seller"
+@tracing.traced
+def render_alerts():
+    from sqlalchemy import text
+
+    st.subheader("Alerts")
+    user = st.session_state.user
+    s = Session()
 
+    viewing_id = st.session_state.get("alert_item_id")
+    if viewing_id:
+        if st.button("← Back to alerts"):
+            st.session_state.pop("alert_item_id", None)
+            st.rerun()
+        render_item_detail(viewing_id)
+        return
+
+    st.markdown("#### Saved searches")
+    searches = s.execute(text(alerts.SEARCHES_SQL), {"uid": user["id"]}).mappings().all()
+    if not searches:
+        st.info("No saved searches yet. Set filters or search on Home, then press “Save this search”.")
+    for r in searches:
+        c1, c2 = st.columns([5, 1])
+        with c1:
+            st.write(f"{alerts.describe(r)} — {r['matches']} match(es)")
+        with c2:
+            if st.button("Delete", key=f"del_search_{r['id']}"):
+                alerts.delete_search(s, user["id"], r["id"])
+                st.rerun()
+
+    st.markdown("#### Matching listings")
+    rows = s.execute(text(alerts.INBOX_SQL), {"uid": user["id"], "limit": 50}).mappings().all()
+    if not rows:
+        st.caption("Nothing yet. Listings posted from now on that match a saved search show up here.")
+        return
+    for r in rows:
         with st.container(border=True):
-            c1, c2 = st.columns([1, 3])
+            c1, c2 = st.columns([5, 1])
             with c1:
-                if b["image_path"]:
-                    abs_path = os.path.join(upload_root, b["image_path"]).replace("\\", "/")
-                    st.image(abs_path, use_container_width=True)
-                else:
-                    st.caption("No image")
+                new = "🆕 " if r["seen_at"] is None else ""
+                gone = "" if r["status"] == "active" else f" ({r['status']})"
+                st.markdown(f"{new}**{r['title']}** — ${r['price']:.2f}{gone}")
+                st.caption(f"{r['pickup_campus'] or 'No campus'} • matched {r['matched_at']:%b %d, %H:%M}")
             with c2:
-                st.markdown(f"**{b['title']}** — Your bid: ${float(b['amount']):.2f}")
-                st.caption(status_text)
+                if st.button("View", key=f"alert_view_{r['id']}"):
+                    st.session_state.alert_item_id = str(r["id"])
+                    st.rerun()
+    new_ids = [r["id"] for r in rows if r["seen_at"] is None]
+    if new_ids:
+        alerts.mark_seen(s, user["id"], new_ids)  # shown once as new; ones past the first page stay new
+        st.session_state.pop("alerts_unread", None)
 
 # --- Gate the app ---
-if st.session_state.user is None:
-    # Signed-out view: ONLY show Login/Register (no sidebar nav)
-    add_fullscreen_bg("app/Rutgersbg.jpg")
-    render_logged_out()
-else:
-    # Signed-in view: full app with sidebar
-    render_logged_in()
+querystats.begin_rerun()
+tracing.start_rerun("rerun", logged_in=st.session_state.get("user") is not None)
+try:
+    if st.session_state.user is None:
+        # Signed-out view: ONLY show Login/Register (no sidebar nav)
+        add_fullscreen_bg("app/Rutgersbg.jpg")
+        render_logged_out()
+    else:
+        # Signed-in view: full app with sidebar
+        render_logged_in()
+finally:
+    # end of the rerun's unit of work: roll back anything uncommitted, return the connection
+    Session.remove()
+    # page is out; now EXPLAIN whatever was slow (on its own connection)
+    querystats.flush_slow_log()
+    tracing.end_rerun()
@@ -1,46 +1,196 @@
+import hashlib
+import io
 import os
-import uuid
-from typing import Tuple
+import tempfile
+from typing import List, Optional, Tuple, Union
+
+from PIL import Image, ImageOps
 
 ALLOWED_EXTS = {".jpg", ".jpeg", ".png", ".webp"}
 MAX_BYTES = 5 * 1024 * 1024  # 5 MB
 
+# Pre-generated renditions, smallest first: name -> (longest edge px, WebP quality).
+# "original" is always the untouched upload.
+IMAGE_VARIANTS = {
+    "thumb": (480, 75),    # browse cards / dashboard rows
+    "detail": (1280, 82),  # item detail view
+}
+VARIANT_ORDER = ("thumb", "detail", "original")
+
+# Streamlit's static route (server.enableStaticServing) serves <dir of ui.py>/static/
+# at app/static/, so uploads live in app/static/media by default. Tornado won't
+# follow a symlink out of that directory: an UPLOAD_DIR elsewhere isn't served.
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+STATIC_URL = "app/static"
+DEFAULT_UPLOAD_DIR = os.path.join(STATIC_DIR, "media")
+# The old default (UPLOAD_DIR=uploads, next to app/). Read from until it has been
+# moved under DEFAULT_UPLOAD_DIR with `python -m app.backfill_variants --migrate`.
+LEGACY_UPLOAD_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "uploads")
+# File names are content hashes; this covers variants re-encoded with new settings.
+VARIANTS_VERSION = hashlib.sha256(repr(sorted(IMAGE_VARIANTS.items())).encode()).hexdigest()[:10]
+
 def ensure_dir(path: str) -> None:
     os.makedirs(path, exist_ok=True)
 
-def save_uploaded_image(uploaded_file, upload_root: str, user_id: str) -> Tuple[bool, str]:
+def content_rel_path(digest: str, ext: str) -> str:
+    """
+    Content-addressed location for an upload: '<h0h1>/<h2h3>/<sha256><ext>'.
+    Two levels of 256-way sharding keep every directory small.
+    """
+    return f"{digest[:2]}/{digest[2:4]}/{digest}{ext}"
+
+def variant_rel_path(rel_path: str, variant: str) -> str:
+    """
+    Relative path of a variant next to its original:
+    'ab/cd/<sha256>.jpg' -> 'ab/cd/<sha256>_thumb.webp'.
+    """
+    if variant == "original":
+        return rel_path
+    stem, _ = os.path.splitext(rel_path)
+    return f"{stem}_{variant}.webp"
+
+def pick_image_variant(rel_path: str, variants, want: str = "thumb") -> str:
     """
-    Save a Streamlit UploadedFile to disk under uploads/<user_id>/<uuid>.<ext>.
-    Returns (ok, relative_path_or_error).
+    Return the relative path of the smallest recorded variant that is at
+    least as large as `want`, falling back to the original upload.
+    """
+    available = set(variants or [])
+    for name in VARIANT_ORDER[VARIANT_ORDER.index(want):]:
+        if name == "original" or name in available:
+            return variant_rel_path(rel_path, name)
+    return rel_path
+
+def get_upload_root() -> str:
+    """
+    UPLOAD_DIR, defaulting to app/static/media; the legacy uploads/ while it
+    exists and app/static/media doesn't (served from disk, not statically).
+    """
+    configured = os.getenv("UPLOAD_DIR")
+    if configured:
+        return configured
+    if not os.path.isdir(DEFAULT_UPLOAD_DIR) and os.path.isdir(LEGACY_UPLOAD_DIR):
+        return LEGACY_UPLOAD_DIR
+    return DEFAULT_UPLOAD_DIR
+
+def static_media_url(root: str) -> Optional[str]:
+    """URL prefix the static route serves `root` under, or None if it is outside STATIC_DIR."""
+    rel = os.path.relpath(os.path.realpath(root), os.path.realpath(STATIC_DIR))
+    if rel == "." or rel.startswith(".."):
+        return None
+    return f"{STATIC_URL}/{rel.replace(os.sep, '/')}"
+
+def static_image_url(prefix: str, rel_path: str, variants, want: str = "thumb") -> str:
+    """
+    Browser URL for the chosen variant under a static_media_url() prefix, e.g.
+    'app/static/media/ab/cd/<sha256>_thumb.webp?v=<VARIANTS_VERSION>'.
+    The ?v= makes the static handler send a long-lived Cache-Control; it also
+    sends ETag / Last-Modified and a Content-Type from the file extension.
+    """
+    path = pick_image_variant(rel_path, variants, want).replace("\\", "/")
+    return f"{prefix}/{path}?v={VARIANTS_VERSION}"
+
+def _write_atomic(abs_path: str, write) -> None:
+    """Write via a temp file + rename so concurrent writers of the same content never see a partial file."""
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(abs_path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+        os.replace(tmp, abs_path)
+    except Exception:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+def _write_variants(img: Image.Image, upload_root: str, rel_path: str, skip_existing: bool = False) -> List[str]:
+    """Resize + recompress `img` into every IMAGE_VARIANTS entry; returns names written."""
+    img = ImageOps.exif_transpose(img)
+    if img.mode not in ("RGB", "RGBA"):
+        img = img.convert("RGBA" if "A" in img.getbands() or "transparency" in img.info else "RGB")
+
+    written = []
+    for name, (edge, quality) in IMAGE_VARIANTS.items():
+        abs_path = os.path.join(upload_root, variant_rel_path(rel_path, name))
+        if not (skip_existing and os.path.exists(abs_path)):
+            out = img.copy()
+            out.thumbnail((edge, edge), Image.LANCZOS)  # never upscales
+            _write_atomic(abs_path, lambda f: out.save(f, format="WEBP", quality=quality, method=4))
+        written.append(name)
+    return written
+
+def generate_image_variants(upload_root: str, rel_path: str) -> Tuple[bool, Union[List[str], str]]:
+    """
+    (Re)build the variants for an upload already on disk.
+    Returns (ok, variant_names_or_error).
+    """
+    abs_path = os.path.join(upload_root, rel_path)
+    try:
+        with Image.open(abs_path) as img:
+            img.load()
+            return True, _write_variants(img, upload_root, rel_path)
+    except FileNotFoundError:
+        return False, f"Missing file: {rel_path}"
+    except Exception as e:
+        return False, f"Failed to build variants for {rel_path}: {e}"
+
+def save_uploaded_image(uploaded_file, upload_root: str) -> Tuple[bool, str, List[str]]:
+    """
+    Save a Streamlit UploadedFile to disk under uploads/<content path> (see
+    content_rel_path) and pre-generate its resized WebP variants next to it.
+    Identical uploads share one file; image_blobs counts the references.
+    Returns (ok, relative_path_or_error, variant_names).
     """
     if uploaded_file is None:
-        return False, "No file provided."
+        return False, "No file provided.", []
 
     filename = uploaded_file.name or ""
     _, ext = os.path.splitext(filename.lower())
+    if ext == ".jpeg":
+        ext = ".jpg"  # one name per content
     if ext not in ALLOWED_EXTS:
-        return False, f"Unsupported file type: {ext or 'unknown'}. Allowed: {', '.join(sorted(ALLOWED_EXTS))}"
+        return False, f"Unsupported file type: {ext or 'unknown'}. Allowed: {', '.join(sorted(ALLOWED_EXTS))}", []
 
     # read bytes once
     data = uploaded_file.read()
     if not data:
-        return False, "Empty file."
+        return False, "Empty file.", []
     if len(data) > MAX_BYTES:
-        return False, f"File too large ({len(data)} bytes). Max allowed is {MAX_BYTES} bytes."
+        return False, f"File too large ({len(data)} bytes). Max allowed is {MAX_BYTES} bytes.", []
+
+    # decode up front so we never store something we can't render
+    try:
+        img = Image.open(io.BytesIO(data))
+        img.load()
+    except Exception:
+        return False, "File is not a readable image.", []
 
-    # build target path
-    user_dir = os.path.join(upload_root, str(user_id))
-    ensure_dir(user_dir)
-    unique_name = f"{uuid.uuid4().hex}{ext}"
-    abs_path = os.path.join(user_dir, unique_name)
+    # build target path; relative path stored in DB always uses forward slashes
+    rel_path = content_rel_path(hashlib.sha256(data).hexdigest(), ext)
+    abs_path = os.path.join(upload_root, rel_path)
+    ensure_dir(os.path.dirname(abs_path))
 
-    # write
+    # write original + variants, reusing whatever is already on disk
     try:
-        with open(abs_path, "wb") as f:
-            f.write(data)
+        if os.path.exists(abs_path):
+            os.utime(abs_path)  # fresh mtime tells the GC sweep this file is back in use
+        else:
+            _write_atomic(abs_path, lambda f: f.write(data))
+        variants = _write_variants(img, upload_root, rel_path, skip_existing=True)
     except Exception as e:
-        return False, f"Failed to save file: {e}"
+        return False, f"Failed to save file: {e}", []
+
+    return True, rel_path, variants
 
-    # return relative path stored in DB (normalized with forward slashes)
-    rel_path = os.path.relpath(abs_path, start=upload_root).replace("\\", "/")
-    return True, rel_path
+def restore_saved_image(uploaded_file, upload_root: str, rel_path: str, variants) -> bool:
+    """
+    Call once the item_images row for a save_uploaded_image() result has
+    committed. A dedupe hit reuses a file that an image_gc sweep may delete
+    before that row lands; once it is in, the blob is referenced and no sweep
+    touches it, so anything missing now is rewritten from `uploaded_file`.
+    Returns whether files had to be rewritten.
+    """
+    if all(os.path.exists(os.path.join(upload_root, variant_rel_path(rel_path, name)))
+           for name in ("original", *variants)):
+        return False
+    uploaded_file.seek(0)
+    ok, _, _ = save_uploaded_image(uploaded_file, upload_root)
+    return ok
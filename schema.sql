@@ -35,6 +35,9 @@ CREATE TABLE IF NOT EXISTS items (
   pickup_lng DOUBLE PRECISION,
   auction_end_at TIMESTAMPTZ,
   chosen_bid_id UUID, -- FK added after bids table exists
+  highest_bid NUMERIC(10,2),                -- maintained from bids by trigger
+  bid_count INT NOT NULL DEFAULT 0,         -- maintained from bids by trigger
+  last_bid_at TIMESTAMPTZ,                  -- maintained from bids by trigger
   created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
   updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
   deleted_at TIMESTAMPTZ
@@ -55,11 +58,63 @@ CREATE TABLE IF NOT EXISTS item_images (
   image_path TEXT NOT NULL,         -- e.g., 'uploads/uuid.jpg' or S3 URL later
   is_primary BOOLEAN NOT NULL DEFAULT FALSE,
   sort_order INT NOT NULL DEFAULT 0,
+  variants TEXT[] NOT NULL DEFAULT '{}', -- pre-generated renditions next to image_path ('thumb', 'detail')
   created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
 );
 
+-- existing databases: variants are backfilled by `python -m app.backfill_variants`
+ALTER TABLE item_images ADD COLUMN IF NOT EXISTS variants TEXT[] NOT NULL DEFAULT '{}';
+
 CREATE INDEX IF NOT EXISTS idx_item_images_item ON item_images(item_id);
 CREATE INDEX IF NOT EXISTS idx_item_images_primary ON item_images(item_id, is_primary);
+-- cover image lookup (primary first, then sort order) is a top-1 probe on this
+CREATE INDEX IF NOT EXISTS idx_item_images_cover
+  ON item_images (item_id, is_primary DESC, sort_order, created_at);
+
+-- ---- IMAGE BLOBS (content-addressed files under UPLOAD_DIR, ref-counted) ----
+-- One row per stored file; item_images rows referencing it are counted by trigger,
+-- so ON DELETE CASCADE from items/users releases files too. `python -m app.image_gc`
+-- deletes files whose count has been 0 for longer than its grace period.
+CREATE TABLE IF NOT EXISTS image_blobs (
+  image_path TEXT PRIMARY KEY,      -- same value as item_images.image_path
+  ref_count INT NOT NULL DEFAULT 0 CHECK (ref_count >= 0),
+  released_at TIMESTAMPTZ,          -- when ref_count last dropped to 0
+  created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_image_blobs_unreferenced
+  ON image_blobs (released_at) WHERE ref_count = 0;
+
+CREATE OR REPLACE FUNCTION track_image_refs() RETURNS TRIGGER AS $$
+BEGIN
+  IF TG_OP IN ('UPDATE', 'DELETE') THEN
+    UPDATE image_blobs
+    SET ref_count = ref_count - 1,
+        released_at = CASE WHEN ref_count = 1 THEN NOW() ELSE released_at END
+    WHERE image_path = OLD.image_path;
+  END IF;
+  IF TG_OP IN ('INSERT', 'UPDATE') THEN
+    INSERT INTO image_blobs (image_path, ref_count) VALUES (NEW.image_path, 1)
+    ON CONFLICT (image_path)
+      DO UPDATE SET ref_count = image_blobs.ref_count + 1, released_at = NULL;
+  END IF;
+  RETURN NULL;
+END; $$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_item_images_refs ON item_images;
+CREATE TRIGGER trg_item_images_refs
+  AFTER INSERT OR DELETE ON item_images FOR EACH ROW EXECUTE FUNCTION track_image_refs();
+
+DROP TRIGGER IF EXISTS trg_item_images_refs_moved ON item_images;
+CREATE TRIGGER trg_item_images_refs_moved
+  AFTER UPDATE OF image_path ON item_images FOR EACH ROW
+  WHEN (OLD.image_path IS DISTINCT FROM NEW.image_path)
+  EXECUTE FUNCTION track_image_refs();
+
+-- existing databases: start counting the images that are already referenced
+INSERT INTO image_blobs (image_path, ref_count)
+SELECT image_path, COUNT(*) FROM item_images GROUP BY image_path
+ON CONFLICT (image_path) DO NOTHING;
 
 -- ---- BIDS ----
 CREATE TABLE IF NOT EXISTS bids (
@@ -81,48 +136,538 @@ ALTER TABLE items
   ADD CONSTRAINT fk_items_chosen_bid
     FOREIGN KEY (chosen_bid_id) REFERENCES bids(id) ON DELETE SET NULL;
 
--- ---- Safety trigger: prevent bids on non-active items ----
-CREATE OR REPLACE FUNCTION prevent_bids_on_inactive() RETURNS TRIGGER AS $$
-DECLARE s TEXT;
+-- ---- Safety trigger: bids only on active items, never by the seller ----
+-- One lookup of the item row for both checks (these used to be two triggers).
+-- place_bid() below already holds the row lock, so this is a cheap re-read there.
+DROP TRIGGER IF EXISTS trg_bids_only_on_active ON bids;
+DROP TRIGGER IF EXISTS trg_no_self_bids ON bids;
+DROP FUNCTION IF EXISTS prevent_bids_on_inactive();
+DROP FUNCTION IF EXISTS prevent_self_bidding();
+
+CREATE OR REPLACE FUNCTION check_bid_allowed() RETURNS TRIGGER AS $$
+DECLARE s TEXT; seller UUID;
 BEGIN
-  SELECT status INTO s FROM items WHERE id = NEW.item_id;
+  SELECT status, seller_id INTO s, seller FROM items WHERE id = NEW.item_id;
   IF s IS DISTINCT FROM 'active' THEN
     RAISE EXCEPTION 'Cannot bid on item with status %', s;
   END IF;
+  IF seller = NEW.bidder_id THEN
+    RAISE EXCEPTION 'Seller cannot bid on own item';
+  END IF;
   RETURN NEW;
 END; $$ LANGUAGE plpgsql;
 
-DROP TRIGGER IF EXISTS trg_bids_only_on_active ON bids;
-CREATE TRIGGER trg_bids_only_on_active
-  BEFORE INSERT ON bids FOR EACH ROW EXECUTE FUNCTION prevent_bids_on_inactive();
+DROP TRIGGER IF EXISTS trg_bids_check_allowed ON bids;
+CREATE TRIGGER trg_bids_check_allowed
+  BEFORE INSERT ON bids FOR EACH ROW EXECUTE FUNCTION check_bid_allowed();
 
--- ---- Safety trigger: seller cannot bid on own item ----
-CREATE OR REPLACE FUNCTION prevent_self_bidding() RETURNS TRIGGER AS $$
-DECLARE seller UUID;
+-- ---- Denormalized bid stats on items (highest_bid / bid_count / last_bid_at) ----
+-- Screens read these in O(1) instead of aggregating bids; `python -m app.check_bid_stats`
+-- verifies them against the bids table.
+ALTER TABLE items
+  ADD COLUMN IF NOT EXISTS highest_bid NUMERIC(10,2),
+  ADD COLUMN IF NOT EXISTS bid_count INT NOT NULL DEFAULT 0,
+  ADD COLUMN IF NOT EXISTS last_bid_at TIMESTAMPTZ;
+
+CREATE OR REPLACE FUNCTION maintain_item_bid_stats() RETURNS TRIGGER AS $$
 BEGIN
-  SELECT seller_id INTO seller FROM items WHERE id = NEW.item_id;
-  IF seller = NEW.bidder_id THEN
-    RAISE EXCEPTION 'Seller cannot bid on own item';
+  IF TG_OP = 'INSERT' THEN
+    -- same transaction as the bid insert; the row lock serializes concurrent bidders
+    UPDATE items
+    SET highest_bid = GREATEST(highest_bid, NEW.amount),
+        bid_count = bid_count + 1,
+        last_bid_at = GREATEST(last_bid_at, NEW.placed_at)
+    WHERE id = NEW.item_id;
+  ELSE
+    -- deletes and amount changes are rare: recompute the affected item(s)
+    UPDATE items i
+    SET (highest_bid, bid_count, last_bid_at) =
+        (SELECT MAX(b.amount), COUNT(*), MAX(b.placed_at) FROM bids b WHERE b.item_id = i.id)
+    WHERE i.id IN (OLD.item_id, CASE WHEN TG_OP = 'UPDATE' THEN NEW.item_id END);
   END IF;
-  RETURN NEW;
+  RETURN NULL;
 END; $$ LANGUAGE plpgsql;
 
-DROP TRIGGER IF EXISTS trg_no_self_bids ON bids;
-CREATE TRIGGER trg_no_self_bids
-  BEFORE INSERT ON bids FOR EACH ROW EXECUTE FUNCTION prevent_self_bidding();
+DROP TRIGGER IF EXISTS trg_bids_item_stats ON bids;
+CREATE TRIGGER trg_bids_item_stats
+  AFTER INSERT OR DELETE ON bids FOR EACH ROW EXECUTE FUNCTION maintain_item_bid_stats();
+
+DROP TRIGGER IF EXISTS trg_bids_item_stats_changed ON bids;
+CREATE TRIGGER trg_bids_item_stats_changed
+  AFTER UPDATE OF item_id, amount, placed_at ON bids FOR EACH ROW
+  WHEN (OLD.item_id IS DISTINCT FROM NEW.item_id OR OLD.amount IS DISTINCT FROM NEW.amount
+        OR OLD.placed_at IS DISTINCT FROM NEW.placed_at)
+  EXECUTE FUNCTION maintain_item_bid_stats();
+
+-- existing databases: fill the columns once (only rows that are off are touched)
+UPDATE items i
+SET highest_bid = s.highest_bid, bid_count = s.bid_count, last_bid_at = s.last_bid_at
+FROM (
+  SELECT item_id, MAX(amount) AS highest_bid, COUNT(*) AS bid_count, MAX(placed_at) AS last_bid_at
+  FROM bids GROUP BY item_id
+) s
+WHERE s.item_id = i.id
+  AND (i.highest_bid IS DISTINCT FROM s.highest_bid OR i.bid_count <> s.bid_count
+       OR i.last_bid_at IS DISTINCT FROM s.last_bid_at);
+
+-- ---- Auction bid placement (app/bids.py) ----
+-- Locks the item row, checks the bid against the current highest plus the
+-- minimum increment, inserts it and returns the resulting state, all in one
+-- round trip. Concurrent bidders on the same item queue on the row lock, so
+-- each one is validated against the bid that actually won before it.
+-- Rejections come back as ok = FALSE with a message rather than an error.
+CREATE OR REPLACE FUNCTION place_bid(p_item UUID, p_bidder UUID, p_amount NUMERIC, p_min_increment NUMERIC)
+RETURNS TABLE (ok BOOLEAN, message TEXT, bid_id UUID, highest_bid NUMERIC, bid_count INT) AS $$
+DECLARE it RECORD; min_bid NUMERIC;
+BEGIN
+  SELECT i.status, i.listing_type, i.seller_id, i.auction_end_at, i.highest_bid, i.bid_count
+  INTO it FROM items i WHERE i.id = p_item FOR UPDATE;
+
+  IF NOT FOUND THEN
+    RETURN QUERY SELECT FALSE, 'Item not found.', NULL::UUID, NULL::NUMERIC, NULL::INT; RETURN;
+  END IF;
+  IF it.status <> 'active' OR it.listing_type <> 'auction'
+     OR (it.auction_end_at IS NOT NULL AND it.auction_end_at <= NOW()) THEN
+    RETURN QUERY SELECT FALSE, 'Bidding is closed for this item.', NULL::UUID, it.highest_bid, it.bid_count; RETURN;
+  END IF;
+  IF it.seller_id = p_bidder THEN
+    RETURN QUERY SELECT FALSE, 'You cannot bid on your own item.', NULL::UUID, it.highest_bid, it.bid_count; RETURN;
+  END IF;
+
+  min_bid := COALESCE(it.highest_bid, 0) + p_min_increment;
+  IF p_amount < min_bid THEN
+    RETURN QUERY SELECT FALSE, format('Bid must be at least $%s.', to_char(min_bid, 'FM999999990.00')),
+                        NULL::UUID, it.highest_bid, it.bid_count;
+    RETURN;
+  END IF;
+
+  -- clock_timestamp: placed_at follows lock order, not transaction start
+  INSERT INTO bids (item_id, bidder_id, amount, placed_at)
+  VALUES (p_item, p_bidder, p_amount, clock_timestamp())
+  RETURNING id, amount INTO bid_id, highest_bid;
+  -- trg_bids_item_stats has updated the item row; we already know the result
+  RETURN QUERY SELECT TRUE, 'Bid placed.', bid_id, highest_bid, it.bid_count + 1;
+END; $$ LANGUAGE plpgsql;
 
 -- ---- Helpful indexes for common queries ----
-CREATE INDEX IF NOT EXISTS idx_items_active_recent
-  ON items (status, created_at DESC);
+-- Browse filters are indexed on item_cards (below); these serve the queries
+-- that still read items. `python -m app.index_advisor` checks the app's
+-- queries against them.
+-- superseded by idx_items_active_created and idx_item_cards_geo
+DROP INDEX IF EXISTS idx_items_active_recent;
+DROP INDEX IF EXISTS idx_items_active_geo;
+
+-- newest active listings
+CREATE INDEX IF NOT EXISTS idx_items_active_created
+  ON items (created_at DESC) WHERE status = 'active';
+
+-- price slider bounds (app/catalog.py): MIN/MAX are one probe at each end
+CREATE INDEX IF NOT EXISTS idx_items_active_price
+  ON items (price) WHERE status = 'active';
 
--- Trigram index for simple search (future)
+-- My Listings: a seller's listings, newest first
+CREATE INDEX IF NOT EXISTS idx_items_seller_recent
+  ON items (seller_id, created_at DESC);
+
+-- My Purchases joins on the winning bid; also keeps ON DELETE SET NULL from
+-- bids (e.g. deleting a user) from scanning items once per deleted bid
+CREATE INDEX IF NOT EXISTS idx_items_chosen_bid
+  ON items (chosen_bid_id) WHERE chosen_bid_id IS NOT NULL;
+
+-- My Bids / My Purchases: a bidder's bids, best first per item (DISTINCT ON order)
+CREATE INDEX IF NOT EXISTS idx_bids_bidder
+  ON bids (bidder_id, item_id, amount DESC, placed_at DESC);
+
+-- due auctions for app/auction_worker.py; only rows with an end time are indexed
+CREATE INDEX IF NOT EXISTS idx_items_auction_due
+  ON items (status, auction_end_at)
+  WHERE listing_type = 'auction' AND auction_end_at IS NOT NULL;
+
+-- great-circle distance in miles; plain SQL so the planner inlines it
+CREATE OR REPLACE FUNCTION haversine_mi(lat1 DOUBLE PRECISION, lng1 DOUBLE PRECISION,
+                                        lat2 DOUBLE PRECISION, lng2 DOUBLE PRECISION)
+RETURNS DOUBLE PRECISION AS $$
+  SELECT 2 * 3958.8 * asin(LEAST(1.0, sqrt(
+    sin(radians(lat2 - lat1) / 2) ^ 2
+    + cos(radians(lat1)) * cos(radians(lat2)) * sin(radians(lng2 - lng1) / 2) ^ 2)))
+$$ LANGUAGE sql IMMUTABLE PARALLEL SAFE;
+
+-- Trigram indexes for Browse search (app/search.py: ILIKE match + word_similarity rank)
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
 CREATE INDEX IF NOT EXISTS idx_items_trgm_title
   ON items USING gin (title gin_trgm_ops);
 CREATE INDEX IF NOT EXISTS idx_items_trgm_desc
   ON items USING gin (description gin_trgm_ops);
 
 -- ---- Convenience view: current highest bid per item (for fast UI) ----
+-- now a projection of the maintained columns rather than an aggregate over bids
 CREATE OR REPLACE VIEW item_highest_bids AS
-SELECT b.item_id, MAX(b.amount) AS highest_bid
-FROM bids b
-GROUP BY b.item_id;
+SELECT i.id AS item_id, i.highest_bid::numeric AS highest_bid
+FROM items i
+WHERE i.bid_count > 0;
+
+-- ---- SAVED SEARCHES + ALERT INBOX (app/alerts.py) ----
+-- NULL criteria mean "any". New listings are matched in the app when posted
+-- (in-memory predicate index); matches land in the owner's inbox.
+CREATE TABLE IF NOT EXISTS saved_searches (
+  id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+  user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+  category_id UUID REFERENCES categories(id) ON DELETE CASCADE,
+  campus TEXT,
+  min_price NUMERIC(10,2),
+  max_price NUMERIC(10,2),
+  keywords TEXT,                    -- normalized; every word must appear in title or description
+  created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  CHECK (min_price IS NULL OR max_price IS NULL OR min_price <= max_price)
+);
+
+CREATE INDEX IF NOT EXISTS idx_saved_searches_user ON saved_searches(user_id, created_at);
+
+CREATE TABLE IF NOT EXISTS saved_search_matches (
+  search_id UUID NOT NULL REFERENCES saved_searches(id) ON DELETE CASCADE,
+  item_id UUID NOT NULL REFERENCES items(id) ON DELETE CASCADE,
+  user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,  -- copied from the search, for the inbox
+  matched_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  seen_at TIMESTAMPTZ,
+  PRIMARY KEY (search_id, item_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_saved_search_matches_inbox
+  ON saved_search_matches(user_id, matched_at DESC);
+CREATE INDEX IF NOT EXISTS idx_saved_search_matches_item ON saved_search_matches(item_id);
+
+-- ---- Live updates (app/live.py) ----
+-- Bid placed / accepted / declined and listing sold / closed are published on
+-- the market_events channel; listeners get them when the transaction commits.
+CREATE OR REPLACE FUNCTION notify_bid_event() RETURNS TRIGGER AS $$
+BEGIN
+  PERFORM pg_notify('market_events', json_build_object(
+    'kind', CASE WHEN TG_OP = 'INSERT' THEN 'bid' ELSE NEW.status END,
+    'item_id', NEW.item_id)::text);
+  RETURN NULL;
+END; $$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION notify_item_event() RETURNS TRIGGER AS $$
+BEGIN
+  PERFORM pg_notify('market_events', json_build_object('kind', NEW.status, 'item_id', NEW.id)::text);
+  RETURN NULL;
+END; $$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_bids_notify ON bids;
+CREATE TRIGGER trg_bids_notify
+  AFTER INSERT ON bids FOR EACH ROW EXECUTE FUNCTION notify_bid_event();
+
+DROP TRIGGER IF EXISTS trg_bids_notify_status ON bids;
+CREATE TRIGGER trg_bids_notify_status
+  AFTER UPDATE OF status ON bids FOR EACH ROW
+  WHEN (OLD.status IS DISTINCT FROM NEW.status)
+  EXECUTE FUNCTION notify_bid_event();
+
+DROP TRIGGER IF EXISTS trg_items_notify_status ON items;
+CREATE TRIGGER trg_items_notify_status
+  AFTER UPDATE OF status ON items FOR EACH ROW
+  WHEN (OLD.status IS DISTINCT FROM NEW.status)
+  EXECUTE FUNCTION notify_item_event();
+
+-- new saved-search matches: one event per user, so open pages recount their alert badge
+CREATE OR REPLACE FUNCTION notify_alert_event() RETURNS TRIGGER AS $$
+BEGIN
+  PERFORM pg_notify('market_events', json_build_object('kind', 'alert', 'user_id', u.user_id)::text)
+  FROM (SELECT DISTINCT user_id FROM new_matches) u;
+  RETURN NULL;
+END; $$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_saved_search_matches_notify ON saved_search_matches;
+CREATE TRIGGER trg_saved_search_matches_notify
+  AFTER INSERT ON saved_search_matches REFERENCING NEW TABLE AS new_matches
+  FOR EACH STATEMENT EXECUTE FUNCTION notify_alert_event();
+
+-- ---- ITEM CARDS: Browse read model (app/browse.py) ----
+-- One row per listing with everything a Browse card shows (category name,
+-- seller, cover image, bid stats), so a Browse page is a range scan on one
+-- table with no joins. item_card_source is the definition; triggers below
+-- keep item_cards equal to it and `python -m app.rebuild_item_cards`
+-- regenerates (or --check verifies) it from the source tables.
+CREATE OR REPLACE VIEW item_card_source AS
+SELECT i.id, i.seller_id, i.category_id, c.name AS category,
+       i.title, i.price, i.status, i.listing_type,
+       i.pickup_location, i.pickup_campus, i.pickup_lat, i.pickup_lng,
+       u.email AS seller_email, u.name AS seller_name,
+       img.image_path, img.variants,
+       i.highest_bid, i.bid_count, i.created_at
+FROM items i
+LEFT JOIN categories c ON c.id = i.category_id
+JOIN users u ON u.id = i.seller_id
+LEFT JOIN LATERAL (
+  SELECT ii.image_path, ii.variants
+  FROM item_images ii
+  WHERE ii.item_id = i.id
+  ORDER BY ii.is_primary DESC, ii.sort_order ASC, ii.created_at ASC
+  LIMIT 1
+) img ON TRUE;
+
+CREATE TABLE IF NOT EXISTS item_cards (
+  id UUID PRIMARY KEY REFERENCES items(id) ON DELETE CASCADE,
+  seller_id UUID NOT NULL,
+  category_id UUID,
+  category TEXT,                    -- NULL = uncategorized
+  title TEXT NOT NULL,
+  price NUMERIC(10,2) NOT NULL,
+  status TEXT NOT NULL,
+  listing_type TEXT NOT NULL,
+  pickup_location TEXT,
+  pickup_campus TEXT,
+  pickup_lat DOUBLE PRECISION,
+  pickup_lng DOUBLE PRECISION,
+  seller_email TEXT NOT NULL,
+  seller_name TEXT NOT NULL,
+  image_path TEXT,                  -- cover image
+  variants TEXT[],
+  highest_bid NUMERIC(10,2),
+  bid_count INT NOT NULL,
+  created_at TIMESTAMPTZ NOT NULL
+);
+
+-- one per Browse filter combination, newest first; price is a trailing key so
+-- the price range is checked in the index, before any heap visit
+CREATE INDEX IF NOT EXISTS idx_item_cards_recent
+  ON item_cards (created_at DESC, id DESC, price) WHERE status = 'active';
+CREATE INDEX IF NOT EXISTS idx_item_cards_category
+  ON item_cards (category, created_at DESC, id DESC, price) WHERE status = 'active';
+CREATE INDEX IF NOT EXISTS idx_item_cards_campus
+  ON item_cards (pickup_campus, created_at DESC, id DESC, price) WHERE status = 'active';
+CREATE INDEX IF NOT EXISTS idx_item_cards_category_campus
+  ON item_cards (category, pickup_campus, created_at DESC, id DESC, price) WHERE status = 'active';
+CREATE INDEX IF NOT EXISTS idx_item_cards_geo
+  ON item_cards USING gist (point(pickup_lng, pickup_lat)) WHERE status = 'active';
+CREATE INDEX IF NOT EXISTS idx_item_cards_seller ON item_cards (seller_id);
+
+-- upsert the cards of the given items from item_card_source; unchanged rows aren't rewritten
+CREATE OR REPLACE FUNCTION refresh_item_cards(p_ids UUID[]) RETURNS VOID AS $$
+  INSERT INTO item_cards AS ic
+  SELECT * FROM item_card_source WHERE id = ANY(p_ids)
+  ON CONFLICT (id) DO UPDATE SET
+    (seller_id, category_id, category, title, price, status, listing_type,
+     pickup_location, pickup_campus, pickup_lat, pickup_lng, seller_email, seller_name,
+     image_path, variants, highest_bid, bid_count, created_at)
+    = (EXCLUDED.seller_id, EXCLUDED.category_id, EXCLUDED.category, EXCLUDED.title, EXCLUDED.price,
+       EXCLUDED.status, EXCLUDED.listing_type, EXCLUDED.pickup_location, EXCLUDED.pickup_campus,
+       EXCLUDED.pickup_lat, EXCLUDED.pickup_lng, EXCLUDED.seller_email, EXCLUDED.seller_name,
+       EXCLUDED.image_path, EXCLUDED.variants, EXCLUDED.highest_bid, EXCLUDED.bid_count, EXCLUDED.created_at)
+  WHERE ic IS DISTINCT FROM EXCLUDED
+$$ LANGUAGE sql;
+
+-- statement-level with transition tables: a COPY of 1000 items is one refresh, not 1000
+CREATE OR REPLACE FUNCTION item_cards_from_items() RETURNS TRIGGER AS $$
+BEGIN
+  PERFORM refresh_item_cards(ARRAY(SELECT id FROM new_rows));
+  RETURN NULL;
+END; $$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_items_cards_insert ON items;
+CREATE TRIGGER trg_items_cards_insert
+  AFTER INSERT ON items REFERENCING NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION item_cards_from_items();
+
+DROP TRIGGER IF EXISTS trg_items_cards_update ON items;
+CREATE TRIGGER trg_items_cards_update
+  AFTER UPDATE ON items REFERENCING NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION item_cards_from_items();
+-- (deleted items lose their card through the foreign key)
+
+-- cover image changes
+CREATE OR REPLACE FUNCTION item_cards_from_images() RETURNS TRIGGER AS $$
+BEGIN
+  IF TG_OP = 'INSERT' THEN
+    PERFORM refresh_item_cards(ARRAY(SELECT DISTINCT item_id FROM new_rows));
+  ELSIF TG_OP = 'DELETE' THEN
+    PERFORM refresh_item_cards(ARRAY(SELECT DISTINCT item_id FROM old_rows));
+  ELSE
+    PERFORM refresh_item_cards(ARRAY(SELECT item_id FROM new_rows UNION SELECT item_id FROM old_rows));
+  END IF;
+  RETURN NULL;
+END; $$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_item_images_cards_insert ON item_images;
+CREATE TRIGGER trg_item_images_cards_insert
+  AFTER INSERT ON item_images REFERENCING NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION item_cards_from_images();
+
+DROP TRIGGER IF EXISTS trg_item_images_cards_delete ON item_images;
+CREATE TRIGGER trg_item_images_cards_delete
+  AFTER DELETE ON item_images REFERENCING OLD TABLE AS old_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION item_cards_from_images();
+
+DROP TRIGGER IF EXISTS trg_item_images_cards_update ON item_images;
+CREATE TRIGGER trg_item_images_cards_update
+  AFTER UPDATE ON item_images REFERENCING NEW TABLE AS new_rows OLD TABLE AS old_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION item_cards_from_images();
+
+-- renamed categories and sellers
+CREATE OR REPLACE FUNCTION item_cards_from_category() RETURNS TRIGGER AS $$
+BEGIN
+  UPDATE item_cards SET category = NEW.name WHERE category_id = NEW.id;
+  RETURN NULL;
+END; $$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_categories_cards ON categories;
+CREATE TRIGGER trg_categories_cards
+  AFTER UPDATE OF name ON categories FOR EACH ROW
+  WHEN (OLD.name IS DISTINCT FROM NEW.name)
+  EXECUTE FUNCTION item_cards_from_category();
+
+CREATE OR REPLACE FUNCTION item_cards_from_user() RETURNS TRIGGER AS $$
+BEGIN
+  UPDATE item_cards SET seller_email = NEW.email, seller_name = NEW.name WHERE seller_id = NEW.id;
+  RETURN NULL;
+END; $$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_users_cards ON users;
+CREATE TRIGGER trg_users_cards
+  AFTER UPDATE OF email, name ON users FOR EACH ROW
+  WHEN (OLD.email IS DISTINCT FROM NEW.email OR OLD.name IS DISTINCT FROM NEW.name)
+  EXECUTE FUNCTION item_cards_from_user();
+
+-- existing databases: fill in listings that have no card yet
+INSERT INTO item_cards
+SELECT s.* FROM item_card_source s
+WHERE NOT EXISTS (SELECT 1 FROM item_cards ic WHERE ic.id = s.id);
+
+-- ---- ARCHIVE: old sold / closed listings (app/archive_worker.py) ----
+-- Listings that were sold or closed more than a while ago move here with
+-- their bids and image rows, so the hot tables and their indexes only hold
+-- what Browse and bidding touch. Same columns as the source tables: a column
+-- added to items / bids / item_images must be added here too, and to the
+-- column lists in archive_listings() and the all_* views below (they name
+-- their columns, so a column missing there is left out rather than misplaced).
+
+-- When the listing was sold or closed, set when its status leaves 'active'.
+-- updated_at can't stand in: bid stats and edits bump it long after the sale.
+ALTER TABLE items ADD COLUMN IF NOT EXISTS closed_at TIMESTAMPTZ;
+
+CREATE OR REPLACE FUNCTION set_closed_at() RETURNS TRIGGER AS $$
+BEGIN
+  IF NEW.status = 'active' THEN
+    NEW.closed_at = NULL;
+  ELSIF TG_OP = 'INSERT' OR OLD.status = 'active' THEN
+    NEW.closed_at = COALESCE(NEW.closed_at, NOW());
+  END IF;  -- sold <-> closed keeps the first closing time
+  RETURN NEW;
+END; $$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_items_set_closed_at ON items;
+CREATE TRIGGER trg_items_set_closed_at
+  BEFORE INSERT OR UPDATE OF status ON items FOR EACH ROW EXECUTE FUNCTION set_closed_at();
+
+-- one-time backfill for listings closed before the column existed: their
+-- last update is the best guess (without bumping updated_at again)
+DO $$
+BEGIN
+  IF EXISTS (SELECT 1 FROM items WHERE status IN ('sold', 'closed') AND closed_at IS NULL) THEN
+    ALTER TABLE items DISABLE TRIGGER trg_items_set_updated_at;
+    UPDATE items SET closed_at = updated_at
+    WHERE status IN ('sold', 'closed') AND closed_at IS NULL;
+    ALTER TABLE items ENABLE TRIGGER trg_items_set_updated_at;
+  END IF;
+END $$;
+
+CREATE TABLE IF NOT EXISTS items_archive (
+  LIKE items INCLUDING DEFAULTS,
+  PRIMARY KEY (id),
+  FOREIGN KEY (seller_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS bids_archive (
+  LIKE bids INCLUDING DEFAULTS,
+  PRIMARY KEY (id),
+  FOREIGN KEY (item_id) REFERENCES items_archive(id) ON DELETE CASCADE,
+  FOREIGN KEY (bidder_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS item_images_archive (
+  LIKE item_images INCLUDING DEFAULTS,
+  PRIMARY KEY (id),
+  FOREIGN KEY (item_id) REFERENCES items_archive(id) ON DELETE CASCADE
+);
+
+CREATE INDEX IF NOT EXISTS idx_items_archive_seller ON items_archive (seller_id, created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_items_archive_chosen_bid
+  ON items_archive (chosen_bid_id) WHERE chosen_bid_id IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_bids_archive_bidder
+  ON bids_archive (bidder_id, item_id, amount DESC, placed_at DESC);
+CREATE INDEX IF NOT EXISTS idx_bids_archive_item ON bids_archive (item_id);
+CREATE INDEX IF NOT EXISTS idx_item_images_archive_cover
+  ON item_images_archive (item_id, is_primary DESC, sort_order, created_at);
+
+-- archived images still hold their files
+DROP TRIGGER IF EXISTS trg_item_images_archive_refs ON item_images_archive;
+CREATE TRIGGER trg_item_images_archive_refs
+  AFTER INSERT OR DELETE ON item_images_archive FOR EACH ROW EXECUTE FUNCTION track_image_refs();
+
+ALTER TABLE items_archive ADD COLUMN IF NOT EXISTS closed_at TIMESTAMPTZ;
+UPDATE items_archive SET closed_at = updated_at WHERE closed_at IS NULL;
+
+-- candidates for the archive worker, oldest first
+DROP INDEX IF EXISTS idx_items_archivable;  -- was on updated_at
+CREATE INDEX IF NOT EXISTS idx_items_closed_at
+  ON items (closed_at) WHERE status IN ('sold', 'closed');
+
+-- Move up to p_limit listings sold / closed (closed_at) before NOW() - p_older_than; returns how
+-- many. Rows are copied first and then deleted from items, so image ref counts never
+-- touch 0 and the cascade takes bids, images, the card and alert matches along.
+-- SKIP LOCKED: rows a bidder or seller holds right now wait for the next batch.
+CREATE OR REPLACE FUNCTION archive_listings(p_older_than INTERVAL, p_limit INT) RETURNS INT AS $$
+DECLARE ids UUID[];
+BEGIN
+  SELECT array_agg(id) INTO ids FROM (
+    SELECT id FROM items
+    WHERE status IN ('sold', 'closed') AND closed_at < NOW() - p_older_than
+    ORDER BY closed_at
+    LIMIT p_limit
+    FOR UPDATE SKIP LOCKED
+  ) picked;
+  IF ids IS NULL THEN
+    RETURN 0;
+  END IF;
+
+  INSERT INTO items_archive (id, seller_id, title, description, price, category_id, status, listing_type,
+    buy_now_price, pickup_location, pickup_campus, pickup_lat, pickup_lng, auction_end_at,
+    chosen_bid_id, highest_bid, bid_count, last_bid_at, created_at, updated_at, deleted_at, closed_at)
+  SELECT id, seller_id, title, description, price, category_id, status, listing_type,
+         buy_now_price, pickup_location, pickup_campus, pickup_lat, pickup_lng, auction_end_at,
+         chosen_bid_id, highest_bid, bid_count, last_bid_at, created_at, updated_at, deleted_at, closed_at
+  FROM items WHERE id = ANY(ids);
+  INSERT INTO bids_archive (id, item_id, bidder_id, amount, status, placed_at)
+  SELECT id, item_id, bidder_id, amount, status, placed_at FROM bids WHERE item_id = ANY(ids);
+  INSERT INTO item_images_archive (id, item_id, image_path, is_primary, sort_order, variants, created_at)
+  SELECT id, item_id, image_path, is_primary, sort_order, variants, created_at
+  FROM item_images WHERE item_id = ANY(ids);
+  DELETE FROM items WHERE id = ANY(ids);
+  RETURN cardinality(ids);
+END; $$ LANGUAGE plpgsql;
+
+-- hot + archived rows, for screens that show history (My Purchases, My Bids).
+-- Dropped and recreated: CREATE OR REPLACE can't change a view's column list.
+DROP VIEW IF EXISTS all_items;
+CREATE VIEW all_items AS
+SELECT id, seller_id, title, description, price, category_id, status, listing_type,
+  buy_now_price, pickup_location, pickup_campus, pickup_lat, pickup_lng, auction_end_at,
+  chosen_bid_id, highest_bid, bid_count, last_bid_at, created_at, updated_at, deleted_at, closed_at
+FROM items
+UNION ALL
+SELECT id, seller_id, title, description, price, category_id, status, listing_type,
+  buy_now_price, pickup_location, pickup_campus, pickup_lat, pickup_lng, auction_end_at,
+  chosen_bid_id, highest_bid, bid_count, last_bid_at, created_at, updated_at, deleted_at, closed_at
+FROM items_archive;
+
+DROP VIEW IF EXISTS all_bids;
+CREATE VIEW all_bids AS
+SELECT id, item_id, bidder_id, amount, status, placed_at FROM bids
+UNION ALL
+SELECT id, item_id, bidder_id, amount, status, placed_at FROM bids_archive;
+
+DROP VIEW IF EXISTS all_item_images;
+CREATE VIEW all_item_images AS
+SELECT id, item_id, image_path, is_primary, sort_order, variants, created_at FROM item_images
+UNION ALL
+SELECT id, item_id, image_path, is_primary, sort_order, variants, created_at FROM item_images_archive;